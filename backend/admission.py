@@ -0,0 +1,162 @@
+"""
+Admission control: per-user rate limits and per-route-class concurrency caps.
+
+Every request passes two gates before it reaches a handler:
+- The caller's token bucket. Each user or token, or the client IP when
+  there is none, refills at `rate` tokens per second up to `burst`. A
+  request costs its class's `cost`.
+- A concurrency cap for its route class. A bounded number of callers may
+  wait for a slot, each for at most `queue_timeout` seconds.
+
+Anything over a limit gets an immediate 429 with Retry-After instead of
+piling up behind the database. The caps of all classes together stay
+below the Motor pool size, so one class can't starve the others of
+connections.
+
+Like the caches, this is per process and meant for the event loop only.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+
+from starlette.responses import JSONResponse
+
+
+class TokenBuckets:
+    """One token bucket per key; the least recently seen keys are dropped past maxsize."""
+
+    def __init__(self, rate, burst, maxsize=100000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+
+    def take(self, key, cost=1):
+        """0 if admitted, otherwise the seconds until cost tokens are available."""
+        if self.rate <= 0:
+            return 0
+        now = self.clock()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= cost:
+            tokens -= cost
+            wait = 0
+        else:
+            wait = (min(cost, self.burst) - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RouteClass:
+    """A concurrency cap with a small bounded queue in front of it."""
+
+    def __init__(self, name, limit, max_queue=0, queue_timeout=1.0, cost=1):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.cost = cost
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+        self._semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+
+    async def acquire(self):
+        """None once a slot is held, otherwise the rejection reason."""
+        if self._semaphore is not None:
+            if self._semaphore.locked() or self.waiting:
+                if self.waiting >= self.max_queue:
+                    return "queue_full"
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    return "queue_timeout"
+                finally:
+                    self.waiting -= 1
+            else:
+                await self._semaphore.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        return None
+
+    def release(self):
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+
+class AdmissionController:
+    def __init__(self, buckets, classes, classify, identify):
+        """classify(method, path) names a class, or None to exempt the request;
+        identify(scope) returns the rate-limit key."""
+        self.buckets = buckets
+        self.classes = {route_class.name: route_class for route_class in classes}
+        self.classify = classify
+        self.identify = identify
+
+    def collect(self):
+        """Metrics in the registry's collector format."""
+        classes = self.classes.values()
+        return [
+            ("admission_in_flight", "gauge", "Requests holding a slot, by route class.",
+             {(c.name,): c.in_flight for c in classes}, ("class",)),
+            ("admission_queue_depth", "gauge", "Requests waiting for a slot, by route class.",
+             {(c.name,): c.waiting for c in classes}, ("class",)),
+            ("admission_admitted_total", "counter", "Requests admitted, by route class.",
+             {(c.name,): c.admitted for c in classes}, ("class",)),
+            ("admission_rejected_total", "counter", "Requests answered 429, by route class and reason.",
+             {(c.name, reason): count for c in classes for reason, count in c.rejected.items()},
+             ("class", "reason")),
+            ("admission_rate_limit_keys", "gauge", "Callers with a tracked token bucket.",
+             {(): len(self.buckets)}, ()),
+        ]
+
+
+def too_many_requests(detail, retry_after):
+    return JSONResponse(
+        {"detail": detail},
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """Pure ASGI; a slot is held until the response, streamed or not, is finished."""
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        controller = self.controller
+        name = controller.classify(scope["method"], scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+        route_class = controller.classes[name]
+
+        wait = controller.buckets.take(controller.identify(scope), route_class.cost)
+        if wait:
+            route_class.rejected["rate_limited"] += 1
+            return await too_many_requests("Rate limit exceeded", wait)(scope, receive, send)
+
+        reason = await route_class.acquire()
+        if reason is not None:
+            route_class.rejected[reason] += 1
+            return await too_many_requests("Server busy, retry shortly", route_class.queue_timeout)(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release()
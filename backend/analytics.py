@@ -0,0 +1,201 @@
+"""
+Columnar trading analytics.
+
+A user's closed trades are loaded once into NumPy arrays and every metric is
+computed with vectorized operations, so the cost is a handful of passes over
+contiguous memory regardless of journal size.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Day numbers of datetime64[D] count from here
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Fields needed to build TradeColumns; everything else stays in storage
+ANALYTICS_FIELDS = ("date", "trade_type", "entry_price", "exit_price", "quantity", "pnl", "risk_amount")
+
+
+@dataclass
+class TradeColumns:
+    date: np.ndarray  # datetime64[D], sorted ascending
+    pnl: np.ndarray
+    risk_amount: np.ndarray  # NaN where no risk was recorded
+    entry: np.ndarray
+    exit: np.ndarray
+    quantity: np.ndarray
+
+    @classmethod
+    def from_documents(cls, docs):
+        """Build columns from trade documents, dropping trades that are still open.
+
+        Missing pnl is derived from entry/exit/quantity and the trade direction.
+        """
+        # Stores return dates as (tz-aware) datetimes; NumPy converts those one
+        # object at a time and won't take tz-aware ones, so go through ordinals
+        ordinals = np.array(
+            [date.fromisoformat(value[:10]).toordinal() if isinstance(value, str) else value.toordinal()
+             for value in (doc["date"] for doc in docs)],
+            dtype=np.int64,
+        )
+        day = (ordinals - EPOCH_ORDINAL).astype("datetime64[D]")
+        # A plain list per field converts in C, None becoming NaN, which is
+        # cheaper than a Python expression per value
+        def column(field):
+            return np.array([doc.get(field) for doc in docs], dtype=float)
+
+        entry = column("entry_price")
+        entry[np.isnan(entry)] = 0.0
+        exit_ = column("exit_price")
+        quantity = column("quantity")
+        quantity[np.isnan(quantity)] = 0.0
+        pnl = column("pnl")
+        risk = column("risk_amount")
+        risk[risk == 0] = np.nan
+        direction = np.where([doc.get("trade_type") == "Short" for doc in docs], -1.0, 1.0)
+
+        derived = (exit_ - entry) * quantity * direction
+        pnl = np.where(np.isnan(pnl), derived, pnl)
+
+        closed = ~np.isnan(pnl)
+        order = np.argsort(day[closed], kind="stable")
+        return cls(
+            date=day[closed][order],
+            pnl=pnl[closed][order],
+            risk_amount=risk[closed][order],
+            entry=entry[closed][order],
+            exit=exit_[closed][order],
+            quantity=quantity[closed][order],
+        )
+
+
+def daily_pnl(columns):
+    days, starts = np.unique(columns.date, return_index=True)
+    return days, np.add.reduceat(columns.pnl, starts) if len(days) else np.array([])
+
+
+def drawdown(days, equity):
+    """Max drawdown (absolute) and its longest duration in calendar days."""
+    if not len(equity):
+        return 0.0, 0
+    # Start from a flat account the day before the first trade
+    equity = np.concatenate(([0.0], equity))
+    days = np.concatenate(([days[0] - np.timedelta64(1, "D")], days))
+    peak = np.maximum.accumulate(equity)
+    positions = np.where(equity >= peak, np.arange(len(equity)), 0)
+    last_peak = np.maximum.accumulate(positions)
+    durations = (days - days[last_peak]).astype(int)
+    return float(np.max(peak - equity)), int(durations.max())
+
+
+def ratio(mean, deviation):
+    if deviation == 0 or np.isnan(deviation):
+        return None
+    return float(mean / deviation * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+
+def streaks(pnl):
+    """Longest winning and losing runs plus the current run (+wins / -losses)."""
+    sign = np.sign(pnl).astype(int)
+    if not len(sign):
+        return 0, 0, 0
+    boundaries = np.flatnonzero(np.diff(sign)) + 1
+    starts = np.concatenate(([0], boundaries))
+    lengths = np.diff(np.concatenate((starts, [len(sign)])))
+    run_signs = sign[starts]
+    longest_win = int(lengths[run_signs > 0].max(initial=0))
+    longest_loss = int(lengths[run_signs < 0].max(initial=0))
+    current = int(lengths[-1] * run_signs[-1])
+    return longest_win, longest_loss, current
+
+
+def compute_analytics(columns):
+    pnl = columns.pnl
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    gross_profit = float(wins.sum())
+    gross_loss = abs(float(losses.sum()))
+
+    days, day_pnl = daily_pnl(columns)
+    equity = np.cumsum(day_pnl)
+    max_drawdown, max_drawdown_days = drawdown(days, equity)
+
+    # Ratios use daily P&L; mean/std is scale-free, so this equals the ratio on
+    # returns against any fixed capital base
+    downside = np.minimum(day_pnl, 0.0)
+    sharpe = ratio(day_pnl.mean(), day_pnl.std(ddof=1)) if len(day_pnl) > 1 else None
+    sortino = ratio(day_pnl.mean(), np.sqrt(np.mean(downside ** 2))) if len(day_pnl) > 1 else None
+
+    risked = columns.risk_amount > 0
+    r_multiples = pnl[risked] / columns.risk_amount[risked]
+
+    longest_win, longest_loss, current = streaks(pnl)
+
+    return {
+        "total_trades": int(len(pnl)),
+        "net_pnl": round(float(pnl.sum()), 2),
+        "gross_profit": round(gross_profit, 2),
+        "gross_loss": round(gross_loss, 2),
+        "profit_factor": round(gross_profit / gross_loss, 4) if gross_loss else None,
+        "expectancy": round(float(pnl.mean()), 4) if len(pnl) else 0,
+        "average_win": round(float(wins.mean()), 2) if len(wins) else 0,
+        "average_loss": round(float(losses.mean()), 2) if len(losses) else 0,
+        "max_drawdown": round(max_drawdown, 2),
+        "max_drawdown_duration_days": max_drawdown_days,
+        "sharpe_ratio": round(sharpe, 4) if sharpe is not None else None,
+        "sortino_ratio": round(sortino, 4) if sortino is not None else None,
+        "r_multiples": {
+            "count": int(len(r_multiples)),
+            "average": round(float(r_multiples.mean()), 4) if len(r_multiples) else None,
+            "median": round(float(np.median(r_multiples)), 4) if len(r_multiples) else None,
+            "total": round(float(r_multiples.sum()), 4),
+        },
+        "streaks": {
+            "longest_win": longest_win,
+            "longest_loss": longest_loss,
+            "current": current,
+        },
+        "equity_curve": [
+            {"date": str(day), "pnl": round(float(value), 2), "equity": round(float(total), 2)}
+            for day, value, total in zip(days, day_pnl, equity)
+        ],
+    }
+
+
+class AnalyticsCache:
+    """Per-user analytics results, evicted LRU and invalidated by trade writes.
+
+    Readers take a token() before loading trades and hand it back to put(), so
+    a result computed while a write landed is never cached.
+    """
+
+    def __init__(self, max_users=1024):
+        self.max_users = max_users
+        self._results = OrderedDict()
+        self._invalidations = 0
+
+    def token(self):
+        return self._invalidations
+
+    def get(self, user_id):
+        result = self._results.get(user_id)
+        if result is not None:
+            self._results.move_to_end(user_id)
+        return result
+
+    def put(self, user_id, result, token):
+        if token != self._invalidations:
+            return
+        self._results[user_id] = result
+        self._results.move_to_end(user_id)
+        while len(self._results) > self.max_users:
+            self._results.popitem(last=False)
+
+    def invalidate(self, user_id):
+        self._invalidations += 1
+        self._results.pop(user_id, None)
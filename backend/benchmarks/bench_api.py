@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the HTTP API.
+
+    python benchmarks/bench_api.py [--sizes 1000,100000,1000000] [--concurrency 32]
+        [--requests 2000] [--transport asgi|uvicorn] [--mongo-url URL]
+        [--storage mongo|sqlite|memory]
+        [--output results.json] [--compare baseline.json]
+
+For each journal size a fresh user is seeded with that many synthetic trades.
+Concurrent async clients then drive login, list, stats, create and upload,
+and throughput and latency percentiles are reported per endpoint.
+
+The app runs in this process. It is either called directly over ASGI or
+served by uvicorn on a local port, sharing the event loop with the clients.
+Without --mongo-url the database is an in-memory mongomock stand-in. That
+is fine for comparing runs of the smaller sizes, but it sorts and filters in
+Python, so it only defaults to 1k and 10k. Use --mongo-url to point at a
+disposable mongod for the default 1k, 100k and 1M journals and for absolute
+numbers. The --db database is dropped first.
+
+--storage sqlite or memory runs the app on the embedded backends instead
+(sqlite in a fresh temporary file); they default to 1k, 100k and 1M too.
+
+--output saves the results as JSON. --compare prints the change against an
+earlier file, so regressions can be diffed between runs.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# The database is chosen below; keep server.py from resolving the real cluster
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "trading_journal_bench")
+# One client hammering one account is the point here; run with ADMISSION_CONTROL=on to include the limits
+os.environ.setdefault("ADMISSION_CONTROL", "off")
+
+import server
+from storage import BACKENDS, MemoryRepository, MongoRepository, SQLiteRepository
+
+PASSWORD = "bench-password"
+PAIRS = ["EUR/USD", "GBP/USD", "USD/JPY", "AUD/USD", "BTC/USD", "XAU/USD"]
+SEED_BATCH_SIZE = 10000
+UPLOAD_BYTES = 64 * 1024
+
+
+def synthetic_trade(user_id, rng, start):
+    entry = round(rng.uniform(1, 2), 4)
+    exit_price = round(entry * rng.uniform(0.98, 1.02), 4)
+    now = datetime.now(timezone.utc)
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "date": server.to_mongo_date(start + timedelta(days=rng.randrange(3650))),
+        "pair": rng.choice(PAIRS),
+        "trade_type": rng.choice(("Long", "Short")),
+        "entry_price": entry,
+        "exit_price": exit_price,
+        "quantity": 10000.0,
+        "stop_loss": None,
+        "take_profit": None,
+        "risk_amount": 100.0,
+        "pnl": round(rng.gauss(15, 120), 2),
+        "comments": None,
+        "chart_image_url": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def seed_journal(user_id, count):
+    rng = random.Random(count)
+    start = date(2015, 1, 1)
+    for offset in range(0, count, SEED_BATCH_SIZE):
+        batch = [synthetic_trade(user_id, rng, start) for _ in range(min(SEED_BATCH_SIZE, count - offset))]
+        await server.storage.insert_trades(batch)
+    await server.rebuild_user_stats(user_id)
+
+
+class BenchUser:
+    def __init__(self, email, token):
+        self.email = email
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+
+async def create_user(client, size):
+    email = f"bench-{size}-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post(
+        "/api/auth/register", json={"email": email, "password": PASSWORD, "full_name": "Bench"}
+    )
+    response.raise_for_status()
+    return BenchUser(email, response.json()["access_token"]), response.json()["user"]["id"]
+
+
+def login(client, user, i):
+    return client.post("/api/auth/login", json={"email": user.email, "password": PASSWORD})
+
+
+def list_trades(client, user, i):
+    return client.get("/api/trades", params={"limit": 50}, headers=user.headers)
+
+
+def stats(client, user, i):
+    return client.get("/api/dashboard/stats", headers=user.headers)
+
+
+def create(client, user, i):
+    trade = {
+        "date": (date(2024, 1, 1) + timedelta(days=i % 365)).isoformat(),
+        "pair": PAIRS[i % len(PAIRS)],
+        "trade_type": "Long",
+        "entry_price": 1.085,
+        "exit_price": 1.092,
+        "quantity": 10000,
+        "pnl": 70 - i % 140,
+    }
+    return client.post("/api/trades", json=trade, headers=user.headers)
+
+
+def upload(client, user, i):
+    # Fresh bytes every time, so each request stores a new file
+    files = {"file": ("chart.png", os.urandom(UPLOAD_BYTES), "image/png")}
+    return client.post("/api/upload", files=files, headers=user.headers)
+
+
+SCENARIOS = {
+    "login": login,
+    "list": list_trades,
+    "stats": stats,
+    "create": create,
+    "upload": upload,
+}
+
+
+def summarize(latencies, elapsed, errors):
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+async def run_scenario(client, scenario, user, concurrency, total, warmup):
+    for i in range(warmup):
+        await scenario(client, user, i)
+
+    latencies = []
+    errors = 0
+    counter = itertools.count(warmup)
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < warmup + total:
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, user, i)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def use_database(storage_backend, mongo_url, db_name):
+    if storage_backend == "sqlite":
+        path = Path(tempfile.mkdtemp(prefix="bench-sqlite-")) / "journal.db"
+        server.storage = SQLiteRepository(path)
+        return "sqlite"
+    if storage_backend == "memory":
+        server.storage = MemoryRepository()
+        return "memory"
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        server.client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[server.command_metrics])
+        await server.client.drop_database(db_name)
+        store = "mongodb"
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("mongomock-motor is needed for the in-memory stand-in; install it or pass --mongo-url")
+        server.client = AsyncMongoMockClient(tz_aware=True)
+        store = "mongomock"
+    server.db = server.client[db_name]
+    server.storage = MongoRepository(server.db)
+    return store
+
+
+async def start_app(transport, port, concurrency):
+    """An httpx client wired to the app, plus a coroutine that stops it."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if transport == "asgi":
+        # ASGITransport doesn't run lifespan events, so enter the app's lifespan here
+        lifespan = server.app.router.lifespan_context(server.app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench")
+
+        async def stop():
+            await client.aclose()
+            await lifespan.__aexit__(None, None, None)
+
+        return client, stop
+
+    import uvicorn
+
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+    client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60)
+
+    async def stop():
+        await client.aclose()
+        uvicorn_server.should_exit = True
+        await serving
+
+    return client, stop
+
+
+async def run(args):
+    store = await use_database(args.storage, args.mongo_url, args.db)
+    upload_dir = Path(tempfile.mkdtemp(prefix="bench-uploads-"))
+    server.UPLOAD_DIR = upload_dir
+    server.derivative_renderer.upload_dir = upload_dir
+
+    client, stop = await start_app(args.transport, args.port, args.concurrency)
+    scenarios = args.scenarios.split(",")
+    results = {}
+    try:
+        for size in args.sizes:
+            user, user_id = await create_user(client, size)
+            started = time.perf_counter()
+            await seed_journal(user_id, size)
+            print(f"\n{size:,} trades (seeded in {time.perf_counter() - started:.1f}s)")
+            print(f"  {'endpoint':<8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+            results[str(size)] = {}
+            for name in scenarios:
+                result = await run_scenario(client, SCENARIOS[name], user, args.concurrency, args.requests, args.warmup)
+                results[str(size)][name] = result
+                print(f"  {name:<8} {result['throughput_rps']:>9,.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f}"
+                      f" {result['p99_ms']:>9.2f} {result['max_ms']:>9.2f} {result['errors']:>7}")
+    finally:
+        await stop()
+        await server.storage.close()
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "transport": args.transport,
+            "store": store,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """Print throughput and p95 change against a baseline report."""
+    print(f"\nChange against baseline from {baseline['meta']['created_at']}:")
+    for size, scenarios in report["results"].items():
+        for name, result in scenarios.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            throughput = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100
+            p95 = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+            print(f"  {int(size):>9,} {name:<8} req/s {throughput:+7.1f}%   p95 {p95:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        help="journal sizes (default 1000,100000,1000000; 1000,10000 on the stand-in)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="timed requests per endpoint and size")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--transport", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mongo-url", help="disposable MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--db", default="trading_journal_bench")
+    parser.add_argument("--storage", choices=BACKENDS, default="mongo", help="repository backend the app runs on")
+    parser.add_argument("--output", type=Path, help="save the results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run")
+    args = parser.parse_args()
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.sizes is None:
+        args.sizes = [1000, 10000] if args.storage == "mongo" and not args.mongo_url else [1000, 100000, 1000000]
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nSaved {args.output}")
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Login storm benchmark.
+
+    python benchmarks/bench_login.py [--logins 200] [--concurrency 50] [--rounds 12] [--workers 4]
+
+Fires concurrent logins at the in-process app (mongomock stand-in). A
+heartbeat coroutine wakes every 10 ms and records how late it ran, which
+measures event loop lag. Each run is done twice:
+- "pool": hashing on the bounded thread pool, as deployed
+- "inline": hashing on the loop itself, the naive bcrypt port
+
+With the pool, lag stays near zero while logins are bounded by the worker
+count. Inline, every request waits behind every hash.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "trading_journal_bench")
+# One client hammering one account is the point here; run with ADMISSION_CONTROL=on to include the limits
+os.environ.setdefault("ADMISSION_CONTROL", "off")
+
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from passwords import PasswordHasher
+from storage import MongoRepository
+
+EMAIL = "storm@example.com"
+PASSWORD = "storm-password"
+HEARTBEAT_INTERVAL = 0.01
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+async def heartbeat(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + HEARTBEAT_INTERVAL
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(loop.time() - expected)
+
+
+async def storm(client, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    return latencies, time.perf_counter() - started
+
+
+async def run(mode, args):
+    server.client = AsyncMongoMockClient(tz_aware=True)
+    server.db = server.client["bench"]
+    server.storage = MongoRepository(server.db)
+    server.password_hasher = PasswordHasher(
+        rounds=args.rounds, max_workers=args.workers if mode == "pool" else 0, legacy_secret=server.SECRET_KEY
+    )
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench", timeout=None)
+    response = await client.post("/api/auth/register", json={"email": EMAIL, "password": PASSWORD, "full_name": "Storm"})
+    response.raise_for_status()
+
+    lags = []
+    stop = asyncio.Event()
+    beating = asyncio.create_task(heartbeat(lags, stop))
+    latencies, elapsed = await storm(client, args.logins, args.concurrency)
+    stop.set()
+    await beating
+    await client.aclose()
+    server.password_hasher.shutdown()
+
+    # Inline hashing can starve the heartbeat down to a sample or two
+    print(f"{mode:<7} {args.logins / elapsed:9.1f} {percentile(latencies, 0.5) * 1000:10.1f}"
+          f" {percentile(latencies, 0.99) * 1000:10.1f} {percentile(lags, 0.5) * 1000:10.2f}"
+          f" {percentile(lags, 0.99) * 1000:10.2f} {max(lags, default=0.0) * 1000:10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default="pool,inline")
+    args = parser.parse_args()
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent, bcrypt cost {args.rounds}, {args.workers} workers")
+    print(f"{'mode':<7} {'logins/s':>9} {'p50 ms':>10} {'p99 ms':>10} {'lag p50':>10} {'lag p99':>10} {'lag max':>10}")
+    for mode in args.modes.split(","):
+        asyncio.run(run(mode, args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Mark-to-market benchmark.
+
+    python benchmarks/bench_prices.py [--pairs 300] [--rows 100000] [--positions 5000]
+
+Fills a temporary price store with --pairs memory-mapped series of --rows
+prices each. It then times marking --positions open trades, spread over
+those pairs, at random instants. This is the work behind
+/api/positions/open, minus loading the trades. Cold runs reopen every
+memory map; warm runs reuse them.
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from prices import OpenPositions, PriceStore, mark_to_market
+
+START_MS = 1_420_070_400_000  # 2015-01-01
+STEP_MS = 60_000
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=300)
+    parser.add_argument("--rows", type=int, default=100000, help="prices per pair")
+    parser.add_argument("--positions", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory(prefix="bench-prices-") as directory:
+        store = PriceStore(directory)
+        pairs = [f"P{i:03d}/USD" for i in range(args.pairs)]
+        started = time.perf_counter()
+        times = START_MS + np.arange(args.rows, dtype=np.int64) * STEP_MS
+        for pair in pairs:
+            store.write(pair, times, 100 + np.cumsum(np.random.default_rng(len(pair)).normal(0, 0.1, args.rows)))
+        print(f"{args.pairs} pairs x {args.rows:,} prices written in {time.perf_counter() - started:.1f}s")
+
+        positions = OpenPositions.from_documents([
+            {"id": str(i), "pair": rng.choice(pairs), "trade_type": rng.choice(["Long", "Short"]),
+             "entry_price": 100.0, "quantity": 1.0}
+            for i in range(args.positions)
+        ])
+        end_ms = START_MS + args.rows * STEP_MS
+
+        for mode in ("cold", "warm"):
+            durations = []
+            for _ in range(args.runs):
+                if mode == "cold":
+                    store = PriceStore(directory)
+                at_ms = rng.randrange(START_MS, end_ms)
+                started = time.perf_counter()
+                mark_to_market(positions, store, at_ms)
+                durations.append(time.perf_counter() - started)
+            print(f"{mode}: {args.positions:,} positions / {args.pairs} pairs"
+                  f"  p50 {percentile(durations, 0.5) * 1000:.2f} ms  p99 {percentile(durations, 0.99) * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
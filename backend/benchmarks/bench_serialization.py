@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark for trade list serialization.
+
+    python benchmarks/bench_serialization.py [--trades 500] [--repeat 200]
+
+Compares the old response path (ISO strings parsed per document, a Trade
+model per row, FastAPI's jsonable_encoder + json.dumps) with the fast path
+(native BSON datetimes encoded straight from cursor output with orjson).
+"""
+
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Nothing here talks to Mongo; keep server.py from resolving the real cluster
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "trading_journal_bench")
+
+from fastapi.encoders import jsonable_encoder
+
+import server
+
+
+def bson_documents(count):
+    now = datetime(2024, 6, 1, 12, 30, tzinfo=timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "date": server.to_mongo_date((now - timedelta(days=i)).date()),
+            "pair": "EUR/USD",
+            "trade_type": "Long" if i % 2 else "Short",
+            "entry_price": 1.085,
+            "exit_price": 1.092,
+            "quantity": 10000.0,
+            "stop_loss": 1.08,
+            "take_profit": 1.095,
+            "risk_amount": 500.0,
+            "pnl": 70.0 - i % 140,
+            "comments": "Clean breakout and retest of the London high",
+            "chart_image_url": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_documents(docs):
+    legacy = []
+    for doc in docs:
+        doc = dict(doc, user_id="user")
+        doc["date"] = doc["date"].date().isoformat()
+        doc["created_at"] = doc["created_at"].isoformat()
+        doc["updated_at"] = doc["updated_at"].isoformat()
+        legacy.append(doc)
+    return legacy
+
+
+def model_path(docs):
+    page = server.TradePage(trades=[server.Trade(**server.parse_from_mongo(doc)) for doc in docs])
+    return json.dumps(jsonable_encoder(page)).encode()
+
+
+def fast_path(docs):
+    return server.encode_trade_list(docs, next_cursor=None)
+
+
+def measure(fn, source, repeat):
+    samples = []
+    for _ in range(repeat):
+        # Cursor output is fresh dicts on every request; don't time the copy
+        docs = copy.deepcopy(source)
+        started = time.perf_counter()
+        fn(docs)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trades", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    docs = bson_documents(args.trades)
+    before = measure(model_path, legacy_documents(docs), args.repeat)
+    after = measure(fast_path, docs, args.repeat)
+
+    print(f"trades per response: {args.trades}")
+    print(f"model path:          {before * 1000:8.3f} ms  ({args.trades / before:12,.0f} trades/s)")
+    print(f"fast path:           {after * 1000:8.3f} ms  ({args.trades / after:12,.0f} trades/s)")
+    print(f"speedup:             {before / after:8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
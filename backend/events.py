@@ -0,0 +1,168 @@
+"""
+Per-user change feed.
+
+Write handlers publish one message per change set. A message is encoded
+once and then fanned out to every open connection of that user by an
+in-process EventBroker.
+
+Each connection has a bounded queue. A consumer that falls a full queue
+behind is evicted rather than letting the queue (or the writer) wait on
+it. The client is told so and reconnects, then refetches.
+
+Where messages come from is up to the source:
+- LocalEventSource hands them straight to the broker and suits a single worker.
+- ChangeStreamEventSource writes them to a collection and tails it with a
+  MongoDB change stream, so every worker sees every user's events.
+  Change streams need a replica set.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(queue_size)
+        self.evicted = False
+
+    async def get(self):
+        """Next message, or None once the subscription has been evicted."""
+        return await self.queue.get()
+
+
+class EventBroker:
+    """Fans messages out to the subscriptions of their user."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscriptions = {}
+        self._delivered = 0
+        self._evictions = 0
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscriptions
+
+    def deliver(self, message):
+        for subscription in list(self._subscriptions.get(message["user_id"], ())):
+            try:
+                subscription.queue.put_nowait(message)
+                self._delivered += 1
+            except asyncio.QueueFull:
+                self.evict(subscription)
+
+    def evict(self, subscription):
+        # Drop the backlog so the None sentinel fits and is read next
+        subscription.evicted = True
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        self.unsubscribe(subscription)
+        self._evictions += 1
+
+    def stats(self):
+        return {
+            "users": len(self._subscriptions),
+            "connections": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            "delivered": self._delivered,
+            "evictions": self._evictions,
+        }
+
+
+def encode_message(user_id, event, data):
+    return {"user_id": user_id, "event": event, "data": orjson.dumps(data, option=orjson.OPT_UTC_Z).decode()}
+
+
+def format_sse(message):
+    return f"event: {message['event']}\ndata: {message['data']}\n\n".encode()
+
+
+class LocalEventSource:
+    """Delivers messages to this process's broker only."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def wants(self, user_id):
+        return self.broker.has_subscribers(user_id)
+
+    async def publish(self, message):
+        self.broker.deliver(message)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class ChangeStreamEventSource:
+    """Shares messages between workers through a MongoDB collection.
+
+    publish() inserts the message and a background task tails the collection
+    with a change stream, delivering each insert to the local broker. A TTL
+    index keeps the collection short; it is only a relay.
+    """
+
+    def __init__(self, broker, collection, ttl_seconds=3600, retry_delay=1.0):
+        self.broker = broker
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.retry_delay = retry_delay
+        self._task = None
+
+    def wants(self, user_id):
+        # Other workers may hold connections for this user
+        return True
+
+    async def publish(self, message):
+        await self.collection.insert_one({**message, "created_at": datetime.now(timezone.utc)})
+
+    async def start(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _tail(self):
+        resume_token = None
+        while True:
+            try:
+                async with self.collection.watch(
+                    [{"$match": {"operationType": "insert"}}], resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = change["_id"]
+                        document = change["fullDocument"]
+                        self.broker.deliver(
+                            {"user_id": document["user_id"], "event": document["event"], "data": document["data"]}
+                        )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Change stream interrupted, resuming")
+                await asyncio.sleep(self.retry_delay)
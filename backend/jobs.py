@@ -0,0 +1,229 @@
+"""
+In-process background jobs: derived data and maintenance off the request path.
+
+A JobRunner owns a few worker tasks and a queue of (job name, key) items.
+The key is usually a user id; global jobs use None.
+- Coalescing: enqueueing an item that is already queued, or waiting to be
+  retried, is a no-op. Enqueueing one that is running schedules a single
+  rerun after it finishes, so changes made during the run are not missed.
+- Bounded: at most `concurrency` jobs run at once and at most `max_pending`
+  items wait. Past that, enqueue drops the item and says so.
+- Retries: a failed run is retried `retries` times, `backoff` seconds
+  doubling each time. Enqueues in the meantime coalesce into the retry.
+- Periodic: jobs registered with `every` are enqueued every that many
+  seconds, starting one interval after start().
+
+Queued work lives in memory only. Everything here is meant to be safe to
+lose on a restart: the next write or tick enqueues it again.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name, func, retries=3, backoff=1.0, every=None, keyed=False):
+        self.name = name
+        self.func = func
+        self.retries = retries
+        self.backoff = backoff
+        self.every = every
+        self.keyed = keyed
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.seconds = 0.0
+        self.last_started_at = None
+        self.last_duration = None
+        self.last_error = None
+        self.last_error_at = None
+
+    def status(self):
+        runs = self.succeeded + self.failed + self.retried
+        return {
+            "keyed": self.keyed,
+            "every_seconds": self.every,
+            "retries": self.retries,
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "last_started_at": self.last_started_at,
+            "last_duration_ms": round(self.last_duration * 1000, 2) if self.last_duration is not None else None,
+            "avg_duration_ms": round(self.seconds / runs * 1000, 2) if runs else None,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
+
+
+class JobRunner:
+    def __init__(self, concurrency=2, max_pending=10000, clock=time.monotonic):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.clock = clock
+        self.jobs = {}
+        self._queue = asyncio.Queue()
+        # item -> attempt number, for items queued or waiting for a retry
+        self._pending = {}
+        self._running = set()
+        self._rerun = set()
+        self._workers = []
+        self._timers = set()
+        self._closing = False
+
+    def register(self, name, func, retries=3, backoff=1.0, every=None, keyed=False):
+        """func(key) for keyed jobs, func() otherwise; an async callable."""
+        self.jobs[name] = Job(name, func, retries, backoff, every, keyed)
+
+    def enqueue(self, name, key=None):
+        """Queue a run; False if it coalesced into a queued one or was dropped."""
+        job = self.jobs[name]
+        item = (name, key)
+        if self._closing:
+            job.dropped += 1
+            return False
+        if item in self._pending:
+            job.coalesced += 1
+            return False
+        if item in self._running:
+            if item in self._rerun:
+                job.coalesced += 1
+                return False
+            self._rerun.add(item)
+            job.enqueued += 1
+            return True
+        if len(self._pending) >= self.max_pending:
+            job.dropped += 1
+            logger.warning("Job queue full, dropping %s %s", name, key)
+            return False
+        self._pending[item] = 0
+        self._queue.put_nowait(item)
+        job.enqueued += 1
+        return True
+
+    def start(self):
+        self._closing = False
+        # A fresh queue for this event loop, holding whatever was enqueued before
+        self._queue = asyncio.Queue()
+        for item in self._pending:
+            self._queue.put_nowait(item)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        for job in self.jobs.values():
+            if job.every:
+                self._spawn(self._tick(job))
+
+    async def stop(self, timeout=10.0):
+        """Stop taking work, give running jobs up to timeout seconds, then cancel."""
+        self._closing = True
+        for task in list(self._timers):
+            task.cancel()
+        deadline = self.clock() + timeout
+        while self._running and self.clock() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._timers, return_exceptions=True)
+        self._workers = []
+
+    async def drain(self):
+        """Wait until nothing is queued or running; for tests and scripts."""
+        while self._pending or self._running or self._rerun:
+            await asyncio.sleep(0.01)
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._timers.add(task)
+        task.add_done_callback(self._timers.discard)
+
+    async def _tick(self, job):
+        while True:
+            await asyncio.sleep(job.every)
+            self.enqueue(job.name)
+
+    async def _retry_later(self, item, delay):
+        await asyncio.sleep(delay)
+        self._queue.put_nowait(item)
+
+    async def _work(self):
+        while True:
+            item = await self._queue.get()
+            attempt = self._pending.pop(item)
+            self._running.add(item)
+            try:
+                await self._run(item, attempt)
+            finally:
+                self._running.discard(item)
+                if item in self._rerun:
+                    self._rerun.discard(item)
+                    # A failed run's pending retry already covers the rerun
+                    if item not in self._pending and not self._closing:
+                        self._pending[item] = 0
+                        self._queue.put_nowait(item)
+
+    async def _run(self, item, attempt):
+        name, key = item
+        job = self.jobs[name]
+        job.last_started_at = datetime.now(timezone.utc)
+        started = self.clock()
+        try:
+            await (job.func(key) if job.keyed else job.func())
+        except Exception as error:
+            job.last_error = f"{type(error).__name__}: {error}"
+            job.last_error_at = datetime.now(timezone.utc)
+            if attempt < job.retries and not self._closing:
+                job.retried += 1
+                self._pending[item] = attempt + 1
+                self._spawn(self._retry_later(item, job.backoff * 2 ** attempt))
+            else:
+                job.failed += 1
+                logger.exception("Job %s %s failed after %d attempts", name, key, attempt + 1)
+        else:
+            job.succeeded += 1
+        finally:
+            job.last_duration = self.clock() - started
+            job.seconds += job.last_duration
+
+    def status(self):
+        queued = {}
+        for name, _ in self._pending:
+            queued[name] = queued.get(name, 0) + 1
+        running = {}
+        for name, _ in self._running:
+            running[name] = running.get(name, 0) + 1
+        return {
+            "concurrency": self.concurrency,
+            "queued": len(self._pending),
+            "running": len(self._running),
+            "jobs": {
+                name: {"queued": queued.get(name, 0), "running": running.get(name, 0), **job.status()}
+                for name, job in self.jobs.items()
+            },
+        }
+
+    def collect(self):
+        """Metrics in the registry's collector format."""
+        status = self.status()["jobs"]
+        jobs = self.jobs.values()
+        return [
+            ("jobs_queued", "gauge", "Background jobs waiting to run, by job.",
+             {(name,): row["queued"] for name, row in status.items()}, ("job",)),
+            ("jobs_running", "gauge", "Background jobs running, by job.",
+             {(name,): row["running"] for name, row in status.items()}, ("job",)),
+            ("jobs_runs_total", "counter", "Background job runs, by job and outcome.",
+             {(job.name, outcome): getattr(job, outcome) for job in jobs
+              for outcome in ("succeeded", "failed", "retried")}, ("job", "outcome")),
+            ("jobs_skipped_total", "counter", "Enqueues that coalesced or were dropped, by job and reason.",
+             {(job.name, reason): getattr(job, reason) for job in jobs
+              for reason in ("coalesced", "dropped")}, ("job", "reason")),
+            ("jobs_seconds_total", "counter", "Time spent running background jobs, by job.",
+             {(job.name,): job.seconds for job in jobs}, ("job",)),
+        ]
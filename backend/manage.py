@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the Trading Journal backend.
+
+    python manage.py rebuild-stats [--user USER_ID]
+    python manage.py check-stats [--user USER_ID]
+    python manage.py migrate-dates
+    python manage.py import-prices FILE [FILE ...] [--pair PAIR]
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+import server
+
+MIGRATION_BATCH_SIZE = 1000
+
+
+async def user_ids(user_id=None):
+    if user_id:
+        return [user_id]
+    return await server.storage.trade_user_ids()
+
+
+async def rebuild_stats(args):
+    for user_id in await user_ids(args.user):
+        stats = await server.rebuild_user_stats(user_id)
+        print(f"{user_id}: {stats['total_trades']} trades, P&L {round(stats['total_pnl'], 2)}")
+    return 0
+
+
+async def check_stats(args):
+    drifted = 0
+    for user_id in await user_ids(args.user):
+        mismatches = await server.check_user_stats(user_id)
+        day_mismatches = await server.check_daily_rollups(user_id)
+        if mismatches or day_mismatches:
+            drifted += 1
+            for field, (stored, actual) in mismatches.items():
+                print(f"{user_id}: {field} stored={stored} actual={actual}")
+            for day, (stored, actual) in sorted(day_mismatches.items()):
+                print(f"{user_id}: rollup {day} stored={stored} actual={actual}")
+    print(f"{drifted} user(s) with inconsistent stats")
+    return 1 if drifted else 0
+
+
+def to_bson_timestamp(value):
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def migrate_collection(collection, date_fields, timestamp_fields):
+    fields = date_fields + timestamp_fields
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    migrated = 0
+    updates = []
+    async for doc in collection.find(query, {field: 1 for field in fields}):
+        changes = {}
+        for field in date_fields:
+            if isinstance(doc.get(field), str):
+                changes[field] = server.to_mongo_date(server.from_mongo_date(doc[field]))
+        for field in timestamp_fields:
+            if isinstance(doc.get(field), str):
+                changes[field] = to_bson_timestamp(doc[field])
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if len(updates) >= MIGRATION_BATCH_SIZE:
+            await collection.bulk_write(updates, ordered=False)
+            migrated += len(updates)
+            updates = []
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+        migrated += len(updates)
+    return migrated
+
+
+async def migrate_dates(args):
+    """Convert ISO-string dates to native BSON dates. Safe to re-run."""
+    if server.storage.name != "mongo":
+        # The other backends never stored the string format
+        print(f"nothing to migrate on the {server.storage.name} backend")
+        return 0
+    db = server.storage.db
+    trades = await migrate_collection(db.trades, ["date"], ["created_at", "updated_at"])
+    users = await migrate_collection(db.users, [], ["created_at"])
+    print(f"migrated {trades} trade(s) and {users} user(s)")
+    # Daily rollups are keyed by the trade date, so rebuild them in the new format
+    if trades:
+        await rebuild_stats(args)
+    return 0
+
+
+async def import_prices(args):
+    """Convert CSV/Parquet price files into the memory-mapped store. Safe to re-run."""
+    if not args.paths:
+        print("no price files given")
+        return 1
+    for path in args.paths:
+        for pair, rows in server.price_store.ingest(path, args.pair).items():
+            print(f"{path}: {pair} now has {rows} price(s)")
+    return 0
+
+
+COMMANDS = {
+    "rebuild-stats": rebuild_stats,
+    "check-stats": check_stats,
+    "migrate-dates": migrate_dates,
+    "import-prices": import_prices,
+}
+
+
+async def run(command, args):
+    # The embedded backends create their schema here, as the app does on startup
+    await server.storage.ensure_indexes()
+    try:
+        return await COMMANDS[command](args)
+    finally:
+        await server.storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trading Journal maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("paths", nargs="*", help="price files for import-prices")
+    parser.add_argument("--user", help="limit the command to a single user id")
+    parser.add_argument("--pair", help="pair of price files without a pair/symbol column")
+    args = parser.parse_args()
+
+    try:
+        return asyncio.run(run(args.command, args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+Content-addressed storage for uploaded chart images.
+
+Uploads are streamed to disk in chunks while being hashed, then stored as
+<sha256>.<ext>, so the same image uploaded twice is kept once and a
+filename always identifies exactly one content.
+
+Resized derivatives (thumbnails, previews) are rendered in a bounded process
+pool so image decoding never runs on the event loop, and cached on disk
+under derivatives/<size>/.
+
+Because a stored file never changes, serve_file() can hand out strong ETags
+and year-long immutable caching, and answers conditional and range requests
+without reading more of the file than asked for.
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import multiprocessing
+import os
+import re
+import stat
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import aiofiles
+import aiofiles.os
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+UPLOAD_URL_PREFIX = "/uploads/"
+CHUNK_SIZE = 256 * 1024
+
+# Longest edge in pixels for each derivative size
+DERIVATIVE_SIZES = {
+    "thumb": 320,
+    "preview": 1280,
+}
+DERIVATIVE_FORMAT = "webp"
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI; caps the request body of the given paths while it arrives.
+
+    Form parsing spools a whole multipart body before the endpoint runs, so a
+    limit checked in the endpoint comes too late. Here a declared
+    Content-Length is checked up front (400 if malformed, 413 if too large)
+    and the bytes actually received are counted, which also covers chunked
+    bodies that declare no length.
+    """
+
+    def __init__(self, app, paths, max_bytes):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = -1
+                if declared < 0:
+                    return await JSONResponse({"detail": "Invalid Content-Length header"}, 400)(scope, receive, send)
+                if declared > self.max_bytes:
+                    return await JSONResponse({"detail": "File too large"}, 413)(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised into whatever is reading the body; FastAPI re-raises it
+                    # from form parsing and answers it like one from the endpoint
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def safe_extension(filename):
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return extension if re.fullmatch(r"[a-z0-9]{1,8}", extension) else "bin"
+
+
+def upload_name(url):
+    """The stored filename behind a chart_image_url, or None if it isn't ours."""
+    if not url or not url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    name = url[len(UPLOAD_URL_PREFIX):]
+    return name if name and "/" not in name and not name.startswith(".") else None
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def upload_etag(name, size=None):
+    # The filename already identifies the content, so it doubles as a strong ETag
+    stem = name.rsplit(".", 1)[0]
+    return f'"{stem}-{size}"' if size else f'"{stem}"'
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # If-None-Match uses weak comparison
+    opaque = etag.removeprefix("W/")
+    return "*" in candidates or opaque in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None to ignore, False if unsatisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        # Multipart ranges are optional; a full 200 response is a valid answer
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return False
+    return start, min(end, size - 1)
+
+
+async def iter_file_range(path, start, end):
+    remaining = end - start + 1
+    async with aiofiles.open(path, "rb") as source:
+        await source.seek(start)
+        while remaining > 0:
+            chunk = await source.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def serve_file(request, path, etag, accel_redirect=None):
+    """Serve an immutable stored file; None if it isn't a regular file.
+
+    With accel_redirect set, the body is left to the front proxy
+    (nginx X-Accel-Redirect), which streams it with sendfile.
+    """
+    try:
+        stat_result = await aiofiles.os.stat(path)
+    except FileNotFoundError:
+        return None
+    # A directory (such as derivatives/) would get headers, then fail to stream
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if accel_redirect:
+        headers["X-Accel-Redirect"] = accel_redirect
+        return Response(headers=headers, media_type=media_type)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        byte_range = parse_range(range_header, stat_result.st_size)
+        if byte_range is False:
+            headers["Content-Range"] = f"bytes */{stat_result.st_size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            if request.method == "HEAD":
+                return Response(status_code=206, headers=headers, media_type=media_type)
+            return StreamingResponse(
+                iter_file_range(path, start, end), status_code=206, headers=headers, media_type=media_type
+            )
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result)
+
+
+def derivative_path(upload_dir, name, size):
+    stem = name.rsplit(".", 1)[0]
+    return upload_dir / "derivatives" / size / f"{stem}.{DERIVATIVE_FORMAT}"
+
+
+async def delete_upload(upload_dir, name):
+    paths = [upload_dir / name] + [derivative_path(upload_dir, name, size) for size in DERIVATIVE_SIZES]
+    for path in paths:
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def store_upload(file, upload_dir, max_bytes):
+    """Stream an UploadFile into upload_dir under its content hash.
+
+    Returns (filename, size, created); created is False when identical
+    content was already stored. Raises UploadTooLarge as soon as more than
+    max_bytes have been read.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = upload_dir / f".upload-{uuid.uuid4().hex}"
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                await out.write(chunk)
+
+        filename = f"{digest.hexdigest()}.{safe_extension(file.filename)}"
+        final_path = upload_dir / filename
+        if await aiofiles.os.path.exists(final_path):
+            await aiofiles.os.remove(temp_path)
+            return filename, size, False
+        await aiofiles.os.replace(temp_path, final_path)
+        return filename, size, True
+    except BaseException:
+        if await aiofiles.os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+        raise
+
+
+def render_derivative(source, target, max_dimension):
+    """Resize source into target; runs in a worker process.
+
+    Returns False when the source is not an image Pillow can decode.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(source) as image:
+            image.thumbnail((max_dimension, max_dimension))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp_target = f"{target}.{uuid.uuid4().hex}.tmp"
+            image.save(temp_target, format=DERIVATIVE_FORMAT.upper(), quality=80)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+    os.replace(temp_target, target)
+    return True
+
+
+class DerivativeRenderer:
+    """Renders derivatives on a bounded process pool, one job per file and size."""
+
+    def __init__(self, upload_dir, max_workers):
+        self.upload_dir = upload_dir
+        self.max_workers = max_workers
+        self._pool = None
+        self._pending = {}
+        self._background = set()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # spawn: workers must not inherit the server's event loop or Mongo sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def ensure(self, name, size):
+        """Path of the derivative, rendering it first if needed; None if impossible."""
+        target = derivative_path(self.upload_dir, name, size)
+        if await aiofiles.os.path.exists(target):
+            return target
+
+        job = self._pending.get(target)
+        if job is None:
+            loop = asyncio.get_running_loop()
+            job = loop.run_in_executor(
+                self.pool, render_derivative, str(self.upload_dir / name), str(target), DERIVATIVE_SIZES[size]
+            )
+            self._pending[target] = job
+            job.add_done_callback(lambda _: self._pending.pop(target, None))
+        # Shielded so a client disconnect doesn't cancel a render others wait on
+        rendered = await asyncio.shield(job)
+        return target if rendered else None
+
+    def schedule(self, name):
+        """Render every size in the background after an upload."""
+        for size in DERIVATIVE_SIZES:
+            task = asyncio.create_task(self.ensure(name, size))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,224 @@
+"""
+Low-overhead request and MongoDB metrics in the Prometheus text format.
+
+Latencies go into fixed-bucket histograms: an observation is one bisect and
+two additions, with no per-request allocation beyond the label tuple.
+Percentiles are estimated from the buckets only when /api/metrics is
+scraped, so the hot path never sorts anything.
+
+Labels use route templates ("/api/trades/{trade_id}"), never raw paths, so
+the number of series stays bounded.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+# Seconds; fine-grained at the low end where most requests and commands land
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def format_labels(names, values):
+    pairs = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+
+
+class Histogram:
+    """Prometheus histogram plus p50/p95/p99 gauges estimated from its buckets."""
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS, quantiles=QUANTILES):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.quantiles = quantiles
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def quantile(self, counts, q):
+        """Linear interpolation within the bucket holding the q-th observation."""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    # Beyond the last bound all we know is "more than that"
+                    return float(self.buckets[-1])
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return float(self.buckets[-1])
+
+    def render(self):
+        with self._lock:
+            snapshot = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        names = self.label_names
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels((*names, 'le'), (*labels, bound))} {cumulative}"
+            yield f"{self.name}_sum{format_labels(names, labels)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(names, labels)} {cumulative}"
+        if self.quantiles:
+            yield f"# HELP {self.name}_quantile Estimated from the {self.name} buckets"
+            yield f"# TYPE {self.name}_quantile gauge"
+            for labels, (counts, _) in sorted(snapshot.items()):
+                for q in self.quantiles:
+                    value = self.quantile(counts, q)
+                    yield f"{self.name}_quantile{format_labels((*names, 'quantile'), (*labels, q))} {format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() returns [(name, type, help, {label tuple: value}, label names)] at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, metric_type, help_text, values, label_names in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in sorted(values.items()):
+                    lines.append(f"{name}{format_labels(label_names, labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("route", "method")
+))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size by route.", ("route", "method"),
+    buckets=SIZE_BUCKETS, quantiles=(),
+))
+mongo_latency = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command.",
+    ("collection", "command"),
+))
+mongo_failures = registry.register(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection and command.",
+    ("collection", "command"),
+))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router leaves the matched route on the scope
+            route = scope.get("route")
+            route_label = route.path if route is not None else "unmatched"
+            labels = (route_label, scope["method"])
+            http_latency.observe(time.perf_counter() - start, labels)
+            http_response_size.observe(size, labels)
+            http_requests.inc((route_label, scope["method"], str(status)))
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command Motor sends; pass to the client's event_listeners.
+
+    Called from Motor's executor threads, so it only does dictionary work.
+    """
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            # getMore carries the cursor id first and the collection separately
+            collection = event.command.get("collection", "")
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_latency.observe(event.duration_micros / 1e6, (collection, event.command_name))
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        labels = (collection, event.command_name)
+        mongo_latency.observe(event.duration_micros / 1e6, labels)
+        mongo_failures.inc(labels)
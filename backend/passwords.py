@@ -0,0 +1,86 @@
+"""
+Password hashing with bcrypt, off the event loop.
+
+bcrypt is deliberately slow (around 250 ms at cost 12), so every hash and
+check runs on a small thread pool. bcrypt releases the GIL while it works,
+which lets the event loop keep serving other requests during a login storm.
+The pool size bounds how many CPUs logins can take.
+
+Passwords are SHA-256'd and base64-encoded before bcrypt. This lifts
+bcrypt's 72-byte input limit without truncating silently.
+
+Hashes from the old scheme, a peppered SHA-256 hex digest, still verify.
+They are reported as needing a rehash so that login can upgrade them.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+LEGACY_HASH = re.compile(r"[0-9a-f]{64}")
+
+
+def prehash(password):
+    return base64.b64encode(hashlib.sha256(password.encode()).digest())
+
+
+def bcrypt_rounds(hashed):
+    # "$2b$12$..." -> 12
+    return int(hashed.split("$")[2])
+
+
+class PasswordHasher:
+    def __init__(self, rounds=12, max_workers=4, legacy_secret=""):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.legacy_secret = legacy_secret
+        self._pool = None
+        # Checked against when the user doesn't exist, so timing doesn't tell
+        self._dummy_hash = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._pool
+
+    async def _run(self, fn, *args):
+        if self.max_workers <= 0:
+            # Inline on the event loop; only for tests and benchmarks
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def _hash(self, password):
+        return bcrypt.hashpw(prehash(password), bcrypt.gensalt(self.rounds)).decode()
+
+    def _check(self, password, hashed):
+        return bcrypt.checkpw(prehash(password), hashed.encode())
+
+    def _legacy_hash(self, password):
+        return hashlib.sha256((password + self.legacy_secret).encode()).hexdigest()
+
+    async def hash(self, password):
+        return await self._run(self._hash, password)
+
+    async def verify(self, password, hashed):
+        """(matches, needs_rehash) for a stored hash; hashed may be None."""
+        if hashed and LEGACY_HASH.fullmatch(hashed):
+            matches = hmac.compare_digest(self._legacy_hash(password), hashed)
+            return matches, matches
+        if not hashed or not hashed.startswith("$2"):
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hash("dummy password")
+            await self._run(self._check, password, self._dummy_hash)
+            return False, False
+        matches = await self._run(self._check, password, hashed)
+        return matches, matches and bcrypt_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
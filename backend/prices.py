@@ -0,0 +1,241 @@
+"""
+Local price store and mark-to-market for open trades.
+
+Price files (OHLC bars or ticks, CSV or Parquet) are converted once into one
+NumPy file per pair. Each file holds a (2, n) float64 array:
+- row 0: epoch milliseconds, ascending (exact in float64 until year 287396)
+- row 1: the close or tick price
+
+The files are opened memory-mapped. A lookup is a binary search on row 0 and
+touches a handful of pages, whatever the file size. Re-importing replaces a
+file atomically. Readers notice the change within check_interval seconds
+and reopen the file.
+
+Open positions are marked in one vectorized pass:
+- one search per distinct pair
+- then array arithmetic over all positions
+"""
+
+import csv
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+TIME_COLUMNS = ("timestamp", "time", "datetime", "date")
+PRICE_COLUMNS = ("close", "price", "last", "mid")
+PAIR_COLUMNS = ("pair", "symbol")
+
+
+def pair_key(pair):
+    """File-safe key for a pair: "EUR/USD" and "eur_usd" share "EUR_USD"."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", pair).strip("_").upper()
+
+
+def to_epoch_ms(value):
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        text = str(value).strip()
+        if re.fullmatch(r"\d+(\.\d+)?", text):
+            # Bare numbers are epoch seconds, as most tick exports write them
+            return int(float(text) * 1000)
+        moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def from_epoch_ms(value):
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+
+
+def find_column(names, candidates, path):
+    lowered = {name.lower(): name for name in names}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise ValueError(f"{path}: no {' / '.join(candidates)} column")
+
+
+def read_csv(path, pair=None):
+    """{pair: (epoch_ms list, price list)} from a CSV file."""
+    columns = {}
+    with open(path, newline="") as handle:
+        reader = csv.DictReader(handle)
+        names = reader.fieldnames or []
+        time_column = find_column(names, TIME_COLUMNS, path)
+        price_column = find_column(names, PRICE_COLUMNS, path)
+        pair_column = next((name for name in names if name.lower() in PAIR_COLUMNS), None)
+        for row in reader:
+            row_pair = row[pair_column] if pair_column else pair
+            times, prices = columns.setdefault(row_pair, ([], []))
+            times.append(to_epoch_ms(row[time_column]))
+            prices.append(float(row[price_column]))
+    return columns
+
+
+def read_parquet(path, pair=None):
+    """{pair: (epoch_ms array, price array)} from a Parquet file (needs pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    time_column = find_column(table.column_names, TIME_COLUMNS, path)
+    price_column = find_column(table.column_names, PRICE_COLUMNS, path)
+    pair_column = next((name for name in table.column_names if name.lower() in PAIR_COLUMNS), None)
+
+    times = table[time_column]
+    if pa.types.is_timestamp(times.type):
+        times = pc.cast(times, pa.timestamp("ms", tz=times.type.tz)).to_numpy().astype("datetime64[ms]").astype(np.int64)
+    else:
+        times = np.array([to_epoch_ms(value) for value in times.to_pylist()], dtype=np.int64)
+    prices = table[price_column].to_numpy().astype(float)
+    if pair_column is None:
+        return {pair: (times, prices)}
+    pairs = np.array(table[pair_column].to_pylist(), dtype=object)
+    return {value: (times[pairs == value], prices[pairs == value]) for value in np.unique(pairs)}
+
+
+class PriceStore:
+    def __init__(self, directory, check_interval=1.0):
+        self.directory = Path(directory)
+        self.check_interval = check_interval
+        # key -> (checked_at, mtime_ns, times, prices)
+        self._series = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def pairs(self):
+        if not self.directory.is_dir():
+            return []
+        return sorted(path.stem for path in self.directory.glob("*.npy"))
+
+    def _load(self, key):
+        now = time.monotonic()
+        cached = self._series.get(key)
+        if cached is not None and now - cached[0] < self.check_interval:
+            return cached
+        path = self._path(key)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._series.pop(key, None)
+            return None
+        if cached is None or cached[1] != mtime:
+            # Plain ndarray views of the map skip np.memmap's per-access overhead
+            series = np.load(path, mmap_mode="r").view(np.ndarray)
+            cached = (now, mtime, series[0], series[1])
+        else:
+            cached = (now,) + cached[1:]
+        self._series[key] = cached
+        return cached
+
+    def series(self, pair):
+        """(epoch_ms, prices) arrays for a pair, or None if there are no prices."""
+        cached = self._load(pair_key(pair))
+        return cached[2:] if cached else None
+
+    def price_at(self, pair, at_ms):
+        """(price, epoch_ms) of the last price at or before at_ms, or None."""
+        cached = self._load(pair_key(pair))
+        if cached is None:
+            return None
+        times, prices = cached[2:]
+        index = int(times.searchsorted(at_ms, side="right")) - 1
+        if index < 0:
+            return None
+        return float(prices[index]), int(times[index])
+
+    def write(self, pair, times, prices):
+        """Merge prices into a pair's file; on equal timestamps the new price wins."""
+        times = np.asarray(times, dtype=float)
+        prices = np.asarray(prices, dtype=float)
+        # Read the file itself, not a cached map that may be up to check_interval old
+        self._series.pop(pair_key(pair), None)
+        existing = self.series(pair)
+        if existing is not None:
+            times = np.concatenate((existing[0], times))
+            prices = np.concatenate((existing[1], prices))
+        order = np.argsort(times, kind="stable")
+        times, prices = times[order], prices[order]
+        # Keep the last row of every run of equal timestamps
+        last = np.append(times[1:] != times[:-1], True)
+        merged = np.stack((times[last], prices[last]))
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        key = pair_key(pair)
+        # Atomic swap: open memory maps keep reading the old file until they reload
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".prices-", suffix=".npy")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                np.save(handle, merged)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._series.pop(key, None)
+        return merged.shape[1]
+
+    def ingest(self, path, pair=None):
+        """Import a CSV or Parquet price file; returns {pair: rows stored}.
+
+        Files without a pair/symbol column are stored under pair, or the
+        file name without its extension (EUR_USD.csv is "EUR/USD").
+        """
+        path = Path(path)
+        pair = pair or path.stem
+        reader = read_parquet if path.suffix.lower() == ".parquet" else read_csv
+        return {
+            pair_key(name): self.write(name, times, prices)
+            for name, (times, prices) in reader(path, pair).items()
+        }
+
+
+@dataclass
+class OpenPositions:
+    ids: list
+    pairs: list  # distinct pair keys
+    pair_index: np.ndarray  # position -> index into pairs
+    entry: np.ndarray
+    quantity: np.ndarray
+    direction: np.ndarray  # 1.0 long, -1.0 short
+
+    @classmethod
+    def from_documents(cls, docs):
+        n = len(docs)
+        codes = {}
+        pair_index = np.fromiter(
+            (codes.setdefault(pair_key(doc.get("pair") or ""), len(codes)) for doc in docs), np.intp, n
+        )
+        return cls(
+            ids=[doc["id"] for doc in docs],
+            pairs=list(codes),
+            pair_index=pair_index,
+            entry=np.fromiter((doc.get("entry_price") or 0.0 for doc in docs), float, n),
+            quantity=np.fromiter((doc.get("quantity") or 0.0 for doc in docs), float, n),
+            direction=np.fromiter((-1.0 if doc.get("trade_type") == "Short" else 1.0 for doc in docs), float, n),
+        )
+
+
+def mark_to_market(positions, store, at_ms):
+    """Mark price, price time (epoch ms, -1 if unpriced) and unrealized P&L per position.
+
+    Positions without a price at or before at_ms get NaN.
+    """
+    pair_prices = np.full(len(positions.pairs), np.nan)
+    pair_times = np.full(len(positions.pairs), -1, dtype=np.int64)
+    for index, pair in enumerate(positions.pairs):
+        found = store.price_at(pair, at_ms)
+        if found is not None:
+            pair_prices[index], pair_times[index] = found
+    mark = pair_prices[positions.pair_index]
+    unrealized = (mark - positions.entry) * positions.quantity * positions.direction
+    return mark, pair_times[positions.pair_index], unrealized
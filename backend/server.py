@@ -1,52 +1,183 @@
-from fastapi import FastAPI, HTTPException, Depends, APIRouter, File, UploadFile
+from fastapi import FastAPI, HTTPException, Depends, APIRouter, File, UploadFile, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, ValidationError
 from typing import List, Optional
-from datetime import datetime, timedelta, timezone, date, time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone, date
 from jose import JWTError, jwt
+import asyncio
 import os
 import uuid
 import logging
-import shutil
+import math
+import time
 import hashlib
+import base64
+import json
+import orjson
 from pathlib import Path
 
+from admission import AdmissionController, AdmissionMiddleware, RouteClass, TokenBuckets
+from analytics import ANALYTICS_FIELDS, AnalyticsCache, TradeColumns, compute_analytics
+from cache import TTLCache
+from events import ChangeStreamEventSource, EventBroker, LocalEventSource, encode_message, format_sse
+from jobs import JobRunner
+from media import (
+    UPLOAD_URL_PREFIX,
+    BodySizeLimitMiddleware,
+    DerivativeRenderer,
+    UploadTooLarge,
+    delete_upload,
+    etag_matches,
+    serve_file,
+    store_upload,
+    upload_etag,
+    upload_name,
+)
+from metrics import CommandMetrics, MetricsMiddleware, registry as metrics_registry
+from passwords import PasswordHasher
+from prices import OpenPositions, PriceStore, from_epoch_ms, mark_to_market, to_epoch_ms
+from storage import STAT_FIELDS, DuplicateError, TradeFilter, create_storage, to_mongo_date
+from trade_io import EXPORT_WRITERS, ROW_READERS, iter_batches, parquet_available
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection. Pool settings come from these variables, which override
+# the same options in MONGO_URL; a setting without a default keeps the driver's.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_POOL_SETTINGS = {
+    "maxPoolSize": ('MONGO_MAX_POOL_SIZE', '100'),
+    "minPoolSize": ('MONGO_MIN_POOL_SIZE', '10'),
+    "maxIdleTimeMS": ('MONGO_MAX_IDLE_TIME_MS', None),
+    "waitQueueTimeoutMS": ('MONGO_WAIT_QUEUE_TIMEOUT_MS', None),
+    "connectTimeoutMS": ('MONGO_CONNECT_TIMEOUT_MS', '5000'),
+    "serverSelectionTimeoutMS": ('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'),
+}
+mongo_options = {
+    option: int(value)
+    for option, (variable, default) in MONGO_POOL_SETTINGS.items()
+    if (value := os.environ.get(variable, default))
+}
+command_metrics = CommandMetrics()
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[command_metrics], **mongo_options)
 db = client[os.environ['DB_NAME']]
 
+# Everything but the change feed goes through the repository. STORAGE_BACKEND
+# picks mongo (default), sqlite (SQLITE_PATH) or memory; see storage/.
+storage = create_storage(db)
+
 # JWT and password settings
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
-# Password hashing functions (simple but secure for demo)
-def get_password_hash(password):
-    return hashlib.sha256((password + SECRET_KEY).encode()).hexdigest()
+# Password hashing: bcrypt on a bounded thread pool. Old SHA-256 hashes (peppered
+# with SECRET_KEY) still verify and are upgraded on the next login.
+password_hasher = PasswordHasher(
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', '12')),
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1)))),
+    legacy_secret=SECRET_KEY,
+)
 
-def verify_password(plain_password, hashed_password):
-    return hashlib.sha256((plain_password + SECRET_KEY).encode()).hexdigest() == hashed_password
 security = HTTPBearer()
 
+# Validated users by id, so authenticated requests skip the users lookup
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('USER_CACHE_TTL', '60')),
+)
+# Per-user data versions, refreshed by local writes; the short TTL bounds how
+# long another worker's write can go unnoticed
+version_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('DATA_VERSION_TTL', '5')),
+)
+analytics_cache = AnalyticsCache(max_users=int(os.environ.get('ANALYTICS_CACHE_USERS', '1024')))
+
+# Memory-mapped price files for marking open trades to market; fill it with
+# `python manage.py import-prices FILE...`
+price_store = PriceStore(os.environ.get('PRICE_DIR', str(ROOT_DIR / "prices")))
+
+# Bulk import settings
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', '1000'))
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
 # Create uploads directory
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+# Room for the multipart boundaries and part headers around the file
+UPLOAD_BODY_OVERHEAD = 64 * 1024
+# e.g. "/protected-uploads/" to let nginx send files via X-Accel-Redirect
+UPLOADS_ACCEL_REDIRECT = os.environ.get('UPLOADS_ACCEL_REDIRECT')
+derivative_renderer = DerivativeRenderer(UPLOAD_DIR, max_workers=int(os.environ.get('THUMBNAIL_WORKERS', '2')))
+
+# Change feed: "local" for a single worker, "mongo" to share events between
+# workers through a change stream (needs a replica set)
+EVENT_KEEPALIVE_SECONDS = float(os.environ.get('EVENT_KEEPALIVE_SECONDS', '15'))
+event_broker = EventBroker(queue_size=int(os.environ.get('EVENT_QUEUE_SIZE', '100')))
+if os.environ.get('EVENT_SOURCE', 'local') == 'mongo':
+    event_source = ChangeStreamEventSource(event_broker, db.change_events)
+else:
+    event_source = LocalEventSource(event_broker)
+
+# Connections opened before the app reports ready, so the first requests
+# after a deploy don't each pay for a handshake
+WARM_CONNECTIONS = int(os.environ.get('WARM_CONNECTIONS', os.environ.get('MONGO_MIN_POOL_SIZE', '10')))
+READY_PING_TIMEOUT = float(os.environ.get('READY_PING_TIMEOUT', '2'))
+
+async def warm_up():
+    # Concurrent round trips each check out a connection of their own
+    await asyncio.gather(*(storage.ping() for _ in range(WARM_CONNECTIONS)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    await storage.ensure_indexes()
+    await warm_up()
+    await event_source.start()
+    jobs.start()
+    app.state.ready = True
+    logger.info("Ready in %.0f ms (%s storage)", (time.perf_counter() - started) * 1000, storage.name)
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        await jobs.stop()
+        await event_source.stop()
+        await storage.close()
+        client.close()
+        derivative_renderer.shutdown()
+        password_hasher.shutdown()
 
 # Create the main app
-app = FastAPI(title="Trading Journal API")
+app = FastAPI(title="Trading Journal API", lifespan=lifespan)
+app.state.ready = False
 api_router = APIRouter(prefix="/api")
 
+async def serve_upload(request: Request, path: Path, etag: str):
+    accel_redirect = None
+    if UPLOADS_ACCEL_REDIRECT:
+        accel_redirect = UPLOADS_ACCEL_REDIRECT + path.relative_to(UPLOAD_DIR).as_posix()
+    response = await serve_file(request, path, etag, accel_redirect)
+    if response is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return response
+
 # Serve uploaded files
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+@app.api_route("/uploads/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_upload_file(request: Request, filename: str):
+    name = upload_name(f"{UPLOAD_URL_PREFIX}{filename}")
+    if name is None or not (UPLOAD_DIR / name).is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    return await serve_upload(request, UPLOAD_DIR / name, upload_etag(name))
 
 # Models
 class UserCreate(BaseModel):
@@ -84,8 +215,11 @@ class TradeCreate(BaseModel):
     comments: Optional[str] = None
     chart_image_url: Optional[str] = None
 
+# Inside TradeUpdate the `date` field shadows the type before its annotation is evaluated
+TradeDate = date
+
 class TradeUpdate(BaseModel):
-    date: Optional[date] = None
+    date: Optional[TradeDate] = None
     pair: Optional[str] = None
     trade_type: Optional[str] = None
     entry_price: Optional[float] = None
@@ -116,6 +250,18 @@ class Trade(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class BulkTradeOperation(BaseModel):
+    id: str
+    action: str = Field(pattern="^(update|delete)$")
+    data: Optional[TradeUpdate] = None
+
+class BulkTradeRequest(BaseModel):
+    operations: List[BulkTradeOperation] = Field(min_length=1, max_length=1000)
+
+class TradePage(BaseModel):
+    trades: List[Trade]
+    next_cursor: Optional[str] = None
+
 # JWT token functions
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -143,44 +289,376 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"id": user_id})
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        return cached_user
+    
+    user = await storage.get_user(user_id)
     if user is None:
         raise credentials_exception
-    return User(**user)
+    user = User(**parse_from_mongo(user))
+    user_cache.put(user_id, user)
+    return user
+
+def invalidate_user(user_id: str):
+    """Call after any write to a users document."""
+    user_cache.invalidate(user_id)
+
+# Trade dates are stored as datetimes at midnight UTC (see to_mongo_date)
+def from_mongo_date(value) -> date:
+    # ISO strings are the pre-migration storage format
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
 
 def prepare_for_mongo(data):
-    if isinstance(data.get('date'), date):
-        data['date'] = data['date'].isoformat()
-    if isinstance(data.get('created_at'), datetime):
-        data['created_at'] = data['created_at'].isoformat()
-    if isinstance(data.get('updated_at'), datetime):
-        data['updated_at'] = data['updated_at'].isoformat()
+    if isinstance(data.get('date'), date) and not isinstance(data.get('date'), datetime):
+        data['date'] = to_mongo_date(data['date'])
     return data
 
 def parse_from_mongo(item):
-    if isinstance(item.get('date'), str):
-        item['date'] = datetime.fromisoformat(item['date']).date()
+    if item.get('date') is not None:
+        item['date'] = from_mongo_date(item['date'])
     if isinstance(item.get('created_at'), str):
         item['created_at'] = datetime.fromisoformat(item['created_at'])
     if isinstance(item.get('updated_at'), str):
         item['updated_at'] = datetime.fromisoformat(item['updated_at'])
     return item
 
+# Fast path for list endpoints: encode the stored rows straight to JSON bytes,
+# skipping a Trade model per row
+def encode_trade_list(trades, **extra):
+    for trade in trades:
+        parse_from_mongo(trade)
+    return orjson.dumps({"trades": trades, **extra}, option=orjson.OPT_UTC_Z)
+
+# Keyset pagination over (date desc, id asc), backed by an index in every backend
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(trade):
+    payload = json.dumps([from_mongo_date(trade["date"]).isoformat(), trade["id"]]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_date, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_date = to_mongo_date(date.fromisoformat(last_date))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_date, last_id
+
+# Per-user aggregates (STAT_FIELDS), maintained incrementally by the trade write handlers
+def stats_contribution(trade):
+    if trade is None:
+        return dict.fromkeys(STAT_FIELDS, 0)
+    pnl = trade.get("pnl") or 0
+    return {
+        "total_trades": 1,
+        "total_pnl": pnl,
+        "winning_trades": int(pnl > 0),
+        "losing_trades": int(pnl < 0),
+    }
+
+def stats_delta(before, after):
+    old, new = stats_contribution(before), stats_contribution(after)
+    return {field: new[field] - old[field] for field in STAT_FIELDS}
+
+def add_delta(total, delta):
+    for field, value in delta.items():
+        total[field] = total.get(field, 0) + value
+
+async def apply_trade_changes(user_id, changes):
+    """Fold (before, after) trade pairs into the user's aggregates.
+
+    A create is (None, trade), a delete is (trade, None). The stats document
+    gets one increment and the daily rollups one batched write, however many
+    trades changed.
+    """
+    if not changes:
+        return
+    analytics_cache.invalidate(user_id)
+    delta = {}
+    day_deltas = {}
+    for before, after in changes:
+        add_delta(delta, stats_delta(before, after))
+        # A trade that moved to another day leaves one rollup and joins another
+        for trade, sign in ((before, -1), (after, 1)):
+            if trade is not None:
+                contribution = stats_contribution(trade)
+                add_delta(day_deltas.setdefault(trade["date"], {}),
+                          {field: sign * value for field, value in contribution.items()})
+    
+    # Zero increments are kept so every rollup row carries all fields
+    await storage.increment_daily_rollups(user_id, day_deltas)
+    
+    await apply_upload_refs(changes)
+    
+    # Bumping the data version comes last, so a reader that sees the new
+    # version also sees every derived write above
+    delta = {field: value for field, value in delta.items() if value}
+    version = await storage.increment_user_stats(user_id, delta)
+    if version is None:
+        # No aggregates yet, yet the user may have trades from before they
+        # existed: build them from the trades, this change included
+        await rebuild_user_stats(user_id)
+        version = (await storage.get_user_stats(user_id))["version"]
+    version_cache.put(user_id, version)
+    
+    await publish_trade_changes(user_id, changes, delta, day_deltas, version)
+    
+    if any(needs_pnl(after) for _, after in changes):
+        jobs.enqueue("recompute_pnl", user_id)
+
+def trade_event_payload(trade):
+    return parse_from_mongo({key: value for key, value in trade.items() if key not in ("_id", "user_id")})
+
+async def publish_trade_changes(user_id, changes, delta, day_deltas, version):
+    """Push one "trades" event with the changed trades and the aggregate deltas."""
+    if not event_source.wants(user_id):
+        return
+    items = []
+    for before, after in changes:
+        if after is None:
+            items.append({"op": "deleted", "id": before["id"], "trade": None})
+        else:
+            items.append({"op": "created" if before is None else "updated", "id": after["id"],
+                          "trade": trade_event_payload(after)})
+    message = encode_message(user_id, "trades", {
+        "version": version,
+        "changes": items,
+        "stats": delta,
+        "days": [{"date": from_mongo_date(day), **day_delta} for day, day_delta in day_deltas.items()],
+    })
+    try:
+        await event_source.publish(message)
+    except Exception:
+        # The write already happened; clients catch up on their next fetch
+        logger.exception("Failed to publish change event")
+
+async def apply_upload_refs(changes):
+    """Reference-count chart images and delete files no trade points at any more."""
+    refs = {}
+    for before, after in changes:
+        old = upload_name(before.get("chart_image_url")) if before else None
+        new = upload_name(after.get("chart_image_url")) if after else None
+        if old != new:
+            if old:
+                refs[old] = refs.get(old, 0) - 1
+            if new:
+                refs[new] = refs.get(new, 0) + 1
+    
+    for name, delta in refs.items():
+        if not delta:
+            continue
+        if await storage.adjust_upload_refs(name, delta):
+            await delete_upload(UPLOAD_DIR, name)
+
+async def aggregate_stats(user_id, date_from=None, date_to=None, group_by=None):
+    """Sum trade stats in the store, one row per group (or a single row)."""
+    return await storage.aggregate_stats(user_id, date_from, date_to, group_by)
+
+def sum_stats(rows):
+    stats = dict.fromkeys(STAT_FIELDS, 0)
+    for row in rows:
+        for field in STAT_FIELDS:
+            stats[field] += row[field]
+    return stats
+
+async def compute_user_stats(user_id):
+    return sum_stats(await aggregate_stats(user_id))
+
+async def rebuild_user_stats(user_id):
+    """Recompute the stats document and daily rollups from the raw trades."""
+    days = await aggregate_stats(user_id, group_by="day")
+    await storage.replace_daily_rollups(user_id, [
+        {"date": row["_id"], **{field: row[field] for field in STAT_FIELDS}} for row in days
+    ])
+    
+    stats = sum_stats(days)
+    await storage.replace_user_stats(user_id, stats)
+    version_cache.invalidate(user_id)
+    analytics_cache.invalidate(user_id)
+    return stats
+
+async def check_user_stats(user_id):
+    """Return {field: (stored, actual)} for every aggregate that has drifted."""
+    stored = await storage.get_user_stats(user_id) or {}
+    actual = await compute_user_stats(user_id)
+    mismatches = {}
+    for field in STAT_FIELDS:
+        stored_value = stored.get(field, 0)
+        if abs(stored_value - actual[field]) > 1e-6:
+            mismatches[field] = (stored_value, actual[field])
+    return mismatches
+
+async def check_daily_rollups(user_id):
+    """Return {day: (stored, actual)} for every daily rollup that has drifted."""
+    stored = {row["date"]: row for row in await storage.find_daily_rollups(user_id)}
+    actual = {row["_id"]: row for row in await aggregate_stats(user_id, group_by="day")}
+    mismatches = {}
+    for day in stored.keys() | actual.keys():
+        stored_row = {field: stored.get(day, {}).get(field, 0) for field in STAT_FIELDS}
+        actual_row = {field: actual.get(day, {}).get(field, 0) for field in STAT_FIELDS}
+        if any(abs(stored_row[field] - actual_row[field]) > 1e-6 for field in STAT_FIELDS):
+            mismatches[day] = (stored_row, actual_row)
+    return mismatches
+
+# Background jobs (see jobs.py). Write handlers enqueue per-user work and
+# return; maintenance runs on a schedule. Inspect and trigger them through
+# /api/admin/jobs.
+jobs = JobRunner(
+    concurrency=int(os.environ.get('JOB_CONCURRENCY', '2')),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', '10000')),
+)
+# Registered uploads no trade picked up within this window are deleted
+UPLOAD_ORPHAN_GRACE_HOURS = float(os.environ.get('UPLOAD_ORPHAN_GRACE_HOURS', '24'))
+
+# What compute_pnl reads, plus the fields that show the trade was not edited since
+PNL_INPUT_FIELDS = ("pnl", "entry_price", "exit_price", "quantity", "trade_type", "updated_at")
+
+def compute_pnl(trade):
+    direction = -1 if trade.get("trade_type") == "Short" else 1
+    # Rounded to drop float noise such as 100.00000000000009
+    return round((trade["exit_price"] - trade["entry_price"]) * trade["quantity"] * direction, 8)
+
+# The inputs, plus what apply_trade_changes reads from the before-image
+PNL_LOAD_FIELDS = ("id", "date", "chart_image_url", *PNL_INPUT_FIELDS)
+
+def needs_pnl(trade):
+    return trade is not None and trade.get("pnl") is None and trade.get("exit_price") is not None
+
+async def recompute_pnl(user_id):
+    """Fill in pnl on the user's closed trades that have none, then update the aggregates."""
+    changes = []
+    writes = []
+    for trade in await storage.load_trades(user_id, PNL_LOAD_FIELDS, missing_pnl=True):
+        update_data = {"pnl": compute_pnl(trade)}
+        # Only if the trade is still as read: a user edit or delete in the
+        # meantime wins, and its own write handler updates the aggregates
+        expected = {field: trade.get(field) for field in PNL_INPUT_FIELDS}
+        writes.append(("update", trade["id"], update_data, expected))
+        changes.append((trade, {**trade, **update_data}))
+    if not writes:
+        return
+    errors, unmatched = await storage.bulk_write_trades(user_id, writes)
+    for index, message in errors:
+        logger.warning("Could not fill in pnl of trade %s: %s", writes[index][1], message)
+        changes[index] = None
+    for index in unmatched:
+        changes[index] = None
+    await apply_trade_changes(user_id, [change for change in changes if change is not None])
+
+async def verify_aggregates():
+    """Queue a rebuild for every user whose stats or daily rollups have drifted."""
+    for user_id in await storage.trade_user_ids():
+        if await check_user_stats(user_id) or await check_daily_rollups(user_id):
+            logger.warning("Aggregates of user %s drifted, rebuilding", user_id)
+            jobs.enqueue("rebuild_stats", user_id)
+
+async def purge_orphan_uploads():
+    """Delete uploads never attached to a trade, and temp files of interrupted uploads.
+
+    Files with no upload record at all predate reference counting and are left alone.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=UPLOAD_ORPHAN_GRACE_HOURS)
+    for name in await storage.find_unreferenced_uploads(cutoff):
+        if await storage.release_upload(name):
+            await delete_upload(UPLOAD_DIR, name)
+    for path in UPLOAD_DIR.glob(".upload-*"):
+        if path.stat().st_mtime < cutoff.timestamp():
+            path.unlink(missing_ok=True)
+
+jobs.register("recompute_pnl", recompute_pnl, keyed=True)
+jobs.register("rebuild_stats", rebuild_user_stats, keyed=True)
+jobs.register("verify_aggregates", verify_aggregates, retries=0,
+              every=float(os.environ.get('AGGREGATE_CHECK_INTERVAL', '86400')) or None)
+jobs.register("purge_orphan_uploads", purge_orphan_uploads,
+              every=float(os.environ.get('UPLOAD_PURGE_INTERVAL', '3600')) or None)
+metrics_registry.add_collector(jobs.collect)
+
+def format_stats(stats):
+    total_trades = stats.get("total_trades", 0)
+    winning_trades = stats.get("winning_trades", 0)
+    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+    return {
+        "total_trades": total_trades,
+        "total_pnl": round(stats.get("total_pnl", 0), 2),
+        "win_rate": round(win_rate, 2),
+        "winning_trades": winning_trades,
+        "losing_trades": stats.get("losing_trades", 0)
+    }
+
+# Conditional GET: read endpoints carry an ETag derived from the user's data
+# version, so an unchanged view costs one point read (or none) and a 304
+async def get_data_version(user_id):
+    version = version_cache.get(user_id)
+    if version is None:
+        stats = await storage.get_user_stats(user_id)
+        version = stats.get("version", 0) if stats else 0
+        version_cache.put(user_id, version)
+    return version
+
+async def check_not_modified(request: Request, user_id: str):
+    """Return (headers, 304 response or None) for a versioned read."""
+    version = await get_data_version(user_id)
+    # The URL and user are folded in so one browser cache can't mix up users or views
+    resource = hashlib.blake2s(f"{user_id}|{request.url.path}?{request.url.query}".encode(), digest_size=6)
+    etag = f'W/"{version}-{resource.hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return headers, Response(status_code=304, headers=headers)
+    return headers, None
+
 # Root endpoint
 @api_router.get("/")
 async def root():
     return {"message": "Trading Journal API", "status": "running"}
 
+async def ping_storage():
+    """(round trip in ms, None) or (None, error message)."""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(storage.ping(), READY_PING_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None, f"No answer within {READY_PING_TIMEOUT:g}s"
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+    return round((time.perf_counter() - started) * 1000, 2), None
+
+# Liveness: the process answers. A store outage is reported but doesn't fail
+# it, since restarting the process wouldn't fix the store.
+@api_router.get("/health")
+async def health():
+    ping_ms, error = await ping_storage()
+    return {"status": "ok" if error is None else "degraded", "storage": storage.name, "ping_ms": ping_ms, "error": error}
+
+# Readiness: 503 until startup (indexes, warm-up) is done and while the store is unreachable
+@api_router.get("/ready")
+async def ready():
+    ping_ms, error = await ping_storage()
+    is_ready = app.state.ready and error is None
+    return JSONResponse({
+        "status": "ready" if is_ready else "not_ready",
+        "started": app.state.ready,
+        "storage": storage.name,
+        "ping_ms": ping_ms,
+        "error": error,
+    }, status_code=200 if is_ready else 503)
+
 # Auth endpoints
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserCreate):
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email})
+    existing_user = await storage.get_user_by_email(user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user = User(
         email=user_data.email,
         full_name=user_data.full_name
@@ -191,7 +669,13 @@ async def register(user_data: UserCreate):
     user_dict["balance"] = float(user_data.balance)
     user_dict = prepare_for_mongo(user_dict)
     
-    await db.users.insert_one(user_dict)
+    try:
+        await storage.insert_user(user_dict)
+    except DuplicateError:
+        # Lost a race with a concurrent registration of the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
+    # A new user has no trades, so the aggregates start out complete at zero
+    await storage.replace_user_stats(user.id, dict.fromkeys(STAT_FIELDS, 0))
     
     # Create access token
     access_token = create_access_token(data={"sub": user.id})
@@ -200,10 +684,16 @@ async def register(user_data: UserCreate):
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(login_data: UserLogin):
-    user = await db.users.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password"]):
+    user = await storage.get_user_by_email(login_data.email)
+    matches, needs_rehash = await password_hasher.verify(login_data.password, user["password"] if user else None)
+    if not matches:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if needs_rehash:
+        # Only replaces the hash we just checked, in case the password changed meanwhile
+        await storage.replace_password(user["id"], user["password"], await password_hasher.hash(login_data.password))
+        invalidate_user(user["id"])
+    
     user_obj = User(**parse_from_mongo(user))
     access_token = create_access_token(data={"sub": user_obj.id})
     
@@ -213,27 +703,99 @@ async def login(login_data: UserLogin):
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+# Operator endpoints, for the accounts listed in ADMIN_EMAILS
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+@api_router.get("/admin/jobs")
+async def get_jobs(admin: User = Depends(get_admin_user)):
+    return jobs.status()
+
+@api_router.post("/admin/jobs/{name}")
+async def run_job(name: str, user_id: Optional[str] = None, admin: User = Depends(get_admin_user)):
+    job = jobs.jobs.get(name)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if not job.keyed:
+        return {"queued": int(jobs.enqueue(name))}
+    # Per-user jobs run for one user, or every user with trades
+    user_ids = [user_id] if user_id else await storage.trade_user_ids()
+    return {"queued": sum(jobs.enqueue(name, key) for key in user_ids)}
+
+@api_router.get("/cache/stats")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    return {"users": user_cache.stats()}
+
+def collect_app_metrics():
+    caches = {"users": user_cache.stats(), "data_versions": version_cache.stats()}
+    events = event_broker.stats()
+    metrics = [
+        ("cache_entries", "gauge", "Entries held by each in-process cache.",
+         {(name,): stats["size"] for name, stats in caches.items()}, ("cache",)),
+    ]
+    for field in ("hits", "misses", "evictions"):
+        metrics.append((f"cache_{field}_total", "counter", f"Cache {field} by cache.",
+                        {(name,): stats[field] for name, stats in caches.items()}, ("cache",)))
+    metrics += [
+        ("event_stream_connections", "gauge", "Open change feed connections.", {(): events["connections"]}, ()),
+        ("event_messages_delivered_total", "counter", "Change feed messages queued for delivery.",
+         {(): events["delivered"]}, ()),
+        ("event_stream_evictions_total", "counter", "Change feed connections dropped for falling behind.",
+         {(): events["evictions"]}, ()),
+    ]
+    return metrics
+
+metrics_registry.add_collector(collect_app_metrics)
+
+# Prometheus scrape endpoint; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+@api_router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    metrics_token = os.environ.get('METRICS_TOKEN')
+    if metrics_token and request.headers.get("authorization") != f"Bearer {metrics_token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # File upload endpoint
 @api_router.post("/upload")
 async def upload_file(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
-    
-    # Save file
+    # The body as a whole was capped while it arrived (BodySizeLimitMiddleware);
+    # this holds the file part itself to the limit
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Return the file URL
-        file_url = f"/uploads/{unique_filename}"
-        return {"url": file_url}
-    except Exception as e:
+        filename, size, created = await store_upload(file, UPLOAD_DIR, MAX_UPLOAD_BYTES)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+    except OSError as e:
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+    
+    # Unreferenced until a trade points at it
+    await storage.register_upload(filename, size, datetime.now(timezone.utc))
+    if created:
+        derivative_renderer.schedule(filename)
+    return {"url": f"{UPLOAD_URL_PREFIX}{filename}"}
+
+@api_router.api_route("/uploads/{filename}", methods=["GET", "HEAD"])
+async def get_upload(
+    request: Request,
+    filename: str,
+    size: str = Query("original", pattern="^(original|thumb|preview)$"),
+):
+    name = upload_name(f"{UPLOAD_URL_PREFIX}{filename}")
+    if name is None or not (UPLOAD_DIR / name).is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    if size != "original":
+        # Missing derivatives are rendered on demand; non-images fall back to the original
+        path = await derivative_renderer.ensure(name, size)
+        if path is not None:
+            return await serve_upload(request, path, upload_etag(name, size))
+    return await serve_upload(request, UPLOAD_DIR / name, upload_etag(name))
 
 # Trade endpoints
 @api_router.post("/trades", response_model=Trade)
@@ -241,77 +803,462 @@ async def create_trade(trade_data: TradeCreate, current_user: User = Depends(get
     trade = Trade(**trade_data.dict(), user_id=current_user.id)
     
     trade_dict = prepare_for_mongo(trade.dict())
-    await db.trades.insert_one(trade_dict)
+    await storage.insert_trade(trade_dict)
+    await apply_trade_changes(current_user.id, [(None, trade_dict)])
     
     return trade
 
-@api_router.get("/trades", response_model=List[Trade])
-async def get_trades(current_user: User = Depends(get_current_user)):
-    trades = await db.trades.find({"user_id": current_user.id}).sort("date", -1).to_list(1000)
-    return [Trade(**parse_from_mongo(trade)) for trade in trades]
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row, message):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def result(self):
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+def format_validation_error(error: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+async def insert_trade_batch(user_id, batch, report):
+    """Insert (row_number, document) pairs unordered and update aggregates once."""
+    docs = [doc for _, doc in batch]
+    failed = set()
+    for index, message in await storage.insert_trades(docs):
+        failed.add(index)
+        report.add_error(batch[index][0], message)
+    
+    inserted = [doc for index, doc in enumerate(docs) if index not in failed]
+    report.inserted += len(inserted)
+    await apply_trade_changes(user_id, [(None, doc) for doc in inserted])
+
+@api_router.post("/trades/import")
+async def import_trades(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user),
+):
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    
+    report = ImportReport()
+    batch = []
+    async for row, record in ROW_READERS[format](request.stream()):
+        if isinstance(record, ValueError):
+            report.add_error(row, str(record))
+            continue
+        try:
+            trade = Trade(**TradeCreate(**record).dict(), user_id=current_user.id)
+        except ValidationError as e:
+            report.add_error(row, format_validation_error(e))
+            continue
+        
+        batch.append((row, prepare_for_mongo(trade.dict())))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await insert_trade_batch(current_user.id, batch, report)
+            batch = []
+    
+    if batch:
+        await insert_trade_batch(current_user.id, batch, report)
+    
+    return report.result()
+
+@api_router.get("/trades/export")
+async def export_trades(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    current_user: User = Depends(get_current_user),
+):
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    
+    cursor = storage.iter_trades(current_user.id, EXPORT_BATCH_SIZE)
+    writer, media_type = EXPORT_WRITERS[format]
+    batches = iter_batches(cursor, EXPORT_BATCH_SIZE, parse_from_mongo)
+    
+    return StreamingResponse(
+        writer(batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="trades.{format}"'},
+    )
+
+@api_router.get("/trades", response_model=TradePage)
+async def get_trades(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    pair: Optional[str] = None,
+    trade_type: Optional[str] = Query(None, pattern="^(Long|Short)$"),
+    outcome: Optional[str] = Query(None, pattern="^(win|loss)$"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    q: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    headers, not_modified = await check_not_modified(request, current_user.id)
+    if not_modified:
+        return not_modified
+    
+    filters = TradeFilter(pair, trade_type, outcome, date_from, date_to, q)
+    after = decode_cursor(cursor) if cursor else None
+    
+    # Fetch one extra row to know whether another page exists
+    trades = await storage.find_trades(current_user.id, filters, after=after, limit=limit + 1)
+    next_cursor = encode_cursor(trades[limit - 1]) if len(trades) > limit else None
+    
+    return Response(
+        encode_trade_list(trades[:limit], next_cursor=next_cursor),
+        media_type="application/json",
+        headers=headers,
+    )
+
+@api_router.get("/trades/calendar")
+async def get_trade_calendar(
+    request: Request,
+    response: Response,
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    current_user: User = Depends(get_current_user),
+):
+    headers, not_modified = await check_not_modified(request, current_user.id)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    
+    rows = await storage.find_daily_rollups(current_user.id, date_from, date_to)
+    if not rows and await storage.get_user_stats(current_user.id) is None:
+        await rebuild_user_stats(current_user.id)
+        rows = await storage.find_daily_rollups(current_user.id, date_from, date_to)
+    
+    for row in rows:
+        row["date"] = from_mongo_date(row["date"])
+        row["total_pnl"] = round(row["total_pnl"], 2)
+    return rows
 
 @api_router.get("/trades/{trade_id}", response_model=Trade)
-async def get_trade(trade_id: str, current_user: User = Depends(get_current_user)):
-    trade = await db.trades.find_one({"id": trade_id, "user_id": current_user.id})
+async def get_trade(trade_id: str, request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    headers, not_modified = await check_not_modified(request, current_user.id)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    
+    trade = await storage.get_trade(current_user.id, trade_id)
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
     
     return Trade(**parse_from_mongo(trade))
 
+# Fields whose change moves the stats, daily rollups or upload references
+AGGREGATE_FIELDS = {"pnl", "date", "chart_image_url"}
+
+def build_trade_update(trade_data: TradeUpdate):
+    update_data = {k: v for k, v in trade_data.dict(exclude_unset=True).items() if v is not None}
+    update_data["updated_at"] = datetime.now(timezone.utc)
+    return prepare_for_mongo(update_data)
+
 @api_router.put("/trades/{trade_id}", response_model=Trade)
 async def update_trade(trade_id: str, trade_data: TradeUpdate, current_user: User = Depends(get_current_user)):
-    trade = await db.trades.find_one({"id": trade_id, "user_id": current_user.id})
+    update_data = build_trade_update(trade_data)
+    
+    # One owner-scoped round trip. The aggregates need the old values only when
+    # an aggregated field changes, in which case the result is merged locally.
+    needs_before = bool(AGGREGATE_FIELDS & update_data.keys())
+    trade = await storage.update_trade(current_user.id, trade_id, update_data, return_before=needs_before)
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
     
-    update_data = {k: v for k, v in trade_data.dict(exclude_unset=True).items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc)
-    update_data = prepare_for_mongo(update_data)
+    updated_trade = {**trade, **update_data} if needs_before else trade
+    await apply_trade_changes(current_user.id, [(trade, updated_trade)])
     
-    await db.trades.update_one({"id": trade_id}, {"$set": update_data})
-    
-    updated_trade = await db.trades.find_one({"id": trade_id})
     return Trade(**parse_from_mongo(updated_trade))
 
+@api_router.post("/trades/bulk")
+async def bulk_trades(request_data: BulkTradeRequest, current_user: User = Depends(get_current_user)):
+    operations = request_data.operations
+    ids = [operation.id for operation in operations]
+    existing = {trade["id"]: trade for trade in await storage.get_trades(current_user.id, ids)}
+    
+    results = []
+    writes = []
+    changes = []
+    seen = set()
+    for operation in operations:
+        result = {"id": operation.id, "action": operation.action}
+        results.append(result)
+        if operation.id in seen:
+            result.update(status="error", error="Duplicate operation for this trade")
+            continue
+        seen.add(operation.id)
+        trade = existing.get(operation.id)
+        if trade is None:
+            result["status"] = "not_found"
+            continue
+        
+        # Applied only if the trade is still as read, so its before-image is the real one
+        expected = {"updated_at": trade.get("updated_at")}
+        if operation.action == "delete":
+            writes.append(("delete", operation.id, None, expected))
+            changes.append((trade, None))
+            result["status"] = "deleted"
+        else:
+            if operation.data is None:
+                result.update(status="error", error="Update requires data")
+                continue
+            update_data = build_trade_update(operation.data)
+            writes.append(("update", operation.id, update_data, expected))
+            changes.append((trade, {**trade, **update_data}))
+            result["status"] = "updated"
+    
+    # Map write error indexes back to their result rows
+    pending = [result for result in results if result["status"] in ("updated", "deleted")]
+    if writes:
+        errors, unmatched = await storage.bulk_write_trades(current_user.id, writes)
+        for index, message in errors:
+            pending[index].update(status="error", error=message)
+            changes[index] = None
+        for index in unmatched:
+            pending[index].update(status="conflict", error="Trade was changed or deleted concurrently")
+            changes[index] = None
+        await apply_trade_changes(current_user.id, [change for change in changes if change is not None])
+    
+    return {
+        "results": results,
+        "updated": sum(result["status"] == "updated" for result in results),
+        "deleted": sum(result["status"] == "deleted" for result in results),
+        "failed": sum(result["status"] in ("error", "not_found", "conflict") for result in results),
+    }
+
 @api_router.delete("/trades/{trade_id}")
 async def delete_trade(trade_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.trades.delete_one({"id": trade_id, "user_id": current_user.id})
-    if result.deleted_count == 0:
+    trade = await storage.delete_trade(current_user.id, trade_id)
+    if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
+    await apply_trade_changes(current_user.id, [(trade, None)])
     
     return {"message": "Trade deleted successfully"}
 
+# Change feed: Server-Sent Events with the trades and aggregate deltas of every write
+@api_router.get("/events")
+async def stream_events(current_user: User = Depends(get_current_user)):
+    subscription = event_broker.subscribe(current_user.id)
+    
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    # Evicted for falling behind; the client reconnects and refetches
+                    yield b"event: evicted\ndata: {}\n\n"
+                    return
+                yield format_sse(message)
+        finally:
+            event_broker.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Dashboard stats endpoint
 @api_router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    trades = await db.trades.find({"user_id": current_user.id}).to_list(1000)
+async def get_dashboard_stats(
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    group_by: Optional[str] = Query(None, pattern="^(pair|trade_type|month)$"),
+    current_user: User = Depends(get_current_user),
+):
+    headers, not_modified = await check_not_modified(request, current_user.id)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
     
-    if not trades:
-        return {
-            "total_trades": 0,
-            "total_pnl": 0,
-            "win_rate": 0,
-            "winning_trades": 0,
-            "losing_trades": 0
-        }
+    if date_from or date_to or group_by:
+        rows = await aggregate_stats(current_user.id, date_from, date_to, group_by)
+        result = format_stats(sum_stats(rows))
+        if group_by:
+            result["breakdown"] = [{group_by: row["_id"], **format_stats(row)} for row in rows]
+        return result
     
-    total_trades = len(trades)
-    total_pnl = sum(trade.get("pnl", 0) for trade in trades if trade.get("pnl"))
-    winning_trades = len([t for t in trades if t.get("pnl", 0) > 0])
-    losing_trades = len([t for t in trades if t.get("pnl", 0) < 0])
-    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+    return await load_user_stats(current_user.id)
+
+async def load_user_stats(user_id):
+    stats = await storage.get_user_stats(user_id)
+    if stats is None:
+        # Users from before the aggregate existed, who have not written since
+        stats = await rebuild_user_stats(user_id)
+    return format_stats(stats)
+
+async def load_recent_trades(user_id, limit):
+    if not limit:
+        # recent=0 asks for stats only; Mongo would read limit(0) as no limit
+        return []
+    # Served by the (user_id, date, id) index: the first N keys, no in-memory sort
+    return await storage.find_trades(user_id, limit=limit)
+
+# Composite dashboard endpoint: one auth, one version check, both reads in flight together
+@api_router.get("/dashboard")
+async def get_dashboard(
+    request: Request,
+    recent: int = Query(5, ge=0, le=50),
+    current_user: User = Depends(get_current_user),
+):
+    headers, not_modified = await check_not_modified(request, current_user.id)
+    if not_modified:
+        return not_modified
     
-    return {
-        "total_trades": total_trades,
-        "total_pnl": round(total_pnl, 2),
-        "win_rate": round(win_rate, 2),
-        "winning_trades": winning_trades,
-        "losing_trades": losing_trades
-    }
+    stats, trades = await asyncio.gather(
+        load_user_stats(current_user.id),
+        load_recent_trades(current_user.id, recent),
+    )
+    
+    return Response(encode_trade_list(trades, stats=stats), media_type="application/json", headers=headers)
+
+# Analytics endpoint
+@api_router.get("/analytics")
+async def get_analytics(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    headers, not_modified = await check_not_modified(request, current_user.id)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    
+    result = analytics_cache.get(current_user.id)
+    if result is None:
+        token = analytics_cache.token()
+        docs = await storage.load_trades(current_user.id, ANALYTICS_FIELDS)
+        result = compute_analytics(TradeColumns.from_documents(docs))
+        analytics_cache.put(current_user.id, result, token)
+    
+    return result
+
+OPEN_POSITION_FIELDS = ("id", "date", "pair", "trade_type", "entry_price", "quantity")
+
+# Open trades (no exit price) marked to the last local price at or before `at`
+@api_router.get("/positions/open")
+async def get_open_positions(
+    at: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+):
+    as_of = at or datetime.now(timezone.utc)
+    if as_of.tzinfo is None:
+        as_of = as_of.replace(tzinfo=timezone.utc)
+    
+    docs = await storage.load_trades(current_user.id, OPEN_POSITION_FIELDS, open_only=True)
+    docs.sort(key=lambda doc: (doc["pair"], doc["id"]))
+    marks, mark_times, unrealized = mark_to_market(OpenPositions.from_documents(docs), price_store, to_epoch_ms(as_of))
+    
+    positions = []
+    total = 0.0
+    unpriced = 0
+    for doc, mark, mark_time, pnl in zip(docs, marks.tolist(), mark_times.tolist(), unrealized.tolist()):
+        priced = not math.isnan(pnl)
+        if priced:
+            total += pnl
+        else:
+            unpriced += 1
+        positions.append({
+            **parse_from_mongo(doc),
+            "mark_price": mark if priced else None,
+            "mark_time": from_epoch_ms(mark_time) if priced else None,
+            "unrealized_pnl": round(pnl, 2) if priced else None,
+        })
+    
+    return Response(orjson.dumps({
+        "as_of": as_of,
+        "unrealized_pnl": round(total, 2),
+        "open_trades": len(positions),
+        "unpriced": unpriced,
+        "positions": positions,
+    }, option=orjson.OPT_UTC_Z), media_type="application/json")
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Admission control: a token bucket per user (or client IP) and a concurrency
+# cap per route class, so one caller can't tie up the Motor pool. The caps
+# add up to less than its default 100 connections.
+ADMISSION_EXEMPT_PATHS = {"/api/", "/api/events", "/api/metrics", "/api/health", "/api/ready"}
+# Stored images are served from disk without touching the store, and <img>
+# requests carry no token, so a page of charts would spend one IP's read budget
+ADMISSION_EXEMPT_PREFIXES = ("/uploads/", "/api/uploads/")
+HEAVY_PATHS = {
+    "/api/analytics",
+    "/api/dashboard",
+    "/api/dashboard/stats",
+    "/api/positions/open",
+    "/api/trades/bulk",
+    "/api/trades/export",
+}
+UPLOAD_PATHS = {"/api/upload", "/api/trades/import"}
+
+def admission_class(method: str, path: str):
+    if path in ADMISSION_EXEMPT_PATHS or path.startswith(ADMISSION_EXEMPT_PREFIXES):
+        return None
+    if path in UPLOAD_PATHS:
+        return "upload"
+    if path in HEAVY_PATHS:
+        return "heavy"
+    return "read"
+
+def admission_identity(scope):
+    for name, value in scope["headers"]:
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            try:
+                user_id = jwt.decode(value[7:].decode("latin-1"), SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+            except JWTError:
+                break
+            if user_id:
+                return f"user:{user_id}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+def route_class(name, default_limit, cost):
+    limit = int(os.environ.get(f'{name.upper()}_CONCURRENCY', str(default_limit)))
+    return RouteClass(
+        name,
+        limit=limit,
+        max_queue=limit * int(os.environ.get('ADMISSION_QUEUE_FACTOR', '2')),
+        queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '1')),
+        cost=cost,
+    )
+
+admission = AdmissionController(
+    TokenBuckets(
+        rate=float(os.environ.get('RATE_LIMIT_PER_SECOND', '50')),
+        burst=float(os.environ.get('RATE_LIMIT_BURST', '100')),
+    ),
+    [route_class("read", 64, cost=1), route_class("heavy", 8, cost=5), route_class("upload", 4, cost=5)],
+    admission_class,
+    admission_identity,
+)
+metrics_registry.add_collector(admission.collect)
+
+# Inside CORS, so 429s still carry the CORS headers the browser needs to read them
+if os.environ.get('ADMISSION_CONTROL', 'on') != 'off':
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Upload bodies are capped while they arrive, before form parsing spools them;
+# outside admission, so an oversized declared upload doesn't take a slot
+app.add_middleware(BodySizeLimitMiddleware, paths={"/api/upload"}, max_bytes=MAX_UPLOAD_BYTES + UPLOAD_BODY_OVERHEAD)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -321,6 +1268,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the timings include every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -328,6 +1278,3 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -0,0 +1,50 @@
+"""
+Storage backends behind one repository interface.
+
+STORAGE_BACKEND picks one:
+- "mongo" (default): MongoDB through Motor, for anything multi-process
+- "sqlite": an embedded WAL-mode database file at SQLITE_PATH, for
+  single-node installs without a Mongo server
+- "memory": plain dicts, for tests and demos
+"""
+
+import os
+from pathlib import Path
+
+from .base import STAT_FIELDS, TRADE_SORT, DuplicateError, Repository, TradeFilter, to_mongo_date
+from .memory import MemoryRepository
+from .mongo import MongoRepository
+from .sqlite import SQLiteRepository
+
+BACKENDS = ("mongo", "sqlite", "memory")
+
+
+def create_storage(db, backend=None):
+    """Build the configured backend; db is the Motor database the mongo one uses."""
+    backend = backend or os.environ.get("STORAGE_BACKEND", "mongo")
+    if backend == "mongo":
+        return MongoRepository(db)
+    if backend == "sqlite":
+        default_path = Path(__file__).resolve().parent.parent / "trading_journal.db"
+        return SQLiteRepository(
+            os.environ.get("SQLITE_PATH", str(default_path)),
+            readers=int(os.environ.get("SQLITE_READERS", "4")),
+        )
+    if backend == "memory":
+        return MemoryRepository()
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+
+__all__ = [
+    "BACKENDS",
+    "DuplicateError",
+    "STAT_FIELDS",
+    "TRADE_SORT",
+    "MemoryRepository",
+    "MongoRepository",
+    "Repository",
+    "SQLiteRepository",
+    "TradeFilter",
+    "create_storage",
+    "to_mongo_date",
+]
@@ -0,0 +1,188 @@
+"""
+The storage interface every backend implements.
+
+Documents cross it as plain dicts in the shape the Mongo backend has always
+stored:
+- A trade's "date" is a tz-aware datetime at midnight UTC.
+- Timestamps are tz-aware datetimes.
+- Rollup rows are keyed by the same midnight datetimes.
+- Nothing ever carries a Mongo "_id".
+
+Methods that list trades leave out "user_id". The caller already knows it,
+and the list responses don't send it.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from typing import Optional
+
+STAT_FIELDS = ("total_trades", "total_pnl", "winning_trades", "losing_trades")
+
+# Keyset order of every trade listing: newest day first, then id
+TRADE_SORT = [("date", -1), ("id", 1)]
+
+
+class DuplicateError(ValueError):
+    """A unique key (user id, user email) is already taken."""
+
+
+def to_mongo_date(value: date) -> datetime:
+    return datetime.combine(value, time.min, tzinfo=timezone.utc)
+
+
+@dataclass
+class TradeFilter:
+    pair: Optional[str] = None
+    trade_type: Optional[str] = None
+    outcome: Optional[str] = None  # "win" (pnl > 0) or "loss" (pnl < 0)
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    search: Optional[str] = None  # words matched against pair and comments
+
+
+class Repository(ABC):
+    name = "abstract"
+
+    async def ensure_indexes(self):
+        """Create the schema and indexes; safe to call on every start."""
+
+    async def close(self):
+        pass
+
+    async def ping(self):
+        """Round trip to the store; raises if it is unreachable."""
+
+    # Users
+
+    @abstractmethod
+    async def get_user(self, user_id):
+        ...
+
+    @abstractmethod
+    async def get_user_by_email(self, email):
+        ...
+
+    @abstractmethod
+    async def insert_user(self, user):
+        """Raises DuplicateError if the id or email is taken."""
+
+    @abstractmethod
+    async def replace_password(self, user_id, old_hash, new_hash):
+        """Swap the hash only if it is still old_hash; True if it was swapped."""
+
+    # Trades
+
+    @abstractmethod
+    async def trade_user_ids(self):
+        """Every user id that owns at least one trade."""
+
+    @abstractmethod
+    async def insert_trade(self, trade):
+        ...
+
+    @abstractmethod
+    async def insert_trades(self, trades):
+        """Insert unordered; returns [(index, message)] for rows that failed."""
+
+    @abstractmethod
+    async def get_trade(self, user_id, trade_id):
+        ...
+
+    @abstractmethod
+    async def get_trades(self, user_id, trade_ids):
+        """The user's trades among trade_ids, in no particular order."""
+
+    @abstractmethod
+    async def find_trades(self, user_id, filters=None, after=None, limit=50):
+        """One page in TRADE_SORT order; after is the (date, id) of the last row seen."""
+
+    @abstractmethod
+    def iter_trades(self, user_id, batch_size=1000):
+        """Async iterator over all the user's trades in TRADE_SORT order."""
+
+    @abstractmethod
+    async def load_trades(self, user_id, fields=None, open_only=False, missing_pnl=False):
+        """All the user's trades, unordered, optionally only the given fields.
+
+        open_only keeps the open positions: trades without an exit_price.
+        missing_pnl keeps the closed trades whose pnl was never set.
+        """
+
+    @abstractmethod
+    async def update_trade(self, user_id, trade_id, fields, return_before=False):
+        """Set fields on an owned trade; the document before or after, None if not found."""
+
+    @abstractmethod
+    async def delete_trade(self, user_id, trade_id):
+        """Delete an owned trade and return it, None if not found."""
+
+    @abstractmethod
+    async def bulk_write_trades(self, user_id, operations):
+        """Apply ("update", id, fields, expected) / ("delete", id, None, expected) unordered.
+
+        expected is None or {field: value} the trade must still hold for the
+        operation to apply, None matching a missing field. Returns (errors,
+        unmatched): [(index, message)] for operations that failed, and the
+        indexes of those that matched no trade (gone, or no longer as expected).
+        """
+
+    @abstractmethod
+    async def aggregate_stats(self, user_id, date_from=None, date_to=None, group_by=None):
+        """STAT_FIELDS summed per group, sorted by "_id".
+
+        group_by is None (one row, "_id" None), "pair", "trade_type", "month"
+        ("YYYY-MM") or "day" (the midnight datetime). No trades, no rows.
+        """
+
+    # Aggregates
+
+    @abstractmethod
+    async def get_user_stats(self, user_id):
+        """STAT_FIELDS plus "version", or None if never computed."""
+
+    @abstractmethod
+    async def increment_user_stats(self, user_id, delta):
+        """Add delta to the stats, bump the data version and return it.
+
+        Returns None, writing nothing, if the stats were never computed: a
+        delta alone would miss the trades written before.
+        """
+
+    @abstractmethod
+    async def replace_user_stats(self, user_id, stats):
+        """Overwrite the stats and bump the data version."""
+
+    @abstractmethod
+    async def increment_daily_rollups(self, user_id, day_deltas):
+        """Add {day: delta} to the rollups, dropping days left without trades."""
+
+    @abstractmethod
+    async def replace_daily_rollups(self, user_id, rows):
+        """Replace every rollup of the user with rows ({"date", *STAT_FIELDS})."""
+
+    @abstractmethod
+    async def find_daily_rollups(self, user_id, date_from=None, date_to=None):
+        """Rollup rows ({"date", *STAT_FIELDS}) by ascending date."""
+
+    # Uploads
+
+    @abstractmethod
+    async def register_upload(self, name, size, created_at):
+        """Record a stored file with no references, unless already known."""
+
+    @abstractmethod
+    async def adjust_upload_refs(self, name, delta):
+        """Add delta to a registered file's reference count; True once nothing references it.
+
+        Names never registered (files that predate reference counting, or
+        URLs pointing elsewhere) are ignored and never reported as released.
+        """
+
+    @abstractmethod
+    async def find_unreferenced_uploads(self, before):
+        """Names of files registered before `before` that no trade has referenced yet."""
+
+    @abstractmethod
+    async def release_upload(self, name):
+        """Forget a file if it is still unreferenced; True if it was forgotten."""
@@ -0,0 +1,264 @@
+"""
+Pure in-memory backend: plain dicts in this process, gone on restart.
+
+Meant for tests and throwaway single-process runs. Queries scan the user's
+trades, which is fine at the journal sizes those see.
+"""
+
+import heapq
+import re
+
+from .base import STAT_FIELDS, DuplicateError, Repository, TradeFilter, to_mongo_date
+
+
+def words(text):
+    return set(re.findall(r"\w+", text.lower())) if text else set()
+
+
+def search_matches(trade, search):
+    # Like a Mongo $text search without stemming: any word, pair or comments
+    return bool(words(search) & (words(trade.get("pair")) | words(trade.get("comments"))))
+
+
+def trade_matches(trade, filters):
+    if filters.pair and trade.get("pair") != filters.pair:
+        return False
+    if filters.trade_type and trade.get("trade_type") != filters.trade_type:
+        return False
+    pnl = trade.get("pnl")
+    if filters.outcome == "win" and not (pnl is not None and pnl > 0):
+        return False
+    if filters.outcome == "loss" and not (pnl is not None and pnl < 0):
+        return False
+    if filters.date_from and trade["date"] < to_mongo_date(filters.date_from):
+        return False
+    if filters.date_to and trade["date"] > to_mongo_date(filters.date_to):
+        return False
+    if filters.search and not search_matches(trade, filters.search):
+        return False
+    return True
+
+
+def sort_key(trade):
+    return -trade["date"].timestamp(), trade["id"]
+
+
+def listed(trade):
+    return {key: value for key, value in trade.items() if key != "user_id"}
+
+
+GROUP_KEYS = {
+    None: lambda trade: None,
+    "pair": lambda trade: trade.get("pair"),
+    "trade_type": lambda trade: trade.get("trade_type"),
+    "month": lambda trade: trade["date"].strftime("%Y-%m"),
+    "day": lambda trade: trade["date"],
+}
+
+
+class MemoryRepository(Repository):
+    name = "memory"
+
+    def __init__(self):
+        self.users = {}
+        self.user_ids_by_email = {}
+        self.trades = {}
+        self.trade_ids_by_user = {}
+        self.user_stats = {}
+        self.daily_rollups = {}
+        self.uploads = {}
+
+    # Users
+
+    async def get_user(self, user_id):
+        user = self.users.get(user_id)
+        return dict(user) if user else None
+
+    async def get_user_by_email(self, email):
+        user_id = self.user_ids_by_email.get(email)
+        return await self.get_user(user_id) if user_id else None
+
+    async def insert_user(self, user):
+        if user["id"] in self.users or user["email"] in self.user_ids_by_email:
+            raise DuplicateError("Duplicate user")
+        self.users[user["id"]] = dict(user)
+        self.user_ids_by_email[user["email"]] = user["id"]
+
+    async def replace_password(self, user_id, old_hash, new_hash):
+        user = self.users.get(user_id)
+        if user is None or user.get("password") != old_hash:
+            return False
+        user["password"] = new_hash
+        return True
+
+    # Trades
+
+    def _owned(self, user_id):
+        return (self.trades[trade_id] for trade_id in self.trade_ids_by_user.get(user_id, ()))
+
+    def _insert(self, trade):
+        if trade["id"] in self.trades:
+            raise ValueError(f"Duplicate trade id {trade['id']}")
+        self.trades[trade["id"]] = dict(trade)
+        self.trade_ids_by_user.setdefault(trade["user_id"], set()).add(trade["id"])
+
+    async def trade_user_ids(self):
+        return [user_id for user_id, trade_ids in self.trade_ids_by_user.items() if trade_ids]
+
+    async def insert_trade(self, trade):
+        self._insert(trade)
+
+    async def insert_trades(self, trades):
+        errors = []
+        for index, trade in enumerate(trades):
+            try:
+                self._insert(trade)
+            except ValueError as e:
+                errors.append((index, str(e)))
+        return errors
+
+    async def get_trade(self, user_id, trade_id):
+        trade = self.trades.get(trade_id)
+        return dict(trade) if trade and trade["user_id"] == user_id else None
+
+    async def get_trades(self, user_id, trade_ids):
+        return [trade for trade in [await self.get_trade(user_id, trade_id) for trade_id in set(trade_ids)] if trade]
+
+    async def find_trades(self, user_id, filters=None, after=None, limit=50):
+        filters = filters or TradeFilter()
+        candidates = (trade for trade in self._owned(user_id) if trade_matches(trade, filters))
+        if after:
+            last_date, last_id = after
+            candidates = (
+                trade for trade in candidates
+                if trade["date"] < last_date or (trade["date"] == last_date and trade["id"] > last_id)
+            )
+        return [listed(trade) for trade in heapq.nsmallest(limit, candidates, key=sort_key)]
+
+    async def iter_trades(self, user_id, batch_size=1000):
+        for trade in sorted(self._owned(user_id), key=sort_key):
+            yield listed(trade)
+
+    async def load_trades(self, user_id, fields=None, open_only=False, missing_pnl=False):
+        trades = self._owned(user_id)
+        if open_only:
+            trades = (trade for trade in trades if trade.get("exit_price") is None)
+        if missing_pnl:
+            trades = (trade for trade in trades if trade.get("pnl") is None and trade.get("exit_price") is not None)
+        if fields:
+            return [{field: trade.get(field) for field in fields} for trade in trades]
+        return [dict(trade) for trade in trades]
+
+    async def update_trade(self, user_id, trade_id, fields, return_before=False):
+        trade = self.trades.get(trade_id)
+        if trade is None or trade["user_id"] != user_id:
+            return None
+        before = dict(trade)
+        trade.update(fields)
+        return before if return_before else dict(trade)
+
+    async def delete_trade(self, user_id, trade_id):
+        trade = self.trades.get(trade_id)
+        if trade is None or trade["user_id"] != user_id:
+            return None
+        del self.trades[trade_id]
+        self.trade_ids_by_user[user_id].discard(trade_id)
+        return trade
+
+    async def bulk_write_trades(self, user_id, operations):
+        unmatched = []
+        for index, (action, trade_id, fields, expected) in enumerate(operations):
+            trade = self.trades.get(trade_id)
+            if trade is None or trade["user_id"] != user_id or any(
+                trade.get(field) != value for field, value in (expected or {}).items()
+            ):
+                unmatched.append(index)
+            elif action == "delete":
+                await self.delete_trade(user_id, trade_id)
+            else:
+                await self.update_trade(user_id, trade_id, fields)
+        return [], unmatched
+
+    async def aggregate_stats(self, user_id, date_from=None, date_to=None, group_by=None):
+        filters = TradeFilter(date_from=date_from, date_to=date_to)
+        group_key = GROUP_KEYS[group_by]
+        groups = {}
+        for trade in self._owned(user_id):
+            if not trade_matches(trade, filters):
+                continue
+            row = groups.setdefault(group_key(trade), dict.fromkeys(STAT_FIELDS, 0))
+            pnl = trade.get("pnl") or 0
+            row["total_trades"] += 1
+            row["total_pnl"] += pnl
+            row["winning_trades"] += int(pnl > 0)
+            row["losing_trades"] += int(pnl < 0)
+        return [{"_id": key, **row} for key, row in sorted(groups.items(), key=lambda item: (item[0] is not None, item[0]))]
+
+    # Aggregates
+
+    async def get_user_stats(self, user_id):
+        stats = self.user_stats.get(user_id)
+        return dict(stats) if stats else None
+
+    async def increment_user_stats(self, user_id, delta):
+        stats = self.user_stats.get(user_id)
+        if stats is None:
+            return None
+        for field, value in delta.items():
+            stats[field] = stats.get(field, 0) + value
+        stats["version"] += 1
+        return stats["version"]
+
+    async def replace_user_stats(self, user_id, stats):
+        current = self.user_stats.setdefault(user_id, {"version": 0})
+        current.update(stats)
+        current["version"] += 1
+
+    async def increment_daily_rollups(self, user_id, day_deltas):
+        rollups = self.daily_rollups.setdefault(user_id, {})
+        for day, delta in day_deltas.items():
+            if any(delta.values()):
+                row = rollups.setdefault(day, {"date": day})
+                for field, value in delta.items():
+                    row[field] = row.get(field, 0) + value
+            if delta.get("total_trades", 0) < 0 and day in rollups and rollups[day].get("total_trades", 0) <= 0:
+                del rollups[day]
+
+    async def replace_daily_rollups(self, user_id, rows):
+        self.daily_rollups[user_id] = {row["date"]: dict(row) for row in rows}
+
+    async def find_daily_rollups(self, user_id, date_from=None, date_to=None):
+        rows = self.daily_rollups.get(user_id, {}).values()
+        if date_from:
+            rows = [row for row in rows if row["date"] >= to_mongo_date(date_from)]
+        if date_to:
+            rows = [row for row in rows if row["date"] <= to_mongo_date(date_to)]
+        return [dict(row) for row in sorted(rows, key=lambda row: row["date"])]
+
+    # Uploads
+
+    async def register_upload(self, name, size, created_at):
+        self.uploads.setdefault(name, {"refs": 0, "size": size, "created_at": created_at})
+
+    async def adjust_upload_refs(self, name, delta):
+        upload = self.uploads.get(name)
+        if upload is None:
+            return False
+        upload["refs"] += delta
+        if delta < 0 and upload["refs"] <= 0:
+            del self.uploads[name]
+            return True
+        return False
+
+    async def find_unreferenced_uploads(self, before):
+        return [
+            name for name, upload in self.uploads.items()
+            if upload["refs"] <= 0 and upload.get("created_at") and upload["created_at"] < before
+        ]
+
+    async def release_upload(self, name):
+        upload = self.uploads.get(name)
+        if upload is None or upload["refs"] > 0:
+            return False
+        del self.uploads[name]
+        return True
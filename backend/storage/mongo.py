@@ -0,0 +1,315 @@
+"""
+MongoDB backend (Motor). Every filter is answered from an index; see
+ensure_indexes() and tests/test_trade_indexes.py.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .base import TRADE_SORT, DuplicateError, Repository, TradeFilter, to_mongo_date
+
+logger = logging.getLogger(__name__)
+
+TRADE_LIST_PROJECTION = {"_id": 0, "user_id": 0}
+
+STATS_GROUP_KEYS = {
+    "pair": "$pair",
+    "trade_type": "$trade_type",
+    "month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}},
+    "day": "$date",
+}
+
+
+def build_trade_query(user_id, filters=None):
+    filters = filters or TradeFilter()
+    query = {"user_id": user_id}
+    if filters.pair:
+        query["pair"] = filters.pair
+    if filters.trade_type:
+        query["trade_type"] = filters.trade_type
+    # Must match the partialFilterExpression of the win/loss indexes exactly
+    if filters.outcome == "win":
+        query["pnl"] = {"$gt": 0}
+    elif filters.outcome == "loss":
+        query["pnl"] = {"$lt": 0}
+    if filters.date_from or filters.date_to:
+        query["date"] = {}
+        if filters.date_from:
+            query["date"]["$gte"] = to_mongo_date(filters.date_from)
+        if filters.date_to:
+            query["date"]["$lte"] = to_mongo_date(filters.date_to)
+    if filters.search:
+        query["$text"] = {"$search": filters.search}
+    return query
+
+
+def after_cursor(after):
+    last_date, last_id = after
+    return {"$or": [
+        {"date": {"$lt": last_date}},
+        {"date": last_date, "id": {"$gt": last_id}},
+    ]}
+
+
+def write_errors(error):
+    return [(item["index"], item.get("errmsg", "Write failed")) for item in error.details.get("writeErrors", [])]
+
+
+class MongoRepository(Repository):
+    name = "mongo"
+
+    def __init__(self, db):
+        self.db = db
+
+    async def create_unique_index(self, collection, key, name):
+        """Unique index on key; existing duplicates are logged instead of failing startup."""
+        try:
+            await collection.create_index(key, unique=True, name=name)
+        except DuplicateKeyError as e:
+            logger.error("Cannot build unique index %s.%s, remove the duplicates first: %s",
+                         collection.name, name, e)
+
+    async def ensure_indexes(self):
+        db = self.db
+        await self.create_unique_index(db.users, "email", "email")
+        await self.create_unique_index(db.users, "id", "id")
+        await self.create_unique_index(db.trades, "id", "id")
+        trade_key = [("date", -1), ("id", 1)]
+        await db.trades.create_index([("user_id", 1)] + trade_key, name="user_date_id")
+        await db.trades.create_index([("user_id", 1), ("pair", 1)] + trade_key, name="user_pair_date_id")
+        await db.trades.create_index([("user_id", 1), ("trade_type", 1)] + trade_key, name="user_type_date_id")
+        await db.trades.create_index(
+            [("user_id", 1)] + trade_key,
+            name="user_date_id_wins",
+            partialFilterExpression={"pnl": {"$gt": 0}},
+        )
+        await db.trades.create_index(
+            [("user_id", 1)] + trade_key,
+            name="user_date_id_losses",
+            partialFilterExpression={"pnl": {"$lt": 0}},
+        )
+        await db.trades.create_index(
+            [("user_id", 1), ("pair", "text"), ("comments", "text")],
+            name="user_text",
+            weights={"pair": 5, "comments": 1},
+        )
+        await db.user_stats.create_index("user_id", unique=True, name="user_id")
+        await db.daily_rollups.create_index([("user_id", 1), ("date", 1)], unique=True, name="user_date")
+
+    async def ping(self):
+        await self.db.command("ping")
+
+    # Users
+
+    async def get_user(self, user_id):
+        return await self.db.users.find_one({"id": user_id}, {"_id": 0})
+
+    async def get_user_by_email(self, email):
+        return await self.db.users.find_one({"email": email}, {"_id": 0})
+
+    async def insert_user(self, user):
+        try:
+            await self.db.users.insert_one(dict(user))
+        except DuplicateKeyError as e:
+            raise DuplicateError(str(e)) from e
+
+    async def replace_password(self, user_id, old_hash, new_hash):
+        result = await self.db.users.update_one(
+            {"id": user_id, "password": old_hash}, {"$set": {"password": new_hash}}
+        )
+        return result.modified_count == 1
+
+    # Trades
+
+    async def trade_user_ids(self):
+        return await self.db.trades.distinct("user_id")
+
+    async def insert_trade(self, trade):
+        # insert_one would add an _id to the caller's dict
+        await self.db.trades.insert_one(dict(trade))
+
+    async def insert_trades(self, trades):
+        try:
+            await self.db.trades.insert_many([dict(trade) for trade in trades], ordered=False)
+        except BulkWriteError as e:
+            return write_errors(e)
+        return []
+
+    async def get_trade(self, user_id, trade_id):
+        return await self.db.trades.find_one({"id": trade_id, "user_id": user_id}, {"_id": 0})
+
+    async def get_trades(self, user_id, trade_ids):
+        return await self.db.trades.find({"id": {"$in": list(trade_ids)}, "user_id": user_id}, {"_id": 0}).to_list(None)
+
+    async def find_trades(self, user_id, filters=None, after=None, limit=50):
+        query = build_trade_query(user_id, filters)
+        if after:
+            query.update(after_cursor(after))
+        return await self.db.trades.find(query, TRADE_LIST_PROJECTION).sort(TRADE_SORT).limit(limit).to_list(limit)
+
+    async def iter_trades(self, user_id, batch_size=1000):
+        cursor = self.db.trades.find({"user_id": user_id}, TRADE_LIST_PROJECTION).sort(TRADE_SORT).batch_size(batch_size)
+        async for trade in cursor:
+            yield trade
+
+    async def load_trades(self, user_id, fields=None, open_only=False, missing_pnl=False):
+        query = {"user_id": user_id}
+        if open_only:
+            # Matches both null and a missing field
+            query["exit_price"] = None
+        if missing_pnl:
+            query.update(pnl=None, exit_price={"$ne": None})
+        projection = {"_id": 0, **{field: 1 for field in fields}} if fields else {"_id": 0}
+        return await self.db.trades.find(query, projection).to_list(None)
+
+    async def update_trade(self, user_id, trade_id, fields, return_before=False):
+        return await self.db.trades.find_one_and_update(
+            {"id": trade_id, "user_id": user_id},
+            {"$set": fields},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE if return_before else ReturnDocument.AFTER,
+        )
+
+    async def delete_trade(self, user_id, trade_id):
+        return await self.db.trades.find_one_and_delete({"id": trade_id, "user_id": user_id}, {"_id": 0})
+
+    async def bulk_write_trades(self, user_id, operations):
+        # bulk_write only reports totals, not which operation matched. Every
+        # update stamps the same updated_at, so one find afterwards tells the
+        # updates that applied; a delete applied if its trade was there
+        # before the write and is gone after it.
+        now = datetime.now(timezone.utc)
+        # BSON keeps milliseconds; a finer stamp would not match itself
+        stamp = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        update_ids = {trade_id for action, trade_id, _, _ in operations if action != "delete"}
+        delete_ids = {trade_id for action, trade_id, _, _ in operations if action == "delete"}
+        present = set()
+        if delete_ids:
+            present = await self._owned_ids(user_id, {"id": {"$in": list(delete_ids)}})
+
+        requests = []
+        for action, trade_id, fields, expected in operations:
+            # {"field": None} also matches a missing field
+            query = {"id": trade_id, "user_id": user_id, **(expected or {})}
+            if action == "delete":
+                requests.append(DeleteOne(query))
+            else:
+                requests.append(UpdateOne(query, {"$set": {**fields, "updated_at": stamp}}))
+        errors = []
+        try:
+            deleted = (await self.db.trades.bulk_write(requests, ordered=False)).deleted_count
+        except BulkWriteError as e:
+            errors = write_errors(e)
+            deleted = e.details.get("nRemoved", 0)
+
+        found = await self._owned_ids(user_id, {"$or": [
+            {"id": {"$in": list(update_ids)}, "updated_at": stamp},
+            {"id": {"$in": list(delete_ids)}},
+        ]})
+        gone = present - found
+        if deleted < len(gone):
+            # Some were deleted concurrently between the two reads, and there
+            # is no telling which; report them all, verify_aggregates repairs
+            # what that leaves out
+            logger.warning("Concurrent deletes during a bulk write for user %s", user_id)
+            gone = set()
+        failed = {index for index, _ in errors}
+        unmatched = [
+            index
+            for index, (action, trade_id, _, _) in enumerate(operations)
+            if index not in failed and trade_id not in (gone if action == "delete" else found)
+        ]
+        return errors, unmatched
+
+    async def _owned_ids(self, user_id, query):
+        docs = await self.db.trades.find({"user_id": user_id, **query}, {"_id": 0, "id": 1}).to_list(None)
+        return {doc["id"] for doc in docs}
+
+    async def aggregate_stats(self, user_id, date_from=None, date_to=None, group_by=None):
+        pipeline = [
+            {"$match": build_trade_query(user_id, TradeFilter(date_from=date_from, date_to=date_to))},
+            {"$group": {
+                "_id": STATS_GROUP_KEYS[group_by] if group_by else None,
+                "total_trades": {"$sum": 1},
+                "total_pnl": {"$sum": {"$ifNull": ["$pnl", 0]}},
+                "winning_trades": {"$sum": {"$cond": [{"$gt": ["$pnl", 0]}, 1, 0]}},
+                "losing_trades": {"$sum": {"$cond": [{"$lt": ["$pnl", 0]}, 1, 0]}},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        return await self.db.trades.aggregate(pipeline).to_list(None)
+
+    # Aggregates
+
+    async def get_user_stats(self, user_id):
+        return await self.db.user_stats.find_one({"user_id": user_id}, {"_id": 0, "user_id": 0})
+
+    async def increment_user_stats(self, user_id, delta):
+        stats = await self.db.user_stats.find_one_and_update(
+            {"user_id": user_id},
+            {"$inc": {**delta, "version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return stats["version"] if stats else None
+
+    async def replace_user_stats(self, user_id, stats):
+        await self.db.user_stats.update_one(
+            {"user_id": user_id}, {"$set": stats, "$inc": {"version": 1}}, upsert=True
+        )
+
+    async def increment_daily_rollups(self, user_id, day_deltas):
+        updates = [
+            UpdateOne({"user_id": user_id, "date": day}, {"$inc": delta}, upsert=True)
+            for day, delta in day_deltas.items()
+            if any(delta.values())
+        ]
+        if updates:
+            await self.db.daily_rollups.bulk_write(updates, ordered=False)
+        emptied = [day for day, delta in day_deltas.items() if delta.get("total_trades", 0) < 0]
+        if emptied:
+            await self.db.daily_rollups.delete_many(
+                {"user_id": user_id, "date": {"$in": emptied}, "total_trades": {"$lte": 0}}
+            )
+
+    async def replace_daily_rollups(self, user_id, rows):
+        await self.db.daily_rollups.delete_many({"user_id": user_id})
+        if rows:
+            await self.db.daily_rollups.insert_many([{"user_id": user_id, **row} for row in rows])
+
+    async def find_daily_rollups(self, user_id, date_from=None, date_to=None):
+        query = {"user_id": user_id}
+        if date_from or date_to:
+            query["date"] = {}
+            if date_from:
+                query["date"]["$gte"] = to_mongo_date(date_from)
+            if date_to:
+                query["date"]["$lte"] = to_mongo_date(date_to)
+        return await self.db.daily_rollups.find(query, {"_id": 0, "user_id": 0}).sort("date", 1).to_list(None)
+
+    # Uploads
+
+    async def register_upload(self, name, size, created_at):
+        await self.db.uploads.update_one(
+            {"_id": name},
+            {"$setOnInsert": {"refs": 0, "size": size, "created_at": created_at}},
+            upsert=True,
+        )
+
+    async def adjust_upload_refs(self, name, delta):
+        counted = await self.db.uploads.update_one({"_id": name}, {"$inc": {"refs": delta}})
+        if counted.matched_count and delta < 0:
+            released = await self.db.uploads.delete_one({"_id": name, "refs": {"$lte": 0}})
+            return released.deleted_count == 1
+        return False
+
+    async def find_unreferenced_uploads(self, before):
+        cursor = self.db.uploads.find({"refs": {"$lte": 0}, "created_at": {"$lt": before}}, {"_id": 1})
+        return [upload["_id"] async for upload in cursor]
+
+    async def release_upload(self, name):
+        released = await self.db.uploads.delete_one({"_id": name, "refs": {"$lte": 0}})
+        return released.deleted_count == 1
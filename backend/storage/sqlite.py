@@ -0,0 +1,528 @@
+"""
+Embedded SQLite backend for single-node deployments.
+
+The database runs in WAL mode. Readers don't block the writer, and the
+writer doesn't block readers. All writes go through one dedicated thread.
+Reads spread over a small pool of threads, each with its own connection.
+Neither ever runs on the event loop.
+
+The indexes mirror the Mongo ones:
+- (user_id, date DESC, id) for every listing
+- the same key prefixed with pair or trade_type
+- partial indexes for wins and losses
+- an FTS5 table over pair and comments for search
+
+Dates are stored as ISO text, days as "YYYY-MM-DD". Both sort correctly as
+text, and they are converted back to the datetimes of the storage interface
+on the way out.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache
+
+from .base import STAT_FIELDS, DuplicateError, Repository, TradeFilter, to_mongo_date
+
+USER_COLUMNS = ("id", "email", "full_name", "password", "balance", "created_at")
+TRADE_COLUMNS = (
+    "id", "user_id", "date", "pair", "trade_type", "entry_price", "exit_price", "quantity",
+    "stop_loss", "take_profit", "risk_amount", "pnl", "comments", "chart_image_url",
+    "created_at", "updated_at",
+)
+LISTED_COLUMNS = tuple(column for column in TRADE_COLUMNS if column != "user_id")
+TIMESTAMP_COLUMNS = {"created_at", "updated_at"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    full_name TEXT,
+    password TEXT,
+    balance REAL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    pair TEXT,
+    trade_type TEXT,
+    entry_price REAL,
+    exit_price REAL,
+    quantity REAL,
+    stop_loss REAL,
+    take_profit REAL,
+    risk_amount REAL,
+    pnl REAL,
+    comments TEXT,
+    chart_image_url TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_user_date_id ON trades (user_id, date DESC, id);
+CREATE INDEX IF NOT EXISTS trades_user_pair_date_id ON trades (user_id, pair, date DESC, id);
+CREATE INDEX IF NOT EXISTS trades_user_type_date_id ON trades (user_id, trade_type, date DESC, id);
+CREATE INDEX IF NOT EXISTS trades_user_date_id_wins ON trades (user_id, date DESC, id) WHERE pnl > 0;
+CREATE INDEX IF NOT EXISTS trades_user_date_id_losses ON trades (user_id, date DESC, id) WHERE pnl < 0;
+CREATE VIRTUAL TABLE IF NOT EXISTS trades_text USING fts5(
+    pair, comments, content='trades', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS trades_text_insert AFTER INSERT ON trades BEGIN
+    INSERT INTO trades_text (rowid, pair, comments) VALUES (new.rowid, new.pair, new.comments);
+END;
+CREATE TRIGGER IF NOT EXISTS trades_text_delete AFTER DELETE ON trades BEGIN
+    INSERT INTO trades_text (trades_text, rowid, pair, comments) VALUES ('delete', old.rowid, old.pair, old.comments);
+END;
+CREATE TRIGGER IF NOT EXISTS trades_text_update AFTER UPDATE OF pair, comments ON trades BEGIN
+    INSERT INTO trades_text (trades_text, rowid, pair, comments) VALUES ('delete', old.rowid, old.pair, old.comments);
+    INSERT INTO trades_text (rowid, pair, comments) VALUES (new.rowid, new.pair, new.comments);
+END;
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id TEXT PRIMARY KEY,
+    total_trades INTEGER NOT NULL DEFAULT 0,
+    total_pnl REAL NOT NULL DEFAULT 0,
+    winning_trades INTEGER NOT NULL DEFAULT 0,
+    losing_trades INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    total_trades INTEGER NOT NULL DEFAULT 0,
+    total_pnl REAL NOT NULL DEFAULT 0,
+    winning_trades INTEGER NOT NULL DEFAULT 0,
+    losing_trades INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS uploads (
+    name TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    created_at TEXT
+);
+"""
+
+GROUP_KEYS = {
+    "pair": "pair",
+    "trade_type": "trade_type",
+    "month": "substr(date, 1, 7)",
+    "day": "date",
+}
+
+
+def encode_value(column, value):
+    if column == "date" and isinstance(value, (date, datetime)):
+        return (value.date() if isinstance(value, datetime) else value).isoformat()
+    if column in TIMESTAMP_COLUMNS and isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# A journal has far fewer distinct days than trades, and datetimes are immutable
+@lru_cache(maxsize=65536)
+def decode_day(value):
+    return to_mongo_date(date.fromisoformat(value))
+
+
+def decode_row(row):
+    doc = dict(row)
+    if doc.get("date") is not None:
+        doc["date"] = decode_day(doc["date"])
+    for column in TIMESTAMP_COLUMNS & doc.keys():
+        if doc[column] is not None:
+            doc[column] = datetime.fromisoformat(doc[column])
+    return doc
+
+
+def checked_columns(columns, allowed):
+    # Column names are interpolated into SQL, so only known ones get through
+    unknown = set(columns) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    return list(columns)
+
+
+def expected_conditions(expected):
+    """Extra WHERE terms for bulk_write_trades' expected values; IS also matches NULL."""
+    columns = checked_columns(expected or {}, LISTED_COLUMNS)
+    return (
+        "".join(f" AND {column} IS ?" for column in columns),
+        [encode_value(column, expected[column]) for column in columns],
+    )
+
+
+def match_expression(search):
+    # Any of the words, like a Mongo $text search; quoted so they can't be FTS syntax
+    terms = search.split()
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def trade_conditions(user_id, filters):
+    conditions = ["user_id = ?"]
+    params = [user_id]
+    if filters.pair:
+        conditions.append("pair = ?")
+        params.append(filters.pair)
+    if filters.trade_type:
+        conditions.append("trade_type = ?")
+        params.append(filters.trade_type)
+    # Must match the WHERE of the win/loss partial indexes
+    if filters.outcome == "win":
+        conditions.append("pnl > 0")
+    elif filters.outcome == "loss":
+        conditions.append("pnl < 0")
+    if filters.date_from:
+        conditions.append("date >= ?")
+        params.append(filters.date_from.isoformat())
+    if filters.date_to:
+        conditions.append("date <= ?")
+        params.append(filters.date_to.isoformat())
+    if filters.search and filters.search.split():
+        conditions.append("rowid IN (SELECT rowid FROM trades_text WHERE trades_text MATCH ?)")
+        params.append(match_expression(filters.search))
+    return conditions, params
+
+
+class SQLiteRepository(Repository):
+    name = "sqlite"
+
+    def __init__(self, path, readers=4):
+        self.path = str(path)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="sqlite-read")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    async def _read(self, fn, *args):
+        def run():
+            return fn(self._connection(), *args)
+        return await asyncio.get_running_loop().run_in_executor(self._readers, run)
+
+    async def _write(self, fn, *args):
+        def run():
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(connection, *args)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+            return result
+        return await asyncio.get_running_loop().run_in_executor(self._writer, run)
+
+    async def ensure_indexes(self):
+        await asyncio.get_running_loop().run_in_executor(
+            self._writer, lambda: self._connection().executescript(SCHEMA)
+        )
+
+    async def close(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+    async def ping(self):
+        await self._read(lambda connection: connection.execute("SELECT 1").fetchone())
+
+    # Users
+
+    async def get_user(self, user_id):
+        row = await self._read(lambda c: c.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone())
+        return decode_row(row) if row else None
+
+    async def get_user_by_email(self, email):
+        row = await self._read(lambda c: c.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone())
+        return decode_row(row) if row else None
+
+    async def insert_user(self, user):
+        values = [encode_value(column, user.get(column)) for column in USER_COLUMNS]
+        placeholders = ", ".join("?" * len(USER_COLUMNS))
+        try:
+            await self._write(
+                lambda c: c.execute(f"INSERT INTO users ({', '.join(USER_COLUMNS)}) VALUES ({placeholders})", values)
+            )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateError(str(e)) from e
+
+    async def replace_password(self, user_id, old_hash, new_hash):
+        cursor = await self._write(lambda c: c.execute(
+            "UPDATE users SET password = ? WHERE id = ? AND password = ?", (new_hash, user_id, old_hash)
+        ))
+        return cursor.rowcount == 1
+
+    # Trades
+
+    async def trade_user_ids(self):
+        rows = await self._read(lambda c: c.execute("SELECT DISTINCT user_id FROM trades").fetchall())
+        return [row["user_id"] for row in rows]
+
+    @staticmethod
+    def _insert(connection, trade):
+        values = [encode_value(column, trade.get(column)) for column in TRADE_COLUMNS]
+        placeholders = ", ".join("?" * len(TRADE_COLUMNS))
+        connection.execute(f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}) VALUES ({placeholders})", values)
+
+    async def insert_trade(self, trade):
+        await self._write(self._insert, trade)
+
+    async def insert_trades(self, trades):
+        def insert_all(connection):
+            errors = []
+            for index, trade in enumerate(trades):
+                try:
+                    self._insert(connection, trade)
+                except sqlite3.IntegrityError as e:
+                    errors.append((index, str(e)))
+            return errors
+        return await self._write(insert_all)
+
+    async def get_trade(self, user_id, trade_id):
+        row = await self._read(lambda c: c.execute(
+            "SELECT * FROM trades WHERE id = ? AND user_id = ?", (trade_id, user_id)
+        ).fetchone())
+        return decode_row(row) if row else None
+
+    async def get_trades(self, user_id, trade_ids):
+        trade_ids = list(set(trade_ids))
+        if not trade_ids:
+            return []
+        placeholders = ", ".join("?" * len(trade_ids))
+        rows = await self._read(lambda c: c.execute(
+            f"SELECT * FROM trades WHERE user_id = ? AND id IN ({placeholders})", [user_id, *trade_ids]
+        ).fetchall())
+        return [decode_row(row) for row in rows]
+
+    async def find_trades(self, user_id, filters=None, after=None, limit=50):
+        conditions, params = trade_conditions(user_id, filters or TradeFilter())
+        if after:
+            last_date, last_id = after
+            last_day = encode_value("date", last_date)
+            # The date <= bound gives the index a range to seek into
+            conditions.append("date <= ? AND (date < ? OR id > ?)")
+            params += [last_day, last_day, last_id]
+        sql = (
+            f"SELECT {', '.join(LISTED_COLUMNS)} FROM trades WHERE {' AND '.join(conditions)}"
+            " ORDER BY date DESC, id LIMIT ?"
+        )
+        rows = await self._read(lambda c: c.execute(sql, [*params, limit]).fetchall())
+        return [decode_row(row) for row in rows]
+
+    async def iter_trades(self, user_id, batch_size=1000):
+        # Keyset pages, so no read transaction stays open between batches
+        after = None
+        while True:
+            batch = await self.find_trades(user_id, after=after, limit=batch_size)
+            for trade in batch:
+                yield trade
+            if len(batch) < batch_size:
+                return
+            after = (batch[-1]["date"], batch[-1]["id"])
+
+    async def load_trades(self, user_id, fields=None, open_only=False, missing_pnl=False):
+        columns = checked_columns(fields, TRADE_COLUMNS) if fields else ["*"]
+        condition = "user_id = ?"
+        if open_only:
+            condition += " AND exit_price IS NULL"
+        if missing_pnl:
+            condition += " AND pnl IS NULL AND exit_price IS NOT NULL"
+        rows = await self._read(lambda c: c.execute(
+            f"SELECT {', '.join(columns)} FROM trades WHERE {condition}", (user_id,)
+        ).fetchall())
+        return [decode_row(row) for row in rows]
+
+    @staticmethod
+    def _update(connection, user_id, trade_id, fields, expected=None):
+        columns = checked_columns(fields, LISTED_COLUMNS)
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        values = [encode_value(column, fields[column]) for column in columns]
+        guard, guard_values = expected_conditions(expected)
+        return connection.execute(
+            f"UPDATE trades SET {assignments} WHERE id = ? AND user_id = ?{guard} RETURNING *",
+            [*values, trade_id, user_id, *guard_values],
+        ).fetchone()
+
+    async def update_trade(self, user_id, trade_id, fields, return_before=False):
+        def update(connection):
+            before = None
+            if return_before:
+                before = connection.execute(
+                    "SELECT * FROM trades WHERE id = ? AND user_id = ?", (trade_id, user_id)
+                ).fetchone()
+                if before is None:
+                    return None
+            after = self._update(connection, user_id, trade_id, fields)
+            return before if return_before else after
+        row = await self._write(update)
+        return decode_row(row) if row else None
+
+    async def delete_trade(self, user_id, trade_id):
+        row = await self._write(lambda c: c.execute(
+            "DELETE FROM trades WHERE id = ? AND user_id = ? RETURNING *", (trade_id, user_id)
+        ).fetchone())
+        return decode_row(row) if row else None
+
+    async def bulk_write_trades(self, user_id, operations):
+        def write_all(connection):
+            errors = []
+            unmatched = []
+            for index, (action, trade_id, fields, expected) in enumerate(operations):
+                try:
+                    if action == "delete":
+                        guard, guard_values = expected_conditions(expected)
+                        matched = connection.execute(
+                            f"DELETE FROM trades WHERE id = ? AND user_id = ?{guard}",
+                            (trade_id, user_id, *guard_values),
+                        ).rowcount
+                    else:
+                        matched = self._update(connection, user_id, trade_id, fields, expected) is not None
+                except (sqlite3.Error, ValueError) as e:
+                    errors.append((index, str(e)))
+                    continue
+                if not matched:
+                    unmatched.append(index)
+            return errors, unmatched
+        return await self._write(write_all)
+
+    async def aggregate_stats(self, user_id, date_from=None, date_to=None, group_by=None):
+        conditions, params = trade_conditions(user_id, TradeFilter(date_from=date_from, date_to=date_to))
+        key = GROUP_KEYS[group_by] if group_by else "NULL"
+        sql = (
+            f"SELECT {key} AS _id, COUNT(*) AS total_trades, TOTAL(pnl) AS total_pnl,"
+            " COUNT(CASE WHEN pnl > 0 THEN 1 END) AS winning_trades,"
+            " COUNT(CASE WHEN pnl < 0 THEN 1 END) AS losing_trades"
+            f" FROM trades WHERE {' AND '.join(conditions)}"
+            + (f" GROUP BY {key} ORDER BY {key}" if group_by else "")
+        )
+        rows = [dict(row) for row in await self._read(lambda c: c.execute(sql, params).fetchall())]
+        # Without GROUP BY an empty match still yields one all-zero row
+        rows = [row for row in rows if row["total_trades"]]
+        if group_by == "day":
+            for row in rows:
+                row["_id"] = decode_day(row["_id"])
+        return rows
+
+    # Aggregates
+
+    async def get_user_stats(self, user_id):
+        row = await self._read(lambda c: c.execute(
+            f"SELECT {', '.join(STAT_FIELDS)}, version FROM user_stats WHERE user_id = ?", (user_id,)
+        ).fetchone())
+        return dict(row) if row else None
+
+    async def increment_user_stats(self, user_id, delta):
+        values = [delta.get(field, 0) for field in STAT_FIELDS]
+        increments = ", ".join(f"{field} = {field} + ?" for field in STAT_FIELDS)
+        row = await self._write(lambda c: c.execute(
+            f"UPDATE user_stats SET {increments}, version = version + 1 WHERE user_id = ? RETURNING version",
+            [*values, user_id],
+        ).fetchone())
+        return row["version"] if row else None
+
+    async def replace_user_stats(self, user_id, stats):
+        values = [stats.get(field, 0) for field in STAT_FIELDS]
+        assignments = ", ".join(f"{field} = excluded.{field}" for field in STAT_FIELDS)
+        await self._write(lambda c: c.execute(
+            f"INSERT INTO user_stats (user_id, {', '.join(STAT_FIELDS)}, version) VALUES (?, ?, ?, ?, ?, 1)"
+            f" ON CONFLICT (user_id) DO UPDATE SET {assignments}, version = version + 1",
+            [user_id, *values],
+        ))
+
+    async def increment_daily_rollups(self, user_id, day_deltas):
+        increments = ", ".join(f"{field} = {field} + excluded.{field}" for field in STAT_FIELDS)
+        upsert = (
+            f"INSERT INTO daily_rollups (user_id, date, {', '.join(STAT_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)"
+            f" ON CONFLICT (user_id, date) DO UPDATE SET {increments}"
+        )
+        rows = [
+            [user_id, encode_value("date", day), *(delta.get(field, 0) for field in STAT_FIELDS)]
+            for day, delta in day_deltas.items()
+            if any(delta.values())
+        ]
+        emptied = [
+            (user_id, encode_value("date", day))
+            for day, delta in day_deltas.items()
+            if delta.get("total_trades", 0) < 0
+        ]
+
+        def apply(connection):
+            connection.executemany(upsert, rows)
+            connection.executemany(
+                "DELETE FROM daily_rollups WHERE user_id = ? AND date = ? AND total_trades <= 0", emptied
+            )
+        await self._write(apply)
+
+    async def replace_daily_rollups(self, user_id, rows):
+        values = [
+            [user_id, encode_value("date", row["date"]), *(row.get(field, 0) for field in STAT_FIELDS)]
+            for row in rows
+        ]
+
+        def replace(connection):
+            connection.execute("DELETE FROM daily_rollups WHERE user_id = ?", (user_id,))
+            connection.executemany(
+                f"INSERT INTO daily_rollups (user_id, date, {', '.join(STAT_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                values,
+            )
+        await self._write(replace)
+
+    async def find_daily_rollups(self, user_id, date_from=None, date_to=None):
+        conditions, params = ["user_id = ?"], [user_id]
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to.isoformat())
+        rows = await self._read(lambda c: c.execute(
+            f"SELECT date, {', '.join(STAT_FIELDS)} FROM daily_rollups WHERE {' AND '.join(conditions)} ORDER BY date",
+            params,
+        ).fetchall())
+        return [decode_row(row) for row in rows]
+
+    # Uploads
+
+    async def register_upload(self, name, size, created_at):
+        await self._write(lambda c: c.execute(
+            "INSERT INTO uploads (name, refs, size, created_at) VALUES (?, 0, ?, ?) ON CONFLICT (name) DO NOTHING",
+            (name, size, encode_value("created_at", created_at)),
+        ))
+
+    async def adjust_upload_refs(self, name, delta):
+        def adjust(connection):
+            counted = connection.execute("UPDATE uploads SET refs = refs + ? WHERE name = ?", (delta, name)).rowcount
+            if counted and delta < 0:
+                return connection.execute("DELETE FROM uploads WHERE name = ? AND refs <= 0", (name,)).rowcount == 1
+            return False
+        return await self._write(adjust)
+
+    async def find_unreferenced_uploads(self, before):
+        rows = await self._read(lambda c: c.execute(
+            "SELECT name FROM uploads WHERE refs <= 0 AND created_at < ?",
+            (encode_value("created_at", before),),
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    async def release_upload(self, name):
+        return await self._write(lambda c: c.execute(
+            "DELETE FROM uploads WHERE name = ? AND refs <= 0", (name,)
+        ).rowcount == 1)
@@ -0,0 +1,256 @@
+"""
+Incremental readers and writers for trade import/export files.
+
+Every reader consumes an async iterator of byte chunks (e.g. Starlette's
+request.stream()) and yields (row_number, record) pairs as soon as a complete
+record has arrived, so memory stays bounded by the longest single record.
+A record that cannot be parsed is yielded as a ValueError instead of a dict;
+so is one longer than MAX_RECORD_CHARS, which is skipped rather than
+buffered (e.g. everything after a stray quote in a CSV file).
+
+Every writer consumes an async iterator of trade batches and yields encoded
+bytes per batch, so an export never holds more than one batch in memory.
+"""
+
+import codecs
+import csv
+import io
+import json
+
+import orjson
+
+# Columns accepted in import files, in the order they are written on export
+TRADE_COLUMNS = [
+    "date",
+    "pair",
+    "trade_type",
+    "entry_price",
+    "exit_price",
+    "quantity",
+    "stop_loss",
+    "take_profit",
+    "risk_amount",
+    "pnl",
+    "comments",
+    "chart_image_url",
+]
+
+# Longest line or CSV record an import buffers before giving up on it
+MAX_RECORD_CHARS = 1024 * 1024
+
+
+def record_too_long(max_length):
+    return ValueError(f"Record longer than {max_length} characters")
+
+
+async def iter_lines(chunks, encoding="utf-8", max_length=MAX_RECORD_CHARS):
+    """Lines without their ending; an overlong line is dropped and yielded as a ValueError."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    # Inside an overlong line: drop everything up to its end
+    skipping = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+                continue
+            yield line.rstrip("\r")
+        if len(pending) > max_length:
+            if not skipping:
+                yield record_too_long(max_length)
+            skipping = True
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield pending.rstrip("\r")
+
+
+async def iter_ndjson_rows(chunks, max_length=MAX_RECORD_CHARS):
+    row_number = 0
+    async for line in iter_lines(chunks, max_length=max_length):
+        if isinstance(line, ValueError):
+            row_number += 1
+            yield row_number, line
+            continue
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield row_number, ValueError("Expected a JSON object")
+            continue
+        yield row_number, record
+
+
+async def iter_csv_records(chunks, max_length=MAX_RECORD_CHARS):
+    # A quoted field may contain newlines; keep joining physical lines until
+    # the quotes balance before handing the record to the csv module. Past
+    # max_length the quotes are taken to be broken and the record is dropped.
+    record = None
+    async for line in iter_lines(chunks, max_length=max_length):
+        if isinstance(line, ValueError):
+            record = None
+            yield line
+            continue
+        record = line if record is None else record + "\n" + line
+        if record.count('"') % 2 == 0:
+            yield next(csv.reader([record]))
+            record = None
+        elif len(record) > max_length:
+            record = None
+            yield ValueError(f"Unbalanced quotes: record longer than {max_length} characters")
+    if record is not None:
+        yield next(csv.reader([record]))
+
+
+async def iter_csv_rows(chunks, max_length=MAX_RECORD_CHARS):
+    header = None
+    row_number = 0
+    async for values in iter_csv_records(chunks, max_length):
+        if isinstance(values, ValueError):
+            row_number += 1
+            yield row_number, values
+            continue
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells mean "not set", as in the JSON form
+        yield row_number, {
+            name: (value if value != "" else None)
+            for name, value in zip(header, values)
+            if name in TRADE_COLUMNS
+        }
+
+
+ROW_READERS = {
+    "csv": iter_csv_rows,
+    "ndjson": iter_ndjson_rows,
+}
+
+
+EXPORT_COLUMNS = ["id", *TRADE_COLUMNS, "created_at", "updated_at"]
+
+
+async def iter_batches(cursor, size, transform=None):
+    batch = []
+    async for doc in cursor:
+        batch.append(transform(doc) if transform else doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def write_ndjson(batches):
+    async for batch in batches:
+        yield b"".join(
+            orjson.dumps({column: trade.get(column) for column in EXPORT_COLUMNS}, option=orjson.OPT_UTC_Z) + b"\n"
+            for trade in batch
+        )
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+async def write_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([csv_value(trade.get(column)) for column in EXPORT_COLUMNS] for trade in batch)
+        yield buffer.getvalue().encode()
+
+
+class DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed off and forgotten."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def write_parquet(batches):
+    # pyarrow is optional; callers check parquet_available() first
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("date", pa.date32()),
+        ("pair", pa.string()),
+        ("trade_type", pa.string()),
+        ("entry_price", pa.float64()),
+        ("exit_price", pa.float64()),
+        ("quantity", pa.float64()),
+        ("stop_loss", pa.float64()),
+        ("take_profit", pa.float64()),
+        ("risk_amount", pa.float64()),
+        ("pnl", pa.float64()),
+        ("comments", pa.string()),
+        ("chart_image_url", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+    ])
+    sink = DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        # One row group per batch; only the footer waits for the end
+        async for batch in batches:
+            columns = {column: [trade.get(column) for trade in batch] for column in EXPORT_COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORT_WRITERS = {
+    "ndjson": (write_ndjson, "application/x-ndjson"),
+    "csv": (write_csv, "text/csv"),
+    "parquet": (write_parquet, "application/vnd.apache.parquet"),
+}
@@ -12,7 +12,7 @@ import uuid
 import os
 
 class TradingJournalAPITester:
-    def __init__(self, base_url="https://tradeflow-36.preview.emergentagent.com"):
+    def __init__(self, base_url=os.environ.get("BACKEND_URL", "https://tradeflow-36.preview.emergentagent.com")):
         self.base_url = base_url
         self.api_url = f"{base_url}/api"
         self.token = None
@@ -89,6 +89,14 @@ class TradingJournalAPITester:
         else:
             return self.log_test("Root endpoint", False, f"Response: {response}")
 
+    def test_readiness(self):
+        """Test health and readiness endpoints"""
+        success, response = self.make_request('GET', 'ready')
+        if success and response.get('status') == 'ready':
+            return self.log_test("Readiness", True, f"{response['storage']} ping {response['ping_ms']} ms")
+        else:
+            return self.log_test("Readiness", False, f"Response: {response}")
+
     def test_user_registration(self):
         """Test user registration"""
         test_email = f"test_{uuid.uuid4().hex[:8]}@trader.com"
@@ -164,6 +172,28 @@ class TradingJournalAPITester:
         else:
             return self.log_test("Create trade", False, f"Response: {response}")
 
+    def test_import_trades(self):
+        """Test bulk CSV import with one invalid row"""
+        if not self.token:
+            return self.log_test("Import trades", False, "No token available")
+        
+        csv_body = (
+            "date,pair,trade_type,entry_price,exit_price,quantity,pnl,comments\n"
+            f"{date.today().isoformat()},GBP/USD,Short,1.27,1.26,1000,10,Imported trade\n"
+            "not-a-date,GBP/USD,Short,1.27,1.26,1000,10,Broken row\n"
+        )
+        headers = {'Authorization': f'Bearer {self.token}', 'Content-Type': 'text/csv'}
+        
+        try:
+            response = requests.post(f"{self.api_url}/trades/import", data=csv_body, headers=headers).json()
+        except Exception as e:
+            return self.log_test("Import trades", False, f"Error: {e}")
+        
+        if response.get('inserted') == 1 and response.get('failed') == 1:
+            return self.log_test("Import trades", True, f"Row errors: {response['errors']}")
+        else:
+            return self.log_test("Import trades", False, f"Response: {response}")
+
     def test_get_trades(self):
         """Test getting all trades for user"""
         if not self.token:
@@ -171,8 +201,8 @@ class TradingJournalAPITester:
         
         success, response = self.make_request('GET', 'trades')
         
-        if success and isinstance(response, list):
-            return self.log_test("Get trades", True, f"Found {len(response)} trades")
+        if success and isinstance(response.get('trades'), list) and 'next_cursor' in response:
+            return self.log_test("Get trades", True, f"Found {len(response['trades'])} trades")
         else:
             return self.log_test("Get trades", False, f"Response: {response}")
 
@@ -205,6 +235,26 @@ class TradingJournalAPITester:
         else:
             return self.log_test("Update trade", False, f"Response: {response}")
 
+    def test_bulk_trades(self):
+        """Test bulk updating trades with per-item results"""
+        if not self.token or not hasattr(self, 'test_trade_id'):
+            return self.log_test("Bulk trades", False, "No token or trade ID available")
+        
+        bulk_data = {
+            "operations": [
+                {"id": self.test_trade_id, "action": "update", "data": {"comments": "Re-tagged in bulk"}},
+                {"id": "invalid-id", "action": "delete"}
+            ]
+        }
+        
+        success, response = self.make_request('POST', 'trades/bulk', bulk_data)
+        
+        statuses = [result['status'] for result in response.get('results', [])] if success else []
+        if statuses == ['updated', 'not_found']:
+            return self.log_test("Bulk trades", True, f"Results: {statuses}")
+        else:
+            return self.log_test("Bulk trades", False, f"Response: {response}")
+
     def test_dashboard_stats(self):
         """Test dashboard statistics endpoint"""
         if not self.token:
@@ -220,6 +270,57 @@ class TradingJournalAPITester:
         else:
             return self.log_test("Dashboard stats", False, f"Response: {response}")
 
+    def test_dashboard(self):
+        """Test composite dashboard endpoint with stats and recent trades"""
+        if not self.token:
+            return self.log_test("Dashboard", False, "No token available")
+        
+        success, response = self.make_request('GET', 'dashboard?recent=5')
+        
+        if success and 'total_trades' in response.get('stats', {}) and len(response.get('trades', [])) <= 5:
+            return self.log_test("Dashboard", True, f"{len(response['trades'])} recent trades")
+        else:
+            return self.log_test("Dashboard", False, f"Response: {response}")
+
+    def test_dashboard_stats_breakdown(self):
+        """Test dashboard statistics grouped by pair within a date range"""
+        if not self.token:
+            return self.log_test("Dashboard stats breakdown", False, "No token available")
+        
+        today = date.today().isoformat()
+        success, response = self.make_request('GET', f'dashboard/stats?group_by=pair&from={today}&to={today}')
+        
+        if success and isinstance(response.get('breakdown'), list):
+            pairs = [row['pair'] for row in response['breakdown']]
+            return self.log_test("Dashboard stats breakdown", True, f"Pairs: {pairs}")
+        else:
+            return self.log_test("Dashboard stats breakdown", False, f"Response: {response}")
+
+    def test_open_positions(self):
+        """Test open positions marked to market"""
+        if not self.token:
+            return self.log_test("Open positions", False, "No token available")
+        
+        success, response = self.make_request('GET', 'positions/open')
+        
+        if success and isinstance(response.get('positions'), list) and 'unrealized_pnl' in response:
+            return self.log_test("Open positions", True,
+                f"{response['open_trades']} open, {response['unpriced']} unpriced, ${response['unrealized_pnl']} unrealized")
+        else:
+            return self.log_test("Open positions", False, f"Response: {response}")
+
+    def test_admin_jobs(self):
+        """Test the job status endpoint is closed to regular users"""
+        if not self.token:
+            return self.log_test("Admin jobs", False, "No token available")
+        
+        success, response = self.make_request('GET', 'admin/jobs', expected_status=403)
+        
+        if success:
+            return self.log_test("Admin jobs", True, "Regular user gets 403")
+        else:
+            return self.log_test("Admin jobs", False, f"Response: {response}")
+
     def test_file_upload(self):
         """Test file upload endpoint"""
         if not self.token:
@@ -249,6 +350,19 @@ class TradingJournalAPITester:
         else:
             return self.log_test("Delete trade", False, f"Response: {response}")
 
+    def test_metrics(self):
+        """Test Prometheus metrics endpoint"""
+        url = f"{self.api_url}/metrics"
+        try:
+            response = requests.get(url)
+        except Exception as e:
+            return self.log_test("Metrics", False, f"Error: {str(e)}")
+        
+        if response.status_code == 200 and 'http_request_duration_seconds_bucket' in response.text:
+            return self.log_test("Metrics", True, f"{len(response.text.splitlines())} lines")
+        else:
+            return self.log_test("Metrics", False, f"Status: {response.status_code}")
+
     def test_invalid_endpoints(self):
         """Test error handling for invalid endpoints"""
         # Test 404 for non-existent trade
@@ -276,16 +390,24 @@ class TradingJournalAPITester:
         
         # Test sequence
         self.test_root_endpoint()
+        self.test_readiness()
         self.test_user_registration()
         self.test_user_login()
         self.test_get_current_user()
         self.test_create_trade()
+        self.test_import_trades()
         self.test_get_trades()
         self.test_get_single_trade()
         self.test_update_trade()
+        self.test_bulk_trades()
         self.test_dashboard_stats()
+        self.test_dashboard()
+        self.test_dashboard_stats_breakdown()
+        self.test_open_positions()
+        self.test_admin_jobs()
         self.test_file_upload()
         self.test_invalid_endpoints()
+        self.test_metrics()
         self.test_delete_trade()
         
         # Print summary
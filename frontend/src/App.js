@@ -32,7 +32,15 @@ axios.interceptors.request.use(
 
 axios.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const { config, response } = error;
+    // Reads that hit the rate limit are retried once, after the server's Retry-After
+    if (response?.status === 429 && config?.method === 'get' && !config._retried) {
+      config._retried = true;
+      const seconds = Math.min(Number(response.headers['retry-after']) || 1, 5);
+      await new Promise((resolve) => setTimeout(resolve, seconds * 1000));
+      return axios(config);
+    }
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
       localStorage.removeItem('user');
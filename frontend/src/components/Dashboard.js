@@ -5,6 +5,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 import { Button } from "@/components/ui/button";
 import axios from 'axios';
 import TradingCalendar from "../components/TradingCalendar";
+import { useChangeFeed } from "../hooks/use-change-feed";
 import { 
   TrendingUp, 
   TrendingDown, 
@@ -28,13 +29,10 @@ const Dashboard = () => {
 
   const fetchDashboardData = async () => {
     try {
-      const [statsRes, tradesRes] = await Promise.all([
-        axios.get(`${API}/dashboard/stats`),
-        axios.get(`${API}/trades`)
-      ]);
+      const res = await axios.get(`${API}/dashboard`, { params: { recent: 5 } });
       
-      setStats(statsRes.data);
-      setRecentTrades(tradesRes.data.slice(0, 5)); // Get last 5 trades
+      setStats(res.data.stats);
+      setRecentTrades(res.data.trades); // Last 5 trades
     } catch (error) {
       console.error('Failed to fetch dashboard data:', error);
     } finally {
@@ -42,6 +40,27 @@ const Dashboard = () => {
     }
   };
 
+  // Live updates: fold the pushed deltas into what is on screen
+  useChangeFeed((event) => {
+    setStats((current) => {
+      if (!current) return current;
+      const next = { ...current };
+      for (const [field, delta] of Object.entries(event.stats)) {
+        next[field] = (next[field] || 0) + delta;
+      }
+      next.total_pnl = Math.round(next.total_pnl * 100) / 100;
+      next.win_rate = next.total_trades > 0 ? (next.winning_trades / next.total_trades) * 100 : 0;
+      return next;
+    });
+    setRecentTrades((current) => {
+      const changed = new Map(event.changes.map((change) => [change.id, change.trade]));
+      const kept = current.filter((trade) => !changed.has(trade.id));
+      const updated = [...kept, ...[...changed.values()].filter(Boolean)];
+      updated.sort((a, b) => b.date.localeCompare(a.date) || a.id.localeCompare(b.id));
+      return updated.slice(0, 5);
+    });
+  }, fetchDashboardData);
+
   const formatCurrency = (value) => {
     return new Intl.NumberFormat('en-US', {
       style: 'currency',
@@ -341,7 +341,7 @@ const TradeForm = () => {
                   {formData.chart_image_url ? (
                     <div className="relative" data-testid="uploaded-image-preview">
                       <img
-                        src={`${process.env.REACT_APP_BACKEND_URL}${formData.chart_image_url}`}
+                        src={`${process.env.REACT_APP_BACKEND_URL}/api${formData.chart_image_url}?size=preview`}
                         alt="Trade chart"
                         className="max-w-full max-h-64 rounded-lg mx-auto"
                       />
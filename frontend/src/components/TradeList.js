@@ -38,57 +38,47 @@ import {
 
 const TradeList = () => {
   const [trades, setTrades] = useState([]);
-  const [filteredTrades, setFilteredTrades] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [filterType, setFilterType] = useState('all');
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false);
   const [tradeToDelete, setTradeToDelete] = useState(null);
 
   useEffect(() => {
-    fetchTrades();
-  }, []);
+    // Debounce so typing in the search box doesn't fire a request per keystroke
+    const timeout = setTimeout(() => fetchTrades(), searchTerm ? 300 : 0);
+    return () => clearTimeout(timeout);
+  }, [searchTerm, filterType]);
 
-  useEffect(() => {
-    filterTrades();
-  }, [trades, searchTerm, filterType]);
+  const buildParams = (cursor) => {
+    const params = {};
+    if (cursor) params.cursor = cursor;
+    if (searchTerm) params.q = searchTerm;
+    if (filterType === 'long') params.trade_type = 'Long';
+    if (filterType === 'short') params.trade_type = 'Short';
+    if (filterType === 'profitable') params.outcome = 'win';
+    if (filterType === 'losing') params.outcome = 'loss';
+    return params;
+  };
 
-  const fetchTrades = async () => {
+  const fetchTrades = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API}/trades`);
-      setTrades(response.data);
+      const response = await axios.get(`${API}/trades`, { params: buildParams(cursor) });
+      setTrades(prev => cursor ? [...prev, ...response.data.trades] : response.data.trades);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to fetch trades');
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
-  const filterTrades = () => {
-    let filtered = trades;
-
-    // Search filter
-    if (searchTerm) {
-      filtered = filtered.filter(trade =>
-        trade.pair.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        trade.comments?.toLowerCase().includes(searchTerm.toLowerCase())
-      );
-    }
-
-    // Type filter
-    if (filterType !== 'all') {
-      if (filterType === 'long') {
-        filtered = filtered.filter(trade => trade.trade_type === 'Long');
-      } else if (filterType === 'short') {
-        filtered = filtered.filter(trade => trade.trade_type === 'Short');
-      } else if (filterType === 'profitable') {
-        filtered = filtered.filter(trade => trade.pnl > 0);
-      } else if (filterType === 'losing') {
-        filtered = filtered.filter(trade => trade.pnl < 0);
-      }
-    }
-
-    setFilteredTrades(filtered);
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchTrades(nextCursor);
   };
 
   const handleDelete = async () => {
@@ -183,21 +173,21 @@ const TradeList = () => {
         </Card>
 
         {/* Trades List */}
-        {filteredTrades.length === 0 ? (
+        {trades.length === 0 ? (
           <Card className="glass-effect border-0 shadow-lg">
             <CardContent className="p-12 text-center" data-testid="no-trades-found">
               <div className="text-gray-400 mb-4">
                 <TrendingUp className="mx-auto h-12 w-12" />
               </div>
               <h3 className="text-lg font-medium text-gray-900 mb-2">
-                {trades.length === 0 ? 'No trades yet' : 'No trades found'}
+                {!searchTerm && filterType === 'all' ? 'No trades yet' : 'No trades found'}
               </h3>
               <p className="text-gray-500 mb-6">
-                {trades.length === 0 
+                {!searchTerm && filterType === 'all'
                   ? 'Start your trading journey by adding your first trade' 
                   : 'Try adjusting your search or filters'}
               </p>
-              {trades.length === 0 && (
+              {!searchTerm && filterType === 'all' && (
                 <Link to="/add-trade">
                   <Button className="btn-primary text-white">
                     Add Your First Trade
@@ -208,7 +198,7 @@ const TradeList = () => {
           </Card>
         ) : (
           <div className="space-y-4" data-testid="trades-grid">
-            {filteredTrades.map((trade, index) => (
+            {trades.map((trade, index) => (
               <Card key={trade.id} className="glass-effect border-0 shadow-lg card-hover" data-testid={`trade-card-${index}`}>
                 <CardContent className="p-6">
                   <div className="flex flex-col md:flex-row md:items-center md:justify-between space-y-4 md:space-y-0">
@@ -302,8 +292,9 @@ const TradeList = () => {
                   {trade.chart_image_url && (
                     <div className="mt-4 pt-4 border-t border-gray-200/50">
                       <img
-                        src={`${process.env.REACT_APP_BACKEND_URL}${trade.chart_image_url}`}
+                        src={`${process.env.REACT_APP_BACKEND_URL}/api${trade.chart_image_url}?size=thumb`}
                         alt="Trade chart"
+                        loading="lazy"
                         className="max-w-full max-h-32 rounded-lg object-cover"
                       />
                     </div>
@@ -314,6 +305,20 @@ const TradeList = () => {
           </div>
         )}
 
+        {/* Load More */}
+        {nextCursor && (
+          <div className="flex justify-center">
+            <Button
+              variant="outline"
+              onClick={loadMore}
+              disabled={loadingMore}
+              data-testid="load-more-btn"
+            >
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </Button>
+          </div>
+        )}
+
         {/* Delete Confirmation Dialog */}
         <AlertDialog open={deleteDialogOpen} onOpenChange={setDeleteDialogOpen}>
           <AlertDialogContent>
@@ -1,46 +1,87 @@
 import React, { useState, useEffect, useContext } from "react";
 import { Calendar, dateFnsLocalizer } from "react-big-calendar";
 import "react-big-calendar/lib/css/react-big-calendar.css";
-import { format, parse, startOfWeek, getDay } from "date-fns";
+import { format, parse, startOfWeek, endOfWeek, startOfMonth, endOfMonth, getDay } from "date-fns";
 import enUS from "date-fns/locale/en-US";
 import axios from "axios";
 import { AuthContext, API } from "../App";
+import { useChangeFeed } from "../hooks/use-change-feed";
 
 // Lokalisierung für react-big-calendar
 const locales = { "en-US": enUS };
 const localizer = dateFnsLocalizer({ format, parse, startOfWeek, getDay, locales });
 
+// Sichtbarer Bereich der Monatsansicht, inklusive angeschnittener Wochen
+const monthRange = (day) => ({
+  start: startOfWeek(startOfMonth(day)),
+  end: endOfWeek(endOfMonth(day)),
+});
+
 const TradingCalendar = () => {
   const { user } = useContext(AuthContext);
-  const [trades, setTrades] = useState([]);
+  const [days, setDays] = useState([]);
+  const [range, setRange] = useState(monthRange(new Date()));
 
   useEffect(() => {
-    fetchTrades();
-  }, []);
+    fetchDays();
+  }, [range]);
 
-  const fetchTrades = async () => {
+  const fetchDays = async () => {
     try {
-      const res = await axios.get(`${API}/trades`);
-      setTrades(res.data);
+      // Nur die Tages-Rollups des sichtbaren Bereichs laden
+      const res = await axios.get(`${API}/trades/calendar`, {
+        params: {
+          from: format(range.start, "yyyy-MM-dd"),
+          to: format(range.end, "yyyy-MM-dd"),
+        },
+      });
+      setDays(res.data);
     } catch (error) {
-      console.error("Failed to fetch trades:", error);
+      console.error("Failed to fetch calendar:", error);
+    }
+  };
+
+  // Live-Updates: Tages-Deltas direkt in die geladenen Rollups einrechnen
+  useChangeFeed((event) => {
+    setDays((current) => {
+      const byDate = new Map(current.map((day) => [day.date, { ...day }]));
+      for (const { date, ...delta } of event.days) {
+        const day = byDate.get(date) || { date, total_trades: 0, total_pnl: 0, winning_trades: 0, losing_trades: 0 };
+        for (const [field, value] of Object.entries(delta)) {
+          day[field] = (day[field] || 0) + value;
+        }
+        day.total_pnl = Math.round(day.total_pnl * 100) / 100;
+        byDate.set(date, day);
+      }
+      return [...byDate.values()]
+        .filter((day) => day.total_trades > 0)
+        .sort((a, b) => a.date.localeCompare(b.date));
+    });
+  }, fetchDays);
+
+  const handleRangeChange = (newRange) => {
+    // Monatsansicht liefert {start, end}, Wochen- und Tagesansicht ein Array
+    if (Array.isArray(newRange)) {
+      setRange({ start: newRange[0], end: newRange[newRange.length - 1] });
+    } else {
+      setRange(newRange);
     }
   };
 
-  // Map Trades zu Calendar-Events
-  const events = trades.map((trade) => {
-    const tradeDate = new Date(trade.date);
+  // Map Tages-Rollups zu Calendar-Events
+  const events = days.map((day) => {
+    const dayDate = parse(day.date, "yyyy-MM-dd", new Date());
 
     // Gewinn = grün, Verlust = rot, P&L = 0 = grau
     const backgroundColor =
-      trade.pnl > 0 ? "green" : trade.pnl < 0 ? "red" : "gray";
+      day.total_pnl > 0 ? "green" : day.total_pnl < 0 ? "red" : "gray";
 
     return {
-      title: `${trade.pair} - ${trade.trade_type} - P&L: ${trade.pnl || 0}`,
-      start: tradeDate,
-      end: tradeDate,
+      title: `${day.total_trades} trade${day.total_trades === 1 ? "" : "s"} - P&L: ${day.total_pnl}`,
+      start: dayDate,
+      end: dayDate,
       allDay: true,
-      resource: trade,
+      resource: day,
       color: backgroundColor,
     };
   });
@@ -67,6 +108,7 @@ const TradingCalendar = () => {
         endAccessor="end"
         style={{ height: "100%" }}
         eventPropGetter={eventStyleGetter}
+        onRangeChange={handleRangeChange}
         popup
       />
     </div>
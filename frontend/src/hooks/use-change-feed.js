@@ -0,0 +1,74 @@
+import { useEffect, useRef } from "react";
+import { API } from "../App";
+
+const RECONNECT_DELAY = 3000;
+
+// Parse one Server-Sent Events block ("event: x\ndata: {...}")
+const parseEvent = (block) => {
+  let event = "message";
+  const data = [];
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data.push(line.slice(5).trim());
+  }
+  return data.length ? { event, data: JSON.parse(data.join("\n")) } : null;
+};
+
+/**
+ * Subscribe to the per-user change feed at /api/events.
+ *
+ * EventSource can't send the Authorization header, so the stream is read with
+ * fetch. onEvent gets each "trades" event; onReconnect runs after the stream
+ * was lost (or we were evicted for falling behind), when a refetch is due.
+ */
+export function useChangeFeed(onEvent, onReconnect) {
+  const handlers = useRef({ onEvent, onReconnect });
+  handlers.current = { onEvent, onReconnect };
+
+  useEffect(() => {
+    const controller = new AbortController();
+    let timer = null;
+    let connectedBefore = false;
+
+    const connect = async () => {
+      const token = localStorage.getItem("token");
+      if (!token) return;
+      try {
+        const res = await fetch(`${API}/events`, {
+          headers: { Authorization: `Bearer ${token}` },
+          signal: controller.signal,
+        });
+        if (!res.ok) throw new Error(`Change feed returned ${res.status}`);
+        if (connectedBefore) handlers.current.onReconnect?.();
+        connectedBefore = true;
+
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = "";
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          const blocks = buffer.split("\n\n");
+          buffer = blocks.pop();
+          for (const block of blocks) {
+            const message = parseEvent(block);
+            if (message?.event === "trades") handlers.current.onEvent(message.data);
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error("Change feed disconnected:", error);
+      }
+      if (!controller.signal.aborted) {
+        connectedBefore = true;
+        timer = setTimeout(connect, RECONNECT_DELAY);
+      }
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      clearTimeout(timer);
+    };
+  }, []);
+}
@@ -0,0 +1,113 @@
+"""
+Token buckets, route-class concurrency caps and the 429 responses.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from admission import AdmissionController, AdmissionMiddleware, RouteClass, TokenBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=2, burst=3, clock=clock)
+
+    assert [buckets.take("a") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("a") == 0.5
+    # Another caller has its own bucket
+    assert buckets.take("b") == 0
+
+    clock.now = 0.5
+    assert buckets.take("a") == 0
+    assert buckets.take("a", cost=3) == 1.5
+
+
+def test_token_buckets_are_bounded():
+    buckets = TokenBuckets(rate=1, burst=1, maxsize=2, clock=FakeClock())
+    for key in ("a", "b", "c"):
+        buckets.take(key)
+    assert len(buckets) == 2
+    # "a" was dropped, so it starts over with a full bucket
+    assert buckets.take("a") == 0
+
+
+def test_zero_rate_disables_limit():
+    buckets = TokenBuckets(rate=0, burst=0)
+    assert all(buckets.take("a") == 0 for _ in range(100))
+
+
+def test_route_class_queues_then_rejects():
+    async def scenario():
+        route_class = RouteClass("heavy", limit=1, max_queue=1, queue_timeout=0.05)
+        assert await route_class.acquire() is None
+
+        queued = asyncio.create_task(route_class.acquire())
+        await asyncio.sleep(0)
+        assert route_class.waiting == 1
+        assert await route_class.acquire() == "queue_full"
+
+        route_class.release()
+        assert await queued is None
+        assert route_class.in_flight == 1
+
+        assert await route_class.acquire() == "queue_timeout"
+        route_class.release()
+        assert (route_class.in_flight, route_class.waiting, route_class.admitted) == (0, 0, 2)
+
+    asyncio.run(scenario())
+
+
+def make_app(controller, gate):
+    async def app(scope, receive, send):
+        await gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return AdmissionMiddleware(app, controller)
+
+
+def test_middleware_answers_429_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(
+            TokenBuckets(rate=1, burst=2),
+            [RouteClass("read", limit=1, max_queue=0)],
+            classify=lambda method, path: None if path == "/health" else "read",
+            identify=lambda scope: scope["headers"][0][1] if scope["headers"] else "anonymous",
+        )
+        gate = asyncio.Event()
+        transport = httpx.ASGITransport(app=make_app(controller, gate))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            slow = asyncio.create_task(client.get("/a", headers={"x-user": "alice"}))
+            await asyncio.sleep(0.01)
+            busy = await client.get("/a", headers={"x-user": "alice"})
+            assert busy.status_code == 429
+            assert busy.headers["retry-after"] == "1"
+            gate.set()
+            assert (await slow).status_code == 200
+
+            limited = await client.get("/a", headers={"x-user": "alice"})
+            assert limited.status_code == 429
+            assert limited.json() == {"detail": "Rate limit exceeded"}
+            # Exempt paths skip both gates
+            assert (await client.get("/health", headers={"x-user": "alice"})).status_code == 200
+
+        read = controller.classes["read"]
+        assert read.rejected == {"rate_limited": 1, "queue_full": 1, "queue_timeout": 0}
+        metrics = {name: values for name, _, _, values, _ in controller.collect()}
+        assert metrics["admission_rejected_total"][("read", "queue_full")] == 1
+        assert metrics["admission_in_flight"][("read",)] == 0
+
+    asyncio.run(scenario())
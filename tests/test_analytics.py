@@ -0,0 +1,51 @@
+"""
+Columnar analytics: building columns from stored trades and the metrics on them.
+"""
+
+import math
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from analytics import TradeColumns, compute_analytics
+
+
+def trade(day, pnl=None, trade_type="Long", entry=1.0, exit_=None, quantity=1.0, risk=None):
+    return {"date": day, "trade_type": trade_type, "entry_price": entry, "exit_price": exit_,
+            "quantity": quantity, "pnl": pnl, "risk_amount": risk}
+
+
+def test_columns_from_stored_documents():
+    columns = TradeColumns.from_documents([
+        # As the stores return it: a tz-aware datetime at midnight UTC
+        trade(datetime(2024, 1, 3, tzinfo=timezone.utc), trade_type="Short", entry=10.0, exit_=9.0, quantity=2.0),
+        trade("2024-01-02", entry=None, quantity=None),  # still open
+        trade(date(2024, 1, 1), pnl=5.0, risk=2.0),
+        trade(datetime(2024, 1, 1, tzinfo=timezone.utc), pnl=-1.0, risk=0.0),
+    ])
+
+    assert columns.date.tolist() == [date(2024, 1, 1), date(2024, 1, 1), date(2024, 1, 3)]
+    # Missing pnl is derived, in the trade's direction
+    assert columns.pnl.tolist() == [5.0, -1.0, 2.0]
+    assert columns.risk_amount[0] == 2.0 and np.isnan(columns.risk_amount[1:]).all()
+
+    empty = TradeColumns.from_documents([])
+    assert len(empty.date) == 0 and empty.date.dtype == np.dtype("datetime64[D]")
+
+
+def test_metrics_without_losses():
+    result = compute_analytics(TradeColumns.from_documents([
+        trade(date(2024, 1, 1), pnl=10.0, risk=5.0),
+        trade(date(2024, 1, 2), pnl=30.0, risk=5.0),
+    ]))
+
+    assert result["gross_profit"] == 40.0
+    assert result["gross_loss"] == 0.0 and math.copysign(1.0, result["gross_loss"]) == 1.0
+    assert result["profit_factor"] is None
+    assert result["max_drawdown"] == 0.0
+    assert result["r_multiples"]["total"] == 8.0
+    assert result["streaks"]["longest_win"] == 2
@@ -0,0 +1,227 @@
+"""
+Endpoint tests: the FastAPI app on the in-memory storage backend.
+
+server.py reads its settings at import time, so the environment is set
+before the first import. Every test gets a fresh store and caches.
+"""
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Set before backend/.env is loaded, which doesn't override them; nothing
+# here ever contacts MongoDB
+os.environ.update({
+    "MONGO_URL": "mongodb://localhost:27017",
+    "DB_NAME": "trading_journal_test",
+    "SECRET_KEY": "test-secret",
+    "STORAGE_BACKEND": "memory",
+    "BCRYPT_ROUNDS": "4",
+    "WARM_CONNECTIONS": "0",
+})
+
+from fastapi.testclient import TestClient
+
+import server
+from analytics import AnalyticsCache
+from cache import TTLCache
+from storage import MemoryRepository
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setattr(server, "storage", MemoryRepository())
+    monkeypatch.setattr(server, "user_cache", TTLCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(server, "version_cache", TTLCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(server, "analytics_cache", AnalyticsCache())
+    with TestClient(server.app) as client:
+        yield client
+
+
+def register(api, email="trader@example.com", password="secret"):
+    response = api.post("/api/auth/register", json={"email": email, "password": password, "full_name": "Trader"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create_trade(api, headers, **fields):
+    trade = {"date": "2024-01-02", "pair": "EUR/USD", "trade_type": "Long", "entry_price": 1.1,
+             "exit_price": 1.2, "quantity": 1000, "pnl": 100, **fields}
+    response = api.post("/api/trades", json=trade, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def data_version(api, user_id):
+    return api.portal.call(server.storage.get_user_stats, user_id)["version"]
+
+
+def test_matching_etag_answers_304(api):
+    headers = register(api)
+    create_trade(api, headers)
+
+    for path in ("/api/trades", "/api/dashboard/stats", "/api/dashboard", "/api/analytics"):
+        first = api.get(path, headers=headers)
+        assert first.status_code == 200 and first.headers["cache-control"] == "private, no-cache"
+        etag = first.headers["etag"]
+
+        again = api.get(path, headers={**headers, "If-None-Match": etag})
+        assert (again.status_code, again.content, again.headers["etag"]) == (304, b"", etag)
+
+    # Each view has an ETag of its own
+    assert api.get("/api/trades", headers=headers).headers["etag"] != \
+        api.get("/api/trades?pair=EUR/USD", headers=headers).headers["etag"]
+
+
+def test_trade_writes_invalidate_the_etag(api):
+    headers = register(api)
+    trade = create_trade(api, headers)
+    etag = api.get("/api/dashboard/stats", headers=headers).headers["etag"]
+    version = data_version(api, trade["user_id"])
+
+    writes = [
+        lambda: create_trade(api, headers, pnl=-50),
+        lambda: api.put(f"/api/trades/{trade['id']}", json={"pnl": 40}, headers=headers),
+        lambda: api.delete(f"/api/trades/{trade['id']}", headers=headers),
+    ]
+    for write in writes:
+        write()
+        version += 1
+        assert data_version(api, trade["user_id"]) == version
+
+        response = api.get("/api/dashboard/stats", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200 and response.headers["etag"] != etag
+        etag = response.headers["etag"]
+
+    assert api.get("/api/dashboard/stats", headers=headers).json()["total_trades"] == 1
+
+
+def test_etags_are_per_user(api):
+    alice = register(api, "alice@example.com")
+    bob = register(api, "bob@example.com")
+    etag = api.get("/api/trades", headers=alice).headers["etag"]
+
+    # Same data version and URL, but another user's cached copy never matches
+    assert api.get("/api/trades", headers={**bob, "If-None-Match": etag}).status_code == 200
+
+
+def test_dashboard_matches_the_individual_endpoints(api):
+    headers = register(api)
+    for day in range(2, 9):
+        create_trade(api, headers, date=f"2024-01-{day:02d}", pnl=day * 10 - 45)
+
+    dashboard = api.get("/api/dashboard?recent=3", headers=headers).json()
+    assert dashboard["stats"] == api.get("/api/dashboard/stats", headers=headers).json()
+    assert dashboard["trades"] == api.get("/api/trades?limit=3", headers=headers).json()["trades"]
+    assert [trade["date"] for trade in dashboard["trades"]] == ["2024-01-08", "2024-01-07", "2024-01-06"]
+
+
+def test_dashboard_without_recent_trades_skips_the_trade_query(api, monkeypatch):
+    headers = register(api)
+    create_trade(api, headers)
+    calls = []
+
+    async def find_trades(*args, **kwargs):
+        calls.append((args, kwargs))
+        return []
+    monkeypatch.setattr(server.storage, "find_trades", find_trades)
+
+    response = api.get("/api/dashboard?recent=0", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["trades"] == [] and response.json()["stats"]["total_trades"] == 1
+    assert calls == []
+    # The spy is live: the default does query
+    api.get("/api/dashboard", headers=headers)
+    assert len(calls) == 1
+
+
+def calendar(api, headers, date_from="2024-01-01", date_to="2024-01-31"):
+    response = api.get(f"/api/trades/calendar?from={date_from}&to={date_to}", headers=headers)
+    assert response.status_code == 200, response.text
+    return {row["date"]: (row["total_trades"], row["total_pnl"]) for row in response.json()}
+
+
+def test_calendar_covers_the_requested_days_only(api):
+    headers = register(api)
+    for day, pnl in [("2023-12-31", 5), ("2024-01-01", 10), ("2024-01-15", -20), ("2024-01-15", 32.505),
+                     ("2024-01-31", 40), ("2024-02-01", 50)]:
+        create_trade(api, headers, date=day, pnl=pnl)
+
+    # Both bounds are inclusive; days without trades have no row
+    assert calendar(api, headers) == {
+        "2024-01-01": (1, 10),
+        "2024-01-15": (2, 12.51),
+        "2024-01-31": (1, 40),
+    }
+    assert calendar(api, headers, "2024-01-15", "2024-01-15") == {"2024-01-15": (2, 12.51)}
+    assert calendar(api, headers, "2024-03-01", "2024-03-31") == {}
+    assert api.get("/api/trades/calendar?from=2024-01-01", headers=headers).status_code == 422
+
+
+def test_calendar_follows_trade_writes(api):
+    headers = register(api)
+    first = create_trade(api, headers, date="2024-01-02", pnl=100)
+    second = create_trade(api, headers, date="2024-01-02", pnl=-30)
+    third = create_trade(api, headers, date="2024-01-03", pnl=20)
+    user_id = first["user_id"]
+    assert calendar(api, headers) == {"2024-01-02": (2, 70), "2024-01-03": (1, 20)}
+
+    # Moving a trade to another day takes its P&L along
+    api.put(f"/api/trades/{first['id']}", json={"date": "2024-01-03", "pnl": 60}, headers=headers)
+    assert calendar(api, headers) == {"2024-01-02": (1, -30), "2024-01-03": (2, 80)}
+
+    # A day whose last trade goes away drops out
+    api.delete(f"/api/trades/{second['id']}", headers=headers)
+    assert calendar(api, headers) == {"2024-01-03": (2, 80)}
+
+    response = api.post("/api/trades/bulk", headers=headers, json={"operations": [
+        {"id": first["id"], "action": "update", "data": {"date": "2024-01-31"}},
+        {"id": third["id"], "action": "delete"},
+    ]})
+    assert response.json()["failed"] == 0
+    assert calendar(api, headers) == {"2024-01-31": (1, 60)}
+
+    # Every stored rollup still agrees with the trades themselves
+    assert api.portal.call(server.check_daily_rollups, user_id) == {}
+
+
+def test_login_upgrades_a_legacy_hash_once(api):
+    register(api, password="secret")
+    user = api.portal.call(server.storage.get_user_by_email, "trader@example.com")
+    legacy = hashlib.sha256(b"secret" + server.SECRET_KEY.encode()).hexdigest()
+    assert api.portal.call(server.storage.replace_password, user["id"], user["password"], legacy)
+
+    def login(password="secret"):
+        return api.post("/api/auth/login", json={"email": "trader@example.com", "password": password})
+
+    assert login("wrong").status_code == 401
+    assert api.portal.call(server.storage.get_user, user["id"])["password"] == legacy
+
+    assert login().status_code == 200
+    upgraded = api.portal.call(server.storage.get_user, user["id"])["password"]
+    assert upgraded.startswith("$2")
+    assert api.portal.call(server.password_hasher.verify, "secret", upgraded) == (True, False)
+
+    # Nothing left to upgrade: the next login leaves the hash alone
+    assert login().status_code == 200
+    assert api.portal.call(server.storage.get_user, user["id"])["password"] == upgraded
+
+
+def test_recompute_pnl_fills_in_closed_trades_only(api, monkeypatch):
+    headers = register(api)
+    # Left to the test rather than the background job
+    monkeypatch.setattr(server.jobs, "enqueue", lambda *args: True)
+    closed = create_trade(api, headers, trade_type="Short", entry_price=1.2, exit_price=1.1, pnl=None)
+    still_open = create_trade(api, headers, exit_price=None, pnl=None)
+    create_trade(api, headers, pnl=5)
+
+    api.portal.call(server.recompute_pnl, closed["user_id"])
+    pnls = {trade["id"]: trade["pnl"] for trade in api.get("/api/trades", headers=headers).json()["trades"]}
+    assert pnls[closed["id"]] == 100 and pnls[still_open["id"]] is None
+    assert api.get("/api/dashboard/stats", headers=headers).json()["total_pnl"] == 105
+    assert api.portal.call(server.check_daily_rollups, closed["user_id"]) == {}
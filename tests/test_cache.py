@@ -0,0 +1,90 @@
+"""
+TTL + LRU cache: expiry, eviction at capacity and the counters in stats().
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.put("a", 1)
+
+    clock.now += 4.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None
+    # Expired entries are dropped on lookup, not counted as evictions
+    assert cache.stats()["size"] == 0 and cache.evictions == 0
+
+    # A put restarts the entry's lifetime
+    cache.put("a", 2)
+    clock.now += 3
+    cache.put("a", 3)
+    clock.now += 3
+    assert cache.get("a") == 3
+
+
+def test_least_recently_used_is_evicted_at_capacity():
+    cache = TTLCache(maxsize=2, ttl=60, clock=FakeClock())
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Reading "a" makes "b" the oldest
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_stats_count_hits_misses_and_evictions():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=1, ttl=10, clock=clock)
+    assert cache.stats()["hit_rate"] == 0
+
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    cache.put("b", 2)  # evicts "a"
+    clock.now += 10
+    cache.get("b")  # expired
+
+    assert cache.stats() == {
+        "size": 0,
+        "maxsize": 1,
+        "ttl": 10,
+        "hits": 2,
+        "misses": 2,
+        "evictions": 1,
+        "hit_rate": 0.5,
+    }
+
+
+def test_invalidate_clear_and_disabled_cache():
+    cache = TTLCache(maxsize=10, ttl=60, clock=FakeClock())
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None and cache.get("b") == 2
+    cache.clear()
+    assert cache.get("b") is None
+
+    for disabled in (TTLCache(maxsize=0, ttl=60), TTLCache(maxsize=10, ttl=0)):
+        disabled.put("a", 1)
+        assert disabled.get("a") is None and disabled.stats()["size"] == 0
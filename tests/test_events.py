@@ -0,0 +1,120 @@
+"""
+Change feed fan-out, slow-consumer eviction and the change-stream source.
+
+The change-stream source runs against an in-memory stand-in for a Motor
+collection, so no replica set is needed.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from events import ChangeStreamEventSource, EventBroker, LocalEventSource, encode_message, format_sse
+
+
+class FakeChangeStream:
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class FakeEventCollection:
+    """Just enough of a Motor collection: inserts show up on every open watch()."""
+
+    def __init__(self):
+        self.streams = []
+        self.inserted = 0
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def insert_one(self, document):
+        self.inserted += 1
+        for queue in self.streams:
+            queue.put_nowait({"_id": self.inserted, "operationType": "insert", "fullDocument": document})
+
+    def watch(self, pipeline, resume_after=None):
+        queue = asyncio.Queue()
+        self.streams.append(queue)
+        return FakeChangeStream(queue)
+
+
+def test_broker_delivers_only_to_the_users_subscriptions():
+    async def scenario():
+        broker = EventBroker(queue_size=10)
+        first = broker.subscribe("alice")
+        second = broker.subscribe("alice")
+        other = broker.subscribe("bob")
+        source = LocalEventSource(broker)
+
+        await source.publish(encode_message("alice", "trades", {"version": 1}))
+
+        assert (await first.get())["data"] == '{"version":1}'
+        assert (await second.get())["data"] == '{"version":1}'
+        assert other.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_is_evicted_without_blocking_others():
+    async def scenario():
+        broker = EventBroker(queue_size=2)
+        slow = broker.subscribe("alice")
+        fast = broker.subscribe("alice")
+
+        for version in range(3):
+            broker.deliver(encode_message("alice", "trades", {"version": version}))
+            if not fast.evicted:
+                await fast.get()
+
+        assert slow.evicted
+        assert await slow.get() is None
+        assert not fast.evicted
+        assert broker.stats()["connections"] == 1
+        assert broker.stats()["evictions"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_unsubscribe_forgets_idle_users():
+    broker = EventBroker()
+    subscription = broker.subscribe("alice")
+    broker.unsubscribe(subscription)
+    assert not broker.has_subscribers("alice")
+    assert LocalEventSource(broker).wants("alice") is False
+
+
+def test_change_stream_source_shares_events_between_workers():
+    async def scenario():
+        collection = FakeEventCollection()
+        workers = [EventBroker(), EventBroker()]
+        sources = [ChangeStreamEventSource(broker, collection) for broker in workers]
+        for source in sources:
+            await source.start()
+        await asyncio.sleep(0)
+        subscriptions = [broker.subscribe("alice") for broker in workers]
+
+        # Published on the first worker, delivered on both
+        await sources[0].publish(encode_message("alice", "trades", {"version": 7}))
+
+        for subscription in subscriptions:
+            message = await asyncio.wait_for(subscription.get(), 1)
+            assert format_sse(message) == b'event: trades\ndata: {"version":7}\n\n'
+
+        for source in sources:
+            await source.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,143 @@
+"""
+Background job runner: coalescing, reruns, retries, concurrency and schedules.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from jobs import JobRunner
+
+
+def run(scenario):
+    asyncio.run(scenario())
+
+
+def test_duplicate_enqueues_coalesce():
+    async def scenario():
+        calls = []
+
+        async def job(key):
+            calls.append(key)
+
+        runner = JobRunner(concurrency=1)
+        runner.register("recompute", job, keyed=True)
+        assert runner.enqueue("recompute", "alice") is True
+        assert runner.enqueue("recompute", "alice") is False
+        assert runner.enqueue("recompute", "bob") is True
+        runner.start()
+        await runner.drain()
+        await runner.stop()
+
+        assert sorted(calls) == ["alice", "bob"]
+        status = runner.status()["jobs"]["recompute"]
+        assert (status["enqueued"], status["coalesced"], status["succeeded"]) == (2, 1, 2)
+
+    run(scenario)
+
+
+def test_enqueue_while_running_reruns_once():
+    async def scenario():
+        gate = asyncio.Event()
+        calls = []
+
+        async def job(key):
+            calls.append(key)
+            if len(calls) == 1:
+                await gate.wait()
+
+        runner = JobRunner(concurrency=2)
+        runner.register("recompute", job, keyed=True)
+        runner.start()
+        runner.enqueue("recompute", "alice")
+        await asyncio.sleep(0.01)
+        # Both land after the first run started; they fold into one rerun
+        assert runner.enqueue("recompute", "alice") is True
+        assert runner.enqueue("recompute", "alice") is False
+        gate.set()
+        await runner.drain()
+        await runner.stop()
+
+        assert calls == ["alice", "alice"]
+
+    run(scenario)
+
+
+def test_failures_are_retried_then_given_up():
+    async def scenario():
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError("store unavailable")
+
+        async def broken():
+            raise RuntimeError("always")
+
+        runner = JobRunner()
+        runner.register("flaky", flaky, retries=3, backoff=0)
+        runner.register("broken", broken, retries=1, backoff=0)
+        runner.start()
+        runner.enqueue("flaky")
+        runner.enqueue("broken")
+        await runner.drain()
+        await runner.stop()
+
+        status = runner.status()["jobs"]
+        assert (status["flaky"]["retried"], status["flaky"]["succeeded"]) == (2, 1)
+        assert (status["broken"]["retried"], status["broken"]["failed"]) == (1, 1)
+        assert status["broken"]["last_error"] == "RuntimeError: always"
+
+    run(scenario)
+
+
+def test_concurrency_is_bounded():
+    async def scenario():
+        active = 0
+        peak = 0
+
+        async def job(key):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        runner = JobRunner(concurrency=2, max_pending=5)
+        runner.register("rebuild", job, keyed=True)
+        queued = [runner.enqueue("rebuild", user) for user in range(6)]
+        runner.start()
+        await runner.drain()
+        await runner.stop()
+
+        assert queued == [True] * 5 + [False]
+        assert peak == 2
+        assert runner.status()["jobs"]["rebuild"]["dropped"] == 1
+
+    run(scenario)
+
+
+def test_periodic_jobs_and_metrics():
+    async def scenario():
+        ticks = []
+
+        async def purge():
+            ticks.append(1)
+
+        runner = JobRunner()
+        runner.register("purge", purge, every=0.02)
+        runner.start()
+        await asyncio.sleep(0.07)
+        await runner.stop()
+
+        assert 2 <= len(ticks) <= 4
+        metrics = {name: values for name, _, _, values, _ in runner.collect()}
+        assert metrics["jobs_runs_total"][("purge", "succeeded")] == len(ticks)
+        assert metrics["jobs_running"][("purge",)] == 0
+        # Stopped runners take no more work
+        assert runner.enqueue("purge") is False
+
+    run(scenario)
@@ -0,0 +1,185 @@
+"""
+Content-addressed uploads: storing, naming and deleting files, and the
+reference counting that decides when a file may go.
+"""
+
+import asyncio
+import io
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from starlette.requests import Request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from media import (
+    BodySizeLimitMiddleware,
+    UploadTooLarge,
+    delete_upload,
+    derivative_path,
+    serve_file,
+    store_upload,
+    upload_name,
+)
+from storage import MemoryRepository
+
+
+class FakeUpload:
+    """The slice of starlette's UploadFile that store_upload uses."""
+
+    def __init__(self, filename, content):
+        self.filename = filename
+        self._stream = io.BytesIO(content)
+
+    async def read(self, size=-1):
+        return self._stream.read(size)
+
+
+def test_upload_name_only_accepts_our_files():
+    assert upload_name("/uploads/abc.png") == "abc.png"
+    for url in (None, "", "/uploads/", "https://example.com/a.png", "/uploads/../x", "/uploads/.upload-1",
+                "/uploads/derivatives/thumb/a.webp"):
+        assert upload_name(url) is None
+
+
+def test_store_upload_is_content_addressed(tmp_path):
+    async def scenario():
+        first = await store_upload(FakeUpload("chart.PNG", b"same bytes"), tmp_path, 100)
+        second = await store_upload(FakeUpload("other.png", b"same bytes"), tmp_path, 100)
+        return first, second
+
+    (name, size, created), (second_name, _, second_created) = asyncio.run(scenario())
+    assert name.endswith(".png") and size == 10 and created is True
+    assert (second_name, second_created) == (name, False)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [name]
+
+
+def test_store_upload_rejects_large_files_without_leftovers(tmp_path):
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(store_upload(FakeUpload("big.png", b"x" * 11), tmp_path, 10))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_delete_upload_removes_derivatives(tmp_path):
+    name = "abc.png"
+    (tmp_path / name).write_bytes(b"original")
+    thumb = derivative_path(tmp_path, name, "thumb")
+    thumb.parent.mkdir(parents=True)
+    thumb.write_bytes(b"thumb")
+
+    asyncio.run(delete_upload(tmp_path, name))
+    assert not (tmp_path / name).exists() and not thumb.exists()
+    # Deleting again (or a file without derivatives) is a no-op
+    asyncio.run(delete_upload(tmp_path, name))
+
+
+async def release(repo, upload_dir, name, delta):
+    """What the trade write path does for one chart image reference change."""
+    if await repo.adjust_upload_refs(name, delta):
+        await delete_upload(upload_dir, name)
+
+
+def test_file_is_deleted_with_its_last_reference(tmp_path):
+    async def scenario():
+        repo = MemoryRepository()
+        name, size, _ = await store_upload(FakeUpload("chart.png", b"chart"), tmp_path, 100)
+        await repo.register_upload(name, size, datetime.now(timezone.utc))
+        await release(repo, tmp_path, name, 2)
+        await release(repo, tmp_path, name, -1)
+        assert (tmp_path / name).exists()
+        await release(repo, tmp_path, name, -1)
+        assert not (tmp_path / name).exists()
+
+    asyncio.run(scenario())
+
+
+def test_unregistered_files_survive_reference_changes(tmp_path):
+    async def scenario():
+        repo = MemoryRepository()
+        legacy = "47740f83-eb6d-4d8e-9c55-27669e0c2a3d.jpg"
+        (tmp_path / legacy).write_bytes(b"from before reference counting")
+        # Another user's trade points at it, then goes away
+        await release(repo, tmp_path, legacy, 1)
+        await release(repo, tmp_path, legacy, -1)
+        await release(repo, tmp_path, legacy, -1)
+        assert (tmp_path / legacy).exists()
+
+    asyncio.run(scenario())
+
+
+def test_serve_file_only_serves_regular_files(tmp_path):
+    request = Request({"type": "http", "method": "GET", "path": "/uploads/x", "headers": []})
+    (tmp_path / "abc.png").write_bytes(b"png")
+    (tmp_path / "derivatives").mkdir()
+
+    async def scenario():
+        response = await serve_file(request, tmp_path / "abc.png", '"abc"')
+        assert response.status_code == 200 and response.headers["etag"] == '"abc"'
+        assert await serve_file(request, tmp_path / "derivatives", '"d"') is None
+        assert await serve_file(request, tmp_path / "missing.png", '"m"') is None
+
+    asyncio.run(scenario())
+
+
+def limited_app(max_bytes):
+    calls = []
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        calls.append(file.filename)
+        return {"size": len(await file.read())}
+
+    app.add_middleware(BodySizeLimitMiddleware, paths={"/upload"}, max_bytes=max_bytes)
+    return app, calls
+
+
+def post(app, **request):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/upload", **request)
+    return asyncio.run(send())
+
+
+def multipart(content):
+    boundary = b"limit-test"
+    body = (
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="chart.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n" + content + b"\r\n--" + boundary + b"--\r\n"
+    )
+    return body, {"content-type": f"multipart/form-data; boundary={boundary.decode()}"}
+
+
+def test_body_limit_checks_the_declared_length():
+    app, calls = limited_app(1000)
+    body, headers = multipart(b"x" * 100)
+    assert post(app, content=body, headers=headers).json() == {"size": 100}
+
+    response = post(app, content=multipart(b"x" * 2000)[0], headers=headers)
+    assert (response.status_code, response.json()) == (413, {"detail": "File too large"})
+    response = post(app, content=body, headers={**headers, "content-length": "lots"})
+    assert (response.status_code, response.json()) == (400, {"detail": "Invalid Content-Length header"})
+    assert calls == ["chart.png"]
+
+
+def test_body_limit_stops_chunked_bodies_while_they_arrive():
+    app, calls = limited_app(1000)
+    body, headers = multipart(b"x" * 5000)
+    sent = []
+
+    async def chunks():
+        for start in range(0, len(body), 256):
+            sent.append(start)
+            yield body[start:start + 256]
+
+    response = post(app, content=chunks(), headers=headers)
+    assert response.status_code == 413
+    # The endpoint never ran, and the rest of the body was never asked for
+    assert calls == [] and len(sent) < len(body) // 256
+
@@ -0,0 +1,92 @@
+"""
+Password hashing: bcrypt over a SHA-256 prehash, legacy hashes and upgrades.
+"""
+
+import asyncio
+import hashlib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from passwords import PasswordHasher, bcrypt_rounds
+from storage import MemoryRepository
+
+# The lowest cost bcrypt accepts, so the suite stays fast
+ROUNDS = 4
+
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_hash_and_verify():
+    async def scenario():
+        hasher = PasswordHasher(rounds=ROUNDS, max_workers=1)
+        try:
+            hashed = await hasher.hash("correct horse")
+            assert hashed.startswith("$2") and bcrypt_rounds(hashed) == ROUNDS
+            assert await hasher.verify("correct horse", hashed) == (True, False)
+            assert await hasher.verify("wrong horse", hashed) == (False, False)
+            # Past bcrypt's 72-byte limit the whole password still counts
+            long_hash = await hasher.hash("x" * 100)
+            assert (await hasher.verify("x" * 99, long_hash))[0] is False
+        finally:
+            hasher.shutdown()
+
+    run(scenario)
+
+
+def test_other_cost_needs_rehash():
+    async def scenario():
+        hashed = await PasswordHasher(rounds=ROUNDS + 1, max_workers=0).hash("secret")
+        hasher = PasswordHasher(rounds=ROUNDS, max_workers=0)
+        assert await hasher.verify("secret", hashed) == (True, True)
+        # A wrong password is never reported as needing one
+        assert await hasher.verify("guess", hashed) == (False, False)
+
+    run(scenario)
+
+
+def test_legacy_hash_verifies_and_needs_rehash():
+    async def scenario():
+        hasher = PasswordHasher(rounds=ROUNDS, max_workers=0, legacy_secret="pepper")
+        legacy = hashlib.sha256(b"secret" + b"pepper").hexdigest()
+        assert await hasher.verify("secret", legacy) == (True, True)
+        assert await hasher.verify("guess", legacy) == (False, False)
+        # The pepper is part of the hash
+        assert await PasswordHasher(rounds=ROUNDS, max_workers=0).verify("secret", legacy) == (False, False)
+
+    run(scenario)
+
+
+def test_unknown_user_still_pays_for_a_check():
+    async def scenario():
+        hasher = PasswordHasher(rounds=ROUNDS, max_workers=0)
+        checks = []
+        check = hasher._check
+        hasher._check = lambda password, hashed: checks.append(hashed) or check(password, hashed)
+
+        for stored in (None, "", "not a hash"):
+            assert await hasher.verify("secret", stored) == (False, False)
+        # One dummy hash at the configured cost, checked every time
+        assert len(checks) == 3 and len(set(checks)) == 1
+        assert bcrypt_rounds(checks[0]) == ROUNDS
+
+    run(scenario)
+
+
+def test_upgrade_does_not_overwrite_a_concurrent_password_change():
+    async def scenario():
+        hasher = PasswordHasher(rounds=ROUNDS, max_workers=0, legacy_secret="pepper")
+        repo = MemoryRepository()
+        legacy = hashlib.sha256(b"old" + b"pepper").hexdigest()
+        await repo.insert_user({"id": "u1", "email": "a@example.com", "password": legacy})
+
+        # The password changes between the login's read and its upgrade
+        changed = await hasher.hash("new")
+        assert await repo.replace_password("u1", legacy, changed) is True
+        assert await repo.replace_password("u1", legacy, await hasher.hash("old")) is False
+        assert (await repo.get_user("u1"))["password"] == changed
+
+    run(scenario)
@@ -0,0 +1,92 @@
+"""
+Price store imports, as-of lookups and mark-to-market of open trades.
+"""
+
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from prices import OpenPositions, PriceStore, mark_to_market, to_epoch_ms
+
+
+def ms(day, hour=0):
+    return to_epoch_ms(datetime(2024, 1, day, hour, tzinfo=timezone.utc))
+
+
+def test_lookup_returns_last_price_at_or_before(tmp_path):
+    store = PriceStore(tmp_path)
+    store.write("EUR/USD", [ms(1), ms(2), ms(3)], [1.1, 1.2, 1.3])
+
+    assert store.price_at("EUR/USD", ms(2)) == (1.2, ms(2))
+    assert store.price_at("eur_usd", ms(2, 12)) == (1.2, ms(2))
+    assert store.price_at("EUR/USD", ms(9)) == (1.3, ms(3))
+    assert store.price_at("EUR/USD", ms(1) - 1) is None
+    assert store.price_at("GBP/USD", ms(2)) is None
+
+
+def test_write_merges_and_new_prices_win(tmp_path):
+    store = PriceStore(tmp_path)
+    store.write("EUR/USD", [ms(1), ms(3)], [1.1, 1.3])
+    assert store.write("EUR/USD", [ms(3), ms(2)], [1.35, 1.2]) == 3
+
+    series = store.series("EUR/USD")
+    assert series[0].tolist() == [ms(1), ms(2), ms(3)]
+    assert series[1].tolist() == [1.1, 1.2, 1.35]
+
+
+def test_ingest_csv_with_and_without_pair_column(tmp_path):
+    bars = tmp_path / "EUR_USD.csv"
+    bars.write_text("Date,Open,High,Low,Close\n2024-01-01,1,1,1,1.1\n2024-01-02,1,1,1,1.2\n")
+    ticks = tmp_path / "ticks.csv"
+    ticks.write_text("symbol,timestamp,price\nBTC/USD,1704067200,42000\nETH/USD,2024-01-01T00:00:00Z,2300\n")
+    store = PriceStore(tmp_path / "store")
+
+    assert store.ingest(bars) == {"EUR_USD": 2}
+    assert store.ingest(ticks) == {"BTC_USD": 1, "ETH_USD": 1}
+    assert store.pairs() == ["BTC_USD", "ETH_USD", "EUR_USD"]
+    assert store.price_at("BTC/USD", ms(1)) == (42000.0, ms(1))
+
+
+def test_ingest_parquet(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "prices.parquet"
+    pq.write_table(pa.table({
+        "pair": ["EUR/USD", "EUR/USD", "GBP/USD"],
+        "timestamp": pa.array([datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 1)], pa.timestamp("us", tz="UTC")),
+        "close": [1.1, 1.2, 1.27],
+    }), path)
+    store = PriceStore(tmp_path / "store")
+
+    assert store.ingest(path) == {"EUR_USD": 2, "GBP_USD": 1}
+    assert store.price_at("EUR/USD", ms(5)) == (1.2, ms(2))
+
+
+def test_mark_to_market(tmp_path):
+    store = PriceStore(tmp_path)
+    store.write("EUR/USD", [ms(1), ms(2)], [1.1, 1.2])
+    store.write("BTC/USD", [ms(1)], [42000.0])
+    positions = OpenPositions.from_documents([
+        {"id": "a", "pair": "EUR/USD", "trade_type": "Long", "entry_price": 1.0, "quantity": 10},
+        {"id": "b", "pair": "EUR/USD", "trade_type": "Short", "entry_price": 1.0, "quantity": 10},
+        {"id": "c", "pair": "BTC/USD", "trade_type": "Long", "entry_price": 40000.0, "quantity": 0.5},
+        {"id": "d", "pair": "XAU/USD", "trade_type": "Long", "entry_price": 2000.0, "quantity": 1},
+    ])
+
+    marks, times, unrealized = mark_to_market(positions, store, ms(1, 12))
+
+    assert marks[:3].tolist() == [1.1, 1.1, 42000.0]
+    assert times.tolist() == [ms(1), ms(1), ms(1), -1]
+    assert unrealized[:3] == pytest.approx([1.0, -1.0, 1000.0])
+    assert np.isnan(marks[3]) and np.isnan(unrealized[3])
+
+
+def test_mark_to_market_without_positions(tmp_path):
+    marks, times, unrealized = mark_to_market(OpenPositions.from_documents([]), PriceStore(tmp_path), ms(1))
+    assert len(marks) == len(times) == len(unrealized) == 0
@@ -0,0 +1,423 @@
+"""
+Conformance suite for the storage backends.
+
+Every test runs against each backend:
+- memory
+- sqlite, in a temporary file
+- Mongo through mongomock, when it is installed
+- a real MongoDB, when MONGO_TEST_URL is set
+
+mongomock has no $text search, so the search case is skipped there.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from storage import DuplicateError, MemoryRepository, MongoRepository, SQLiteRepository, TradeFilter, to_mongo_date
+
+MONGO_TEST_URL = os.environ.get("MONGO_TEST_URL")
+
+BACKENDS = [
+    "memory",
+    "sqlite",
+    "mongomock",
+    pytest.param("mongo", marks=pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")),
+]
+
+PAIRS = ["EUR/USD", "GBP/USD", "BTC/USD"]
+COMMENTS = ["breakout retest", "range fade", None]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path):
+    name = request.param
+    if name == "mongomock":
+        pytest.importorskip("mongomock_motor")
+
+    @asynccontextmanager
+    async def open_repo():
+        if name == "memory":
+            repo = MemoryRepository()
+        elif name == "sqlite":
+            repo = SQLiteRepository(tmp_path / "journal.db")
+        elif name == "mongomock":
+            from mongomock_motor import AsyncMongoMockClient
+            repo = MongoRepository(AsyncMongoMockClient(tz_aware=True)["conformance"])
+        else:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            client = AsyncIOMotorClient(MONGO_TEST_URL, tz_aware=True)
+            repo = MongoRepository(client[f"trading_journal_test_{uuid.uuid4().hex[:8]}"])
+        await repo.ensure_indexes()
+        try:
+            yield repo
+        finally:
+            await repo.close()
+            if name == "mongo":
+                await client.drop_database(repo.db.name)
+                client.close()
+
+    open_repo.name = name
+    return open_repo
+
+
+def run(backend, scenario):
+    async def main():
+        async with backend() as repo:
+            await scenario(repo)
+    asyncio.run(main())
+
+
+def make_trade(i, user_id="user-1", **fields):
+    trade = {
+        "id": f"t{i:03d}",
+        "user_id": user_id,
+        # Several trades per day, so the id tie-break is exercised
+        "date": to_mongo_date(date(2024, 1, 1) + timedelta(days=i // 3)),
+        "pair": PAIRS[i % 3],
+        "trade_type": ["Long", "Short"][i % 2],
+        "entry_price": 1.0 + i,
+        "exit_price": None,
+        "quantity": 1.0,
+        "stop_loss": None,
+        "take_profit": None,
+        "risk_amount": None,
+        "pnl": float(i % 5 - 2),
+        "comments": COMMENTS[i % 3],
+        "chart_image_url": None,
+        "created_at": datetime(2024, 2, 1, 12, 0, i % 60, tzinfo=timezone.utc),
+        "updated_at": datetime(2024, 2, 1, 12, 0, i % 60, tzinfo=timezone.utc),
+    }
+    trade.update(fields)
+    return trade
+
+
+def listed(trade):
+    return {key: value for key, value in trade.items() if key != "user_id"}
+
+
+def in_trade_order(trades):
+    return sorted(trades, key=lambda trade: (-trade["date"].timestamp(), trade["id"]))
+
+
+async def seed(repo, count=30):
+    trades = [make_trade(i) for i in range(count)]
+    assert await repo.insert_trades(trades) == []
+    await repo.insert_trade(make_trade(999, user_id="user-2"))
+    return trades
+
+
+def test_users(backend):
+    async def scenario(repo):
+        user = {
+            "id": "u1", "email": "a@example.com", "full_name": "A", "password": "old",
+            "balance": 100.0, "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        }
+        await repo.insert_user(user)
+
+        assert await repo.get_user("u1") == user
+        assert await repo.get_user_by_email("a@example.com") == user
+        assert await repo.get_user("nobody") is None
+        assert await repo.get_user_by_email("nobody@example.com") is None
+
+        assert await repo.replace_password("u1", "stale", "new") is False
+        assert await repo.replace_password("u1", "old", "new") is True
+        assert (await repo.get_user("u1"))["password"] == "new"
+
+    run(backend, scenario)
+
+
+def test_trade_ownership(backend):
+    async def scenario(repo):
+        trades = await seed(repo, 5)
+
+        assert await repo.get_trade("user-1", "t001") == trades[1]
+        assert await repo.get_trade("user-2", "t001") is None
+        found = await repo.get_trades("user-1", ["t000", "t002", "t999", "missing"])
+        assert sorted(trade["id"] for trade in found) == ["t000", "t002"]
+        assert sorted(await repo.trade_user_ids()) == ["user-1", "user-2"]
+
+    run(backend, scenario)
+
+
+def test_insert_trades_reports_duplicates(backend):
+    async def scenario(repo):
+        await seed(repo, 3)
+        errors = await repo.insert_trades([make_trade(10), make_trade(1), make_trade(11)])
+        assert [index for index, _ in errors] == [1]
+        assert (await repo.get_trade("user-1", "t011")) is not None
+
+    run(backend, scenario)
+
+
+def test_insert_user_rejects_duplicates(backend):
+    async def scenario(repo):
+        await repo.insert_user({"id": "u1", "email": "a@example.com", "full_name": "A"})
+        for user in ({"id": "u2", "email": "a@example.com"}, {"id": "u1", "email": "b@example.com"}):
+            with pytest.raises(DuplicateError):
+                await repo.insert_user({"full_name": "B", **user})
+        assert (await repo.get_user_by_email("a@example.com"))["id"] == "u1"
+
+    run(backend, scenario)
+
+
+def test_keyset_pagination(backend):
+    async def scenario(repo):
+        trades = await seed(repo)
+        pages = []
+        after = None
+        while True:
+            page = await repo.find_trades("user-1", after=after, limit=7)
+            pages += page
+            if len(page) < 7:
+                break
+            after = (page[-1]["date"], page[-1]["id"])
+
+        assert pages == [listed(trade) for trade in in_trade_order(trades)]
+        streamed = [trade async for trade in repo.iter_trades("user-1", batch_size=4)]
+        assert streamed == pages
+
+    run(backend, scenario)
+
+
+@pytest.mark.parametrize("filters", [
+    TradeFilter(pair="EUR/USD"),
+    TradeFilter(trade_type="Short"),
+    TradeFilter(outcome="win"),
+    TradeFilter(outcome="loss"),
+    TradeFilter(date_from=date(2024, 1, 3), date_to=date(2024, 1, 6)),
+    TradeFilter(pair="BTC/USD", outcome="loss", date_from=date(2024, 1, 2)),
+    TradeFilter(search="breakout"),
+], ids=["pair", "type", "win", "loss", "range", "combined", "search"])
+def test_filters(backend, filters):
+    if filters.search and backend.name == "mongomock":
+        pytest.skip("mongomock has no $text search")
+
+    def matches(trade):
+        return (
+            (not filters.pair or trade["pair"] == filters.pair)
+            and (not filters.trade_type or trade["trade_type"] == filters.trade_type)
+            and (filters.outcome != "win" or trade["pnl"] > 0)
+            and (filters.outcome != "loss" or trade["pnl"] < 0)
+            and (not filters.date_from or trade["date"] >= to_mongo_date(filters.date_from))
+            and (not filters.date_to or trade["date"] <= to_mongo_date(filters.date_to))
+            and (not filters.search or filters.search in (trade["comments"] or ""))
+        )
+
+    async def scenario(repo):
+        trades = await seed(repo)
+        expected = [listed(trade) for trade in in_trade_order(trades) if matches(trade)]
+        assert expected
+        assert await repo.find_trades("user-1", filters, limit=100) == expected
+
+    run(backend, scenario)
+
+
+def test_load_trades_fields(backend):
+    async def scenario(repo):
+        trades = await seed(repo, 6)
+        loaded = await repo.load_trades("user-1", ("date", "pnl"))
+        assert sorted(loaded, key=lambda row: (row["date"], row["pnl"])) == sorted(
+            ({"date": trade["date"], "pnl": trade["pnl"]} for trade in trades),
+            key=lambda row: (row["date"], row["pnl"]),
+        )
+
+    run(backend, scenario)
+
+
+def test_load_open_trades(backend):
+    async def scenario(repo):
+        await seed(repo, 4)
+        await repo.update_trade("user-1", "t002", {"exit_price": 2.5})
+        loaded = await repo.load_trades("user-1", ("id", "exit_price"), open_only=True)
+        assert sorted(row["id"] for row in loaded) == ["t000", "t001", "t003"]
+
+    run(backend, scenario)
+
+
+def test_load_trades_missing_pnl(backend):
+    async def scenario(repo):
+        await seed(repo, 4)
+        await repo.update_trade("user-1", "t001", {"exit_price": 2.0, "pnl": None})
+        await repo.update_trade("user-1", "t002", {"exit_price": 2.5})
+        await repo.update_trade("user-1", "t003", {"pnl": None})
+        # Closed with no pnl; an open trade without one has nothing to compute
+        loaded = await repo.load_trades("user-1", ("id", "pnl", "exit_price"), missing_pnl=True)
+        assert loaded == [{"id": "t001", "pnl": None, "exit_price": 2.0}]
+
+    run(backend, scenario)
+
+def test_update_and_delete(backend):
+    async def scenario(repo):
+        trades = await seed(repo, 3)
+        new_date = to_mongo_date(date(2025, 5, 5))
+
+        before = await repo.update_trade("user-1", "t001", {"pnl": 9.0, "date": new_date}, return_before=True)
+        assert before == trades[1]
+        after = await repo.update_trade("user-1", "t001", {"comments": "moved"})
+        assert after == {**trades[1], "pnl": 9.0, "date": new_date, "comments": "moved"}
+        assert await repo.update_trade("user-2", "t001", {"pnl": 0.0}) is None
+
+        assert await repo.delete_trade("user-2", "t001") is None
+        assert await repo.delete_trade("user-1", "t001") == after
+        assert await repo.delete_trade("user-1", "t001") is None
+        assert await repo.get_trade("user-1", "t001") is None
+
+    run(backend, scenario)
+
+
+def test_bulk_write(backend):
+    async def scenario(repo):
+        await seed(repo, 4)
+        await repo.delete_trade("user-1", "t002")
+        errors, unmatched = await repo.bulk_write_trades("user-1", [
+            ("update", "t000", {"pnl": 5.0}, None),
+            ("delete", "t001", None, None),
+            ("delete", "t999", None, None),
+            ("update", "missing", {"pnl": 1.0}, None),
+            ("delete", "t002", None, None),
+            ("update", "t003", {"pnl": 7.0}, None),
+        ])
+        assert errors == []
+        # Another user's trade is out of reach, like one that doesn't exist
+        # or one already deleted
+        assert unmatched == [2, 3, 4]
+        assert (await repo.get_trade("user-1", "t003"))["pnl"] == 7.0
+        assert (await repo.get_trade("user-1", "t000"))["pnl"] == 5.0
+        assert await repo.get_trade("user-1", "t001") is None
+        assert await repo.get_trade("user-2", "t999") is not None
+
+    run(backend, scenario)
+
+
+def test_bulk_write_expected_state(backend):
+    async def scenario(repo):
+        trades = await seed(repo, 4)
+        stamp = trades[0]["updated_at"]
+        errors, unmatched = await repo.bulk_write_trades("user-1", [
+            # Still as read: applies
+            ("update", "t000", {"pnl": 5.0, "updated_at": stamp + timedelta(seconds=1)}, {"updated_at": stamp}),
+            # Changed since it was read: left alone
+            ("update", "t001", {"pnl": 6.0}, {"updated_at": stamp - timedelta(days=1)}),
+            ("delete", "t002", None, {"pnl": trades[2]["pnl"] + 1}),
+            # None matches a missing field
+            ("update", "t003", {"comments": "filled"}, {"risk_amount": None}),
+        ])
+        assert errors == []
+        assert unmatched == [1, 2]
+        assert (await repo.get_trade("user-1", "t000"))["pnl"] == 5.0
+        assert (await repo.get_trade("user-1", "t001"))["pnl"] == trades[1]["pnl"]
+        assert await repo.get_trade("user-1", "t002") is not None
+        assert (await repo.get_trade("user-1", "t003"))["comments"] == "filled"
+
+    run(backend, scenario)
+
+
+def test_aggregate_stats(backend):
+    async def scenario(repo):
+        trades = await seed(repo, 12)
+        pnls = [trade["pnl"] for trade in trades]
+
+        [total] = await repo.aggregate_stats("user-1")
+        assert total["total_trades"] == 12
+        assert total["total_pnl"] == pytest.approx(sum(pnls))
+        assert total["winning_trades"] == sum(pnl > 0 for pnl in pnls)
+        assert total["losing_trades"] == sum(pnl < 0 for pnl in pnls)
+
+        by_pair = await repo.aggregate_stats("user-1", group_by="pair")
+        assert [row["_id"] for row in by_pair] == sorted(PAIRS)
+        assert [row["_id"] for row in await repo.aggregate_stats("user-1", group_by="month")] == ["2024-01"]
+        by_day = await repo.aggregate_stats("user-1", date_to=date(2024, 1, 2), group_by="day")
+        assert [(row["_id"], row["total_trades"]) for row in by_day] == [
+            (to_mongo_date(date(2024, 1, 1)), 3),
+            (to_mongo_date(date(2024, 1, 2)), 3),
+        ]
+
+        if backend.name != "mongomock":  # mongomock's $group emits a row even for no input
+            assert await repo.aggregate_stats("nobody") == []
+
+    run(backend, scenario)
+
+
+def test_user_stats_versions(backend):
+    async def scenario(repo):
+        assert await repo.get_user_stats("user-1") is None
+        delta = {"total_trades": 2, "total_pnl": 3.5, "winning_trades": 1, "losing_trades": 1}
+        # Never computed: a bare delta would not count earlier trades
+        assert await repo.increment_user_stats("user-1", delta) is None
+        assert await repo.get_user_stats("user-1") is None
+
+        await repo.replace_user_stats("user-1", dict.fromkeys(delta, 0))
+        assert await repo.increment_user_stats("user-1", delta) == 2
+        assert await repo.increment_user_stats("user-1", {"total_trades": -1, "total_pnl": -1.5}) == 3
+        stats = await repo.get_user_stats("user-1")
+        assert stats == {"total_trades": 1, "total_pnl": 2.0, "winning_trades": 1, "losing_trades": 1, "version": 3}
+
+        await repo.replace_user_stats("user-1", dict.fromkeys(delta, 0))
+        assert (await repo.get_user_stats("user-1"))["version"] == 4
+
+    run(backend, scenario)
+
+
+def test_daily_rollups(backend):
+    async def scenario(repo):
+        day1, day2 = to_mongo_date(date(2024, 1, 1)), to_mongo_date(date(2024, 1, 2))
+        row = {"total_trades": 1, "total_pnl": 2.0, "winning_trades": 1, "losing_trades": 0}
+        await repo.increment_daily_rollups("user-1", {day1: row, day2: row})
+        await repo.increment_daily_rollups("user-1", {day1: row})
+        assert await repo.find_daily_rollups("user-1") == [
+            {"date": day1, "total_trades": 2, "total_pnl": 4.0, "winning_trades": 2, "losing_trades": 0},
+            {"date": day2, **row},
+        ]
+
+        # A day left without trades disappears
+        await repo.increment_daily_rollups("user-1", {day2: {field: -value for field, value in row.items()}})
+        assert [row["date"] for row in await repo.find_daily_rollups("user-1")] == [day1]
+
+        await repo.replace_daily_rollups("user-1", [{"date": day2, **row}])
+        assert await repo.find_daily_rollups("user-1", date(2024, 1, 2), date(2024, 1, 2)) == [{"date": day2, **row}]
+        assert await repo.find_daily_rollups("user-1", date_to=date(2024, 1, 1)) == []
+
+    run(backend, scenario)
+
+
+def test_upload_refs(backend):
+    async def scenario(repo):
+        await repo.register_upload("a.png", 10, datetime(2024, 1, 1, tzinfo=timezone.utc))
+        assert await repo.adjust_upload_refs("a.png", 2) is False
+        assert await repo.adjust_upload_refs("a.png", -1) is False
+        assert await repo.adjust_upload_refs("a.png", -1) is True
+
+        # Unregistered files (from before reference counting) are never released
+        assert await repo.adjust_upload_refs("legacy.jpg", 1) is False
+        assert await repo.adjust_upload_refs("legacy.jpg", -1) is False
+        assert await repo.adjust_upload_refs("legacy.jpg", -1) is False
+        assert await repo.release_upload("legacy.jpg") is False
+        assert await repo.find_unreferenced_uploads(datetime(2100, 1, 1, tzinfo=timezone.utc)) == []
+
+    run(backend, scenario)
+
+
+def test_unreferenced_uploads(backend):
+    async def scenario(repo):
+        old = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        await repo.register_upload("stale.png", 10, old)
+        await repo.register_upload("used.png", 10, old)
+        await repo.register_upload("fresh.png", 10, old + timedelta(days=2))
+        await repo.adjust_upload_refs("used.png", 1)
+
+        assert await repo.find_unreferenced_uploads(old + timedelta(days=1)) == ["stale.png"]
+        assert await repo.release_upload("used.png") is False
+        assert await repo.release_upload("stale.png") is True
+        assert await repo.release_upload("stale.png") is False
+        assert await repo.find_unreferenced_uploads(old + timedelta(days=1)) == []
+
+    run(backend, scenario)
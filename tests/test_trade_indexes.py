@@ -0,0 +1,84 @@
+"""
+Checks that every /api/trades filter is answered from an index.
+
+Needs a disposable MongoDB: set MONGO_TEST_URL (e.g. mongodb://localhost:27017)
+to run, otherwise the module is skipped.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pytest
+
+MONGO_TEST_URL = os.environ.get("MONGO_TEST_URL")
+pytestmark = pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+def plan_stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+@pytest.fixture(scope="module")
+def trades():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import MongoClient
+    from storage import MongoRepository
+
+    db_name = f"trading_journal_test_{uuid.uuid4().hex[:8]}"
+
+    async def ensure_indexes():
+        # Motor binds to the loop it first runs on, so it lives inside this one
+        await MongoRepository(AsyncIOMotorClient(MONGO_TEST_URL)[db_name]).ensure_indexes()
+
+    asyncio.run(ensure_indexes())
+
+    client = MongoClient(MONGO_TEST_URL)
+    collection = client[db_name].trades
+    collection.insert_many([
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": "user-%d" % (i % 5),
+            "date": datetime(2024, 1 + i % 12, 1 + i % 28, tzinfo=timezone.utc),
+            "pair": ["EUR/USD", "GBP/USD", "BTC/USD"][i % 3],
+            "trade_type": ["Long", "Short"][i % 2],
+            "pnl": (i % 7) - 3,
+            "comments": "breakout retest" if i % 4 == 0 else "range fade",
+        }
+        for i in range(2000)
+    ])
+    yield collection
+    client.drop_database(db_name)
+    client.close()
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"pair": "EUR/USD"},
+    {"trade_type": "Short"},
+    {"outcome": "win"},
+    {"outcome": "loss"},
+    {"date_from": date(2024, 3, 1), "date_to": date(2024, 6, 30)},
+    {"search": "breakout"},
+])
+def test_filter_uses_index(trades, filters):
+    from storage import TRADE_SORT, TradeFilter
+    from storage.mongo import build_trade_query
+
+    query = build_trade_query("user-1", TradeFilter(**filters))
+    explain = trades.find(query).sort(TRADE_SORT).limit(51).explain()
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+
+    assert "COLLSCAN" not in stages
+    assert "IXSCAN" in stages or "TEXT" in stages or "TEXT_MATCH" in stages
@@ -0,0 +1,188 @@
+"""
+Streaming import readers and export writers.
+"""
+
+import asyncio
+import csv
+import io
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import orjson
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from trade_io import (
+    EXPORT_COLUMNS,
+    TRADE_COLUMNS,
+    DrainableSink,
+    csv_value,
+    iter_csv_rows,
+    iter_lines,
+    iter_ndjson_rows,
+    write_csv,
+    write_ndjson,
+    write_parquet,
+)
+
+
+async def chunked(data, size=7):
+    """The body as a client might send it: small chunks, split anywhere."""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def read(reader, data, **options):
+    async def collect():
+        return [
+            (row, str(record) if isinstance(record, ValueError) else record)
+            async for row, record in reader(chunked(data), **options)
+        ]
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks():
+    async def collect():
+        return [line async for line in iter_lines(chunked("a\r\nbé\n\nc".encode(), size=1))]
+
+    # A multi-byte character split between chunks still decodes
+    assert asyncio.run(collect()) == ["a", "bé", "", "c"]
+
+
+def test_ndjson_rows():
+    data = b'{"pair": "EUR/USD"}\n\n{"pair": \n[1, 2]\n{"pair": "GBP/USD", "pnl": 5}'
+    rows = read(iter_ndjson_rows, data)
+
+    assert rows[0] == (1, {"pair": "EUR/USD"})
+    assert rows[1][0] == 2 and rows[1][1].startswith("Invalid JSON")
+    assert rows[2] == (3, "Expected a JSON object")
+    assert rows[3] == (4, {"pair": "GBP/USD", "pnl": 5})
+
+
+def test_csv_rows():
+    data = (
+        b"date,pair,comments,unknown\r\n"
+        b'2024-01-02,EUR/USD,"line one\nline two, with comma",x\r\n'
+        b"\r\n"
+        b"2024-01-03,GBP/USD,,y\r\n"
+        b"2024-01-04,USD/JPY\r\n"
+    )
+    assert read(iter_csv_rows, data) == [
+        (1, {"date": "2024-01-02", "pair": "EUR/USD", "comments": "line one\nline two, with comma"}),
+        # Empty cells are "not set"; unknown columns are ignored
+        (2, {"date": "2024-01-03", "pair": "GBP/USD", "comments": None}),
+        (3, "Expected 4 columns, got 2"),
+    ]
+
+
+def test_stray_quote_does_not_buffer_the_rest_of_the_file():
+    rows = "".join(f"2024-01-{day:02d},EUR/USD,ok\n" for day in range(10, 30))
+    data = ("date,pair,comments\n" + '2024-01-02,EUR/USD,"broken\n' + rows + "2024-02-01,GBP/USD,after\n").encode()
+
+    result = read(iter_csv_rows, data, max_length=200)
+    assert result[0] == (1, "Unbalanced quotes: record longer than 200 characters")
+    # Reading resumes on the next line once the broken record is given up
+    assert result[-1] == (len(result), {"date": "2024-02-01", "pair": "GBP/USD", "comments": "after"})
+    assert all(isinstance(record, dict) for _, record in result[1:])
+
+
+def test_overlong_lines_are_skipped():
+    data = b'{"pair": "EUR/USD"}\n{"comments": "' + b"x" * 500 + b'"}\n{"pair": "GBP/USD"}'
+    assert read(iter_ndjson_rows, data, max_length=100) == [
+        (1, {"pair": "EUR/USD"}),
+        (2, "Record longer than 100 characters"),
+        (3, {"pair": "GBP/USD"}),
+    ]
+
+    data = b"date,pair\n2024-01-02," + b"x" * 500 + b"\n2024-01-03,EUR/USD\n"
+    assert read(iter_csv_rows, data, max_length=100) == [
+        (1, "Record longer than 100 characters"),
+        (2, {"date": "2024-01-03", "pair": "EUR/USD"}),
+    ]
+
+
+TRADES = [
+    {
+        "id": "t1", "user_id": "u1", "date": date(2024, 1, 2), "pair": "EUR/USD", "trade_type": "Long",
+        "entry_price": 1.1, "exit_price": 1.2, "quantity": 1000.0, "stop_loss": None, "take_profit": 1.25,
+        "risk_amount": 50.0, "pnl": 100.0, "comments": 'breakout, "clean"\nheld overnight', "chart_image_url": None,
+        "created_at": datetime(2024, 1, 2, 9, 30, tzinfo=timezone.utc),
+        "updated_at": datetime(2024, 1, 3, 10, 0, 0, 123000, tzinfo=timezone.utc),
+    },
+    {
+        "id": "t2", "date": date(2024, 1, 5), "pair": "GBP/USD", "trade_type": "Short",
+        "entry_price": 1.3, "quantity": 500.0,
+        "created_at": datetime(2024, 1, 5, tzinfo=timezone.utc),
+        "updated_at": datetime(2024, 1, 5, tzinfo=timezone.utc),
+    },
+]
+
+
+def export(writer, trades, batch_size=1):
+    async def batches():
+        for start in range(0, len(trades), batch_size):
+            yield trades[start:start + batch_size]
+
+    async def collect():
+        return [chunk async for chunk in writer(batches())]
+    return asyncio.run(collect())
+
+
+def expected_rows(trades):
+    # Every export column, missing ones as None; nothing else (no user_id)
+    return [{column: trade.get(column) for column in EXPORT_COLUMNS} for trade in trades]
+
+
+def test_ndjson_export_round_trips():
+    chunks = export(write_ndjson, TRADES)
+    assert len(chunks) == 2
+    rows = [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+
+    expected = expected_rows(TRADES)
+    for row in expected:
+        row["date"] = row["date"].isoformat()
+        for column in ("created_at", "updated_at"):
+            row[column] = row[column].isoformat().replace("+00:00", "Z")
+    assert rows == expected
+    assert export(write_ndjson, []) == []
+
+
+def test_csv_export_round_trips_through_the_importer():
+    data = b"".join(export(write_csv, TRADES))
+    exported = list(csv.DictReader(io.StringIO(data.decode(), newline="")))
+    assert exported[0]["comments"] == TRADES[0]["comments"]
+    assert exported[1]["exit_price"] == "" and exported[0]["updated_at"] == "2024-01-03T10:00:00.123000+00:00"
+
+    # What the import reads back is what was exported, as text
+    imported = [record for _, record in read(iter_csv_rows, data)]
+    assert imported == [
+        {column: (None if trade.get(column) is None else str(csv_value(trade[column]))) for column in TRADE_COLUMNS}
+        for trade in TRADES
+    ]
+    # An empty export is just the header
+    assert b"".join(export(write_csv, [])).decode().strip() == ",".join(EXPORT_COLUMNS)
+
+
+def test_parquet_export_round_trips():
+    pq = pytest.importorskip("pyarrow.parquet")
+    chunks = export(write_parquet, TRADES)
+    # One row group per batch, then the footer
+    assert len(chunks) == 3
+
+    table = pq.read_table(io.BytesIO(b"".join(chunks)))
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.to_pylist() == expected_rows(TRADES)
+    assert pq.ParquetFile(io.BytesIO(b"".join(chunks))).num_row_groups == 2
+
+    empty = pq.read_table(io.BytesIO(b"".join(export(write_parquet, []))))
+    assert empty.num_rows == 0 and empty.column_names == EXPORT_COLUMNS
+
+
+def test_drainable_sink_hands_off_its_contents():
+    sink = DrainableSink()
+    assert sink.write(b"abc") == 3 and sink.write(memoryview(b"de")) == 2
+    assert (sink.tell(), sink.drain()) == (5, b"abcde")
+    # Drained bytes are forgotten, the position is not
+    assert (sink.tell(), sink.drain()) == (5, b"")